@@ -1,132 +1,334 @@
-import streamlit as st
-import os
-from dotenv import load_dotenv
-from utils.youtube_handler import YouTubeHandler
-from utils.batch_processor import BatchProcessor
-from utils.context_cache import ContextCache
-import logging
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Load environment variables
-load_dotenv()
-
-# Initialize handlers
-youtube_handler = YouTubeHandler()
-batch_processor = BatchProcessor()
-context_cache = ContextCache()
-
-# Initialize session state for conversation history
-if 'conversation_history' not in st.session_state:
-    st.session_state.conversation_history = []
-
-def main():
-    # Page config
-    st.set_page_config(
-        page_title="Video Content Analysis",
-        page_icon="🎥",
-        layout="wide",
-        initial_sidebar_state="collapsed"
-    )
-
-    # Title with icon
-    st.title("👥 Video Content Analysis with Gemini API")
-
-    # Description and features
-    st.write("This application helps you analyze video content by asking multiple questions about the transcript. Features:")
-    
-    # Features as bullet points
-    st.markdown("""
-    * 🔄 Batch processing of questions
-    * 📝 Long context handling
-    * 💾 Context caching
-    * 🔗 Interconnected questions
-    """)
-
-    # Input section
-    st.header("Input")
-    video_url = st.text_input("YouTube Video URL", placeholder="Paste your YouTube video URL here...", help="Enter a valid YouTube video URL")
-    
-    # Main content area
-    if video_url:
-        try:
-            # Extract and display transcript
-            with st.spinner("Extracting video transcript..."):
-                transcript = youtube_handler.get_transcript(video_url)
-            
-            if transcript:
-                # Display transcript in expandable section
-                with st.expander("📜 Video Transcript", expanded=False):
-                    st.text_area("", value=transcript, height=200, disabled=True)
-                
-                # Two-column layout for questions and conversation
-                col1, col2 = st.columns([1, 1])
-                
-                with col1:
-                    # Question input section
-                    st.subheader("Ask Questions")
-                    questions = st.text_area(
-                        "Enter your questions (one per line):",
-                        height=150,
-                        placeholder="What is the main topic?\nWhat are the key points?\n..."
-                    )
-                    
-                    if st.button("Process Questions", type="primary"):
-                        if questions:
-                            with st.spinner("Processing questions..."):
-                                question_list = [q.strip() for q in questions.split('\n') if q.strip()]
-                                results = batch_processor.process_questions(question_list, transcript)
-                                
-                                # Add to conversation history
-                                for question, answer in results.items():
-                                    st.session_state.conversation_history.append({
-                                        "question": question,
-                                        "answer": answer
-                                    })
-                        else:
-                            st.warning("Please enter at least one question.")
-                    
-                    # Generate and display suggested questions
-                    st.subheader("Suggested Questions")
-                    with st.spinner("Generating questions..."):
-                        suggested_questions = batch_processor.generate_questions(transcript, limit=5)
-                        for question in suggested_questions:
-                            if st.button(f"▶️ {question}", key=question):
-                                with st.spinner("Processing question..."):
-                                    results = batch_processor.process_questions([question], transcript)
-                                    # Add to conversation history
-                                    st.session_state.conversation_history.append({
-                                        "question": question,
-                                        "answer": results[question]
-                                    })
-                
-                with col2:
-                    # Conversation History
-                    st.subheader("Conversation History")
-                    if not st.session_state.conversation_history:
-                        st.info("No conversation history yet. Start by asking some questions!")
-                    else:
-                        for i, qa in enumerate(st.session_state.conversation_history):
-                            with st.expander(f"Q: {qa['question']}", expanded=True):
-                                st.markdown(qa['answer'])
-                                
-                        # Clear history button
-                        if st.button("Clear History"):
-                            st.session_state.conversation_history = []
-                            st.experimental_rerun()
-            
-        except Exception as e:
-            st.error(f"Error processing video: {str(e)}")
-            logger.error(f"Error in main: {str(e)}")
-
-    # Footer
-    st.markdown("---")
-    st.markdown(
-        "Built with ❤️ using Streamlit and Google's Gemini API | "
-        "[GitHub repository](https://github.com/yourusername/your-repo)"
-    )
-
-if __name__ == "__main__":
+import streamlit as st
+import os
+from dotenv import load_dotenv
+from utils.youtube_handler import YouTubeHandler
+from utils.batch_processor import BatchProcessor, STRATEGY_AUTO
+from utils.context_cache import context_cache
+from utils.conversation_store import ConversationStore
+from utils.prefetcher import AnswerPrefetcher, PrefetchBudget
+from utils.scheduler import PRIORITY_PREFETCH
+from utils.cache_backends import create_backend
+from utils.service_client import ServiceClient
+from utils.transcript import link_citations
+from utils.transcript_compactor import CompactionStats
+from utils import metrics
+from config import settings
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Handlers are built once per process, not on every Streamlit rerun
+@st.cache_resource
+def get_service_client():
+    """Client for the HTTP service when SERVICE_URL is set; otherwise the app does the work itself."""
+    return ServiceClient() if settings.SERVICE_URL else None
+
+@st.cache_resource
+def get_youtube_handler():
+    return YouTubeHandler()
+
+@st.cache_resource
+def get_batch_processor():
+    # Retrieval excerpts carry their time ranges, so answers can cite them
+    return BatchProcessor(context_cache=context_cache, transcript_lookup=get_youtube_handler().find_transcript)
+
+@st.cache_resource
+def get_prefetcher():
+    batch_processor = get_batch_processor()
+    # Same model clients and caches, but queued behind questions users actually asked
+    return AnswerPrefetcher(BatchProcessor(
+        model=batch_processor.model,
+        fast_model=batch_processor.fast_model,
+        cached_contexts=batch_processor.cached_contexts,
+        context_cache=context_cache,
+        priority=PRIORITY_PREFETCH,
+        transcript_lookup=batch_processor.transcript_lookup
+    ))
+
+@st.cache_data(ttl=settings.CACHE_TTL, show_spinner=False)
+def get_suggested_questions(video_id, _transcript, limit=5):
+    """Suggested questions for a video, generated once per video ID and TTL."""
+    client = get_service_client()
+    if client is not None:
+        questions = client.suggest_questions(video_id, limit=limit)
+    else:
+        questions = get_batch_processor().generate_questions(_transcript, limit=limit)
+    if not questions:
+        # Exceptions are not cached, so a failed generation is retried on the next run
+        raise RuntimeError("No questions could be generated")
+    return questions
+
+@st.cache_resource
+def get_conversation_backend():
+    return create_backend(table="conversations", ttl=settings.CONVERSATION_TTL)
+
+def load_transcript(video_url):
+    """Get the video ID, transcript and compaction statistics, from the service when one is configured."""
+    client = get_service_client()
+    if client is not None:
+        data = client.get_transcript(video_url)
+        compaction = CompactionStats(**data["compaction"]) if data["compaction"] else None
+        return data["video_id"], data["transcript"], compaction
+
+    youtube_handler = get_youtube_handler()
+    video_id = youtube_handler.extract_video_id(video_url)
+    transcript = youtube_handler.get_transcript(video_url)
+    compaction = youtube_handler.compactor.stats(video_id) if youtube_handler.compactor else None
+    return video_id, transcript, compaction
+
+# Initialize per-session state: conversation history and prefetching
+if 'conversation' not in st.session_state:
+    st.session_state.conversation = ConversationStore(backend=get_conversation_backend())
+    st.session_state.history_page = 0
+    st.session_state.prefetch_budget = PrefetchBudget()
+    st.session_state.prefetch_job = None
+
+def prefetch_suggestions(questions, transcript, video_id):
+    """Answer the suggested questions in the background, once per video, so clicking one is instant."""
+    # In thin-client mode the service answers questions, not this process
+    if not settings.PREFETCH_ENABLED or get_service_client() is not None:
+        return
+    job = st.session_state.prefetch_job
+    if job is not None and job.video_id == video_id:
+        return
+    if job is not None:
+        job.cancel()
+    st.session_state.prefetch_job = get_prefetcher().prefetch(
+        questions, transcript, video_id, st.session_state.prefetch_budget
+    )
+
+def cancel_stale_prefetch(video_id):
+    """Stop prefetching for a video the user has moved away from."""
+    job = st.session_state.prefetch_job
+    if job is not None and job.video_id != video_id:
+        job.cancel()
+        st.session_state.prefetch_job = None
+
+def link_answer(answer, transcript, video_id):
+    """Link an answer's [M:SS] citations to that point in the video, when the transcript's timing is at hand."""
+    if get_service_client() is not None:
+        return answer
+    timed = get_youtube_handler().find_transcript(video_id, transcript)
+    return link_citations(answer, timed, video_id) if timed is not None else answer
+
+def stream_answers(question_list, transcript, video_id):
+    """Render answers as they stream in, one placeholder per question, and return them."""
+    placeholders = {question: st.empty() for question in dict.fromkeys(question_list)}
+    answers = {}
+    client = get_service_client()
+    if client is not None:
+        events = client.stream_questions(question_list, video_id, strategy=STRATEGY_AUTO)
+    else:
+        events = get_batch_processor().stream_questions(
+            question_list, transcript, video_id=video_id, strategy=STRATEGY_AUTO
+        )
+    for event in events:
+        text = link_answer(event.text, transcript, video_id) if event.done else event.text
+        placeholders[event.question].markdown(f"**Q: {event.question}**\n\n{text}")
+        if event.done:
+            answers[event.question] = event.text
+    return {question: answers[question] for question in placeholders if question in answers}
+
+def ask_in_session(question_list, transcript, video_id):
+    """Answer questions in order as turns of this session's conversation about the video."""
+    session = st.session_state.get("qa_session")
+    if session is None or session.video_id != video_id:
+        if session is not None:
+            session.close()
+        session = get_batch_processor().start_session(transcript, video_id)
+        st.session_state.qa_session = session
+    answers = {}
+    for question in question_list:
+        answers[question] = session.ask(question)
+        st.markdown(f"**Q: {question}**\n\n{link_answer(answers[question], transcript, video_id)}")
+    return answers
+
+def render_history_page(conversation):
+    """Render one page of the conversation, newest first; other pages are not materialized."""
+    pages = conversation.page_count()
+    page = min(st.session_state.history_page, pages - 1)
+    for i, turn in enumerate(conversation.page(page)):
+        # Only the newest answer starts expanded
+        with st.expander(f"Q: {turn.question}", expanded=(page == 0 and i == 0)):
+            st.markdown(turn.answer)
+
+    if pages > 1:
+        newer, position, older = st.columns([1, 2, 1])
+        if newer.button("◀ Newer", disabled=page == 0):
+            st.session_state.history_page = page - 1
+            st.rerun()
+        position.caption(f"Page {page + 1} of {pages} ({len(conversation)} questions)")
+        if older.button("Older ▶", disabled=page >= pages - 1):
+            st.session_state.history_page = page + 1
+            st.rerun()
+
+def format_seconds(value):
+    return "–" if value is None else f"{value:.2f}s"
+
+def render_stats_panel():
+    """Sidebar summary of cache hit rates, model latency and token usage for this process."""
+    with st.sidebar.expander("📊 Stats", expanded=False):
+        client = get_service_client()
+        if client is not None:
+            # The work, and so the metrics, happen in the service
+            st.caption(f"Metrics are collected by the service at {settings.SERVICE_URL}/metrics.")
+            try:
+                st.download_button("Export (Prometheus)", client.metrics(), file_name="metrics.prom", mime="text/plain")
+            except Exception as e:
+                st.caption(f"Service metrics unavailable: {str(e)}")
+            return
+        if not metrics.registry.enabled:
+            st.caption("Metrics are disabled (METRICS_ENABLED=false).")
+            return
+        for tier in ("memory", "persistent", "semantic", "transcript"):
+            rate = metrics.hit_rate(tier)
+            st.metric(f"{tier.capitalize()} cache hit rate", "–" if rate is None else f"{rate:.0%}")
+        st.metric("Model latency p50", format_seconds(metrics.MODEL_CALL_SECONDS.quantile(0.5)))
+        st.metric("Model latency p95", format_seconds(metrics.MODEL_CALL_SECONDS.quantile(0.95)))
+        st.metric("Question latency p95", format_seconds(metrics.QUESTION_SECONDS.quantile(0.95)))
+        st.metric("Transcript fetch p95", format_seconds(metrics.TRANSCRIPT_FETCH_SECONDS.quantile(0.95)))
+        st.metric("Prompt tokens", f"{metrics.MODEL_TOKENS.value(kind='prompt'):,.0f}")
+        st.metric("Response tokens", f"{metrics.MODEL_TOKENS.value(kind='response'):,.0f}")
+        st.download_button(
+            "Export (Prometheus)",
+            metrics.registry.render_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
+
+def main():
+    # Page config
+    st.set_page_config(
+        page_title="Video Content Analysis",
+        page_icon="🎥",
+        layout="wide",
+        initial_sidebar_state="collapsed"
+    )
+
+    # Title with icon
+    st.title("👥 Video Content Analysis with Gemini API")
+
+    # Description and features
+    st.write("This application helps you analyze video content by asking multiple questions about the transcript. Features:")
+    
+    # Features as bullet points
+    st.markdown("""
+    * 🔄 Batch processing of questions
+    * 📝 Long context handling
+    * 💾 Context caching
+    * 🔗 Interconnected questions
+    """)
+
+    render_stats_panel()
+
+    # Input section
+    st.header("Input")
+    video_url = st.text_input("YouTube Video URL", placeholder="Paste your YouTube video URL here...", help="Enter a valid YouTube video URL")
+    
+    # Main content area
+    if video_url:
+        try:
+            # Extract and display transcript
+            with st.spinner("Extracting video transcript..."):
+                video_id, transcript, compaction = load_transcript(video_url)
+            cancel_stale_prefetch(video_id)
+            
+            if transcript:
+                # Display transcript in expandable section
+                with st.expander("📜 Video Transcript", expanded=False):
+                    st.text_area("", value=transcript, height=200, disabled=True)
+                    if compaction:
+                        st.caption(
+                            f"Compacted from {compaction.original_bytes:,} to {compaction.compacted_bytes:,} bytes "
+                            f"({compaction.byte_reduction:.0%} smaller, ~{compaction.original_tokens - compaction.compacted_tokens:,} "
+                            f"fewer tokens per call)"
+                        )
+                
+                # Two-column layout for questions and conversation
+                col1, col2 = st.columns([1, 1])
+                
+                with col1:
+                    # Question input section
+                    st.subheader("Ask Questions")
+                    questions = st.text_area(
+                        "Enter your questions (one per line):",
+                        height=150,
+                        placeholder="What is the main topic?\nWhat are the key points?\n..."
+                    )
+                    
+                    # Sessions run in-process; the HTTP service answers questions independently
+                    follow_up = get_service_client() is None and st.checkbox(
+                        "Answer as a conversation",
+                        help="Each question sees the earlier questions and answers about this video"
+                    )
+                    
+                    if st.button("Process Questions", type="primary"):
+                        if questions:
+                            question_list = [q.strip() for q in questions.split('\n') if q.strip()]
+                            if follow_up:
+                                results = ask_in_session(question_list, transcript, video_id)
+                            else:
+                                results = stream_answers(question_list, transcript, video_id)
+                            
+                            # Add to conversation history
+                            for question, answer in results.items():
+                                st.session_state.conversation.add(question, answer, video_id)
+                            st.session_state.history_page = 0
+                        else:
+                            st.warning("Please enter at least one question.")
+                    
+                    # Generate and display suggested questions
+                    st.subheader("Suggested Questions")
+                    with st.spinner("Generating questions..."):
+                        try:
+                            suggested_questions = get_suggested_questions(video_id, transcript, limit=5)
+                        except RuntimeError:
+                            suggested_questions = []
+                        prefetch_suggestions(suggested_questions, transcript, video_id)
+                        for question in suggested_questions:
+                            if st.button(f"▶️ {question}", key=question):
+                                job = st.session_state.prefetch_job
+                                if job is not None:
+                                    # An answer still being prefetched is finished, not asked for twice
+                                    job.wait(question, timeout=settings.REQUEST_TIMEOUT)
+                                results = stream_answers([question], transcript, video_id)
+                                # Add to conversation history
+                                st.session_state.conversation.add(question, results[question], video_id)
+                                st.session_state.history_page = 0
+                
+                with col2:
+                    # Conversation History
+                    st.subheader("Conversation History")
+                    conversation = st.session_state.conversation
+                    if not len(conversation):
+                        st.info("No conversation history yet. Start by asking some questions!")
+                    else:
+                        render_history_page(conversation)
+                                
+                        # Clear history button
+                        if st.button("Clear History"):
+                            conversation.clear()
+                            if st.session_state.get("qa_session") is not None:
+                                st.session_state.qa_session.close()
+                                st.session_state.qa_session = None
+                            st.session_state.history_page = 0
+                            st.rerun()
+            
+        except Exception as e:
+            st.error(f"Error processing video: {str(e)}")
+            logger.error(f"Error in main: {str(e)}")
+
+    # Footer
+    st.markdown("---")
+    st.markdown(
+        "Built with ❤️ using Streamlit and Google's Gemini API | "
+        "[GitHub repository](https://github.com/yourusername/your-repo)"
+    )
+
+if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Load test for the HTTP service.
+
+Start the service against the fake backend, then run from the project root:
+    MODEL_BACKEND=fake FAKE_MODEL_LATENCY=0.05 SERVICE_WORKERS=4 python service.py
+    python -m benchmarks.bench_service --clients 32 --requests 500
+
+Each request asks a few questions about one of ``--videos`` videos, so repeat
+questions are served from the shared cache. Reports throughput, latency
+percentiles and how many requests the service turned away at its
+concurrency limit.
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from utils.service_client import ServiceClient, ServiceError
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_service", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Service address")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests")
+    parser.add_argument("--videos", type=int, default=20, help="Distinct videos asked about")
+    parser.add_argument("--questions", type=int, default=3, help="Questions per request")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming endpoint")
+    args = parser.parse_args(argv)
+
+    # One client (and connection pool) per thread
+    clients = [ServiceClient(args.url) for _ in range(args.clients)]
+    rng = random.Random(0)
+    jobs = [
+        (f"loadtest{rng.randrange(args.videos):03d}", [f"What does segment {rng.randrange(50)} discuss?"
+                                                      for _ in range(args.questions)])
+        for _ in range(args.requests)
+    ]
+
+    def run(i: int):
+        client = clients[i % len(clients)]
+        video, questions = jobs[i]
+        started_at = time.perf_counter()
+        try:
+            if args.stream:
+                first = None
+                for _ in client.stream_questions(questions, video):
+                    if first is None:
+                        first = time.perf_counter() - started_at
+                return time.perf_counter() - started_at, first, None
+            client.process_questions(questions, video)
+            return time.perf_counter() - started_at, None, None
+        except ServiceError as e:
+            return None, None, e.status_code
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        results = list(executor.map(run, range(args.requests)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies = [latency for latency, _, _ in results if latency is not None]
+    firsts = [first for _, first, _ in results if first is not None]
+    rejected = sum(1 for _, _, status in results if status == 503)
+    failed = sum(1 for _, _, status in results if status is not None and status != 503)
+    print(f"{len(latencies)} ok, {rejected} rejected (503), {failed} failed in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.1f} requests/s)")
+    if latencies:
+        print(f"latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    if firsts:
+        print(f"first event p50 {percentile(firsts, 0.5) * 1000:.1f} ms  "
+              f"p95 {percentile(firsts, 0.95) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
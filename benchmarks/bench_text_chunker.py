@@ -0,0 +1,46 @@
+"""
+Throughput benchmark for TextChunker on multi-MB transcripts.
+
+Run from the project root:
+    python -m benchmarks.bench_text_chunker
+"""
+import random
+import time
+from utils.text_chunker import TextChunker
+
+SIZES_MB = [1, 8, 32]
+WORDS = ["the", "model", "video", "context", "question", "answer", "cache", "batch",
+         "transcript", "token", "latency", "gemini", "stream", "chunk", "overlap"]
+
+def make_transcript(size_bytes: int, seed: int = 0) -> str:
+    """Build a synthetic transcript of roughly ``size_bytes`` characters."""
+    rng = random.Random(seed)
+    sentences = []
+    total = 0
+    while total < size_bytes:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20))).capitalize() + ". "
+        sentences.append(sentence)
+        total += len(sentence)
+    return "".join(sentences)[:size_bytes]
+
+def bench(label: str, fn, text: str, repeat: int = 3) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = fn(text)
+        best = min(best, time.perf_counter() - start)
+    mb = len(text) / (1024 * 1024)
+    print(f"{label:<28} {mb:>6.1f} MB  {count:>6} chunks  {best * 1000:>9.2f} ms  {mb / best:>9.1f} MB/s")
+
+def main() -> None:
+    char_chunker = TextChunker()
+    token_chunker = TextChunker(max_length=8000, token_counter=lambda s: len(s.split()))
+
+    for size_mb in SIZES_MB:
+        text = make_transcript(size_mb * 1024 * 1024)
+        bench("spans (characters)", lambda t: sum(1 for _ in char_chunker.iter_chunk_spans(t)), text)
+        bench("chunk_text (characters)", lambda t: len(char_chunker.chunk_text(t)), text)
+        bench("spans (tokens)", lambda t: sum(1 for _ in token_chunker.iter_chunk_spans(t)), text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Offline benchmark suite for BatchProcessor, ContextCache, TextChunker and TranscriptCompactor.
+
+Needs no API key: model calls go to FakeGenerativeModel with simulated latency.
+Run from the project root:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --only chunker cache --sizes 1 10 --compare bench.json
+
+Each result records the best and mean wall time over ``--repeat`` runs, a
+throughput figure where one applies, and the peak traced allocation of one
+extra run made under tracemalloc (kept out of the timings). ``--compare``
+prints the change against an earlier JSON file and exits non-zero when a
+benchmark got slower by more than ``--threshold``.
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from config import settings
+from benchmarks.bench_text_chunker import WORDS, make_transcript
+from utils.batch_processor import BatchProcessor, STRATEGY_PACKED
+from utils.context_cache import ContextCache
+from utils.fake_backend import FakeGenerativeModel, fake_transcript_fetcher
+from utils.scheduler import RequestScheduler
+from utils.text_chunker import TextChunker
+from utils.transcript import Transcript
+from utils.transcript_compactor import TranscriptCompactor
+
+MB = 1024 * 1024
+DEFAULT_SIZES_MB = [1, 10, 50]
+SUITES = ("batch", "cache", "chunker", "compactor")
+
+def measure(name: str, fn: Callable[[], object], repeat: int, items: int = 0,
+            unit: str = "", trace_memory: bool = True, **params) -> Dict:
+    """
+    Time ``fn`` and record its peak memory.
+
+    Args:
+        name (str): Benchmark name, unique within the suite
+        fn (Callable[[], object]): Work to measure; called ``repeat`` times (plus once
+            under tracemalloc)
+        repeat (int): Number of timed runs
+        items (int): Items processed per run, for the throughput figure
+        unit (str): Name of the items, e.g. ``"questions"`` or ``"MB"``
+        trace_memory (bool): Whether to make the extra tracemalloc run
+        **params: Parameters recorded with the result
+
+    Returns:
+        Dict: The result row
+    """
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started_at)
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    best = min(timings)
+    result = {
+        "name": name,
+        "params": params,
+        "best_s": best,
+        "mean_s": sum(timings) / len(timings),
+        "repeat": repeat,
+        "peak_bytes": peak
+    }
+    if items:
+        result["throughput"] = items / best if best > 0 else None
+        result["unit"] = f"{unit}/s"
+    print(_format_row(result), file=sys.stderr)
+    return result
+
+def _format_row(result: Dict) -> str:
+    params = " ".join(f"{key}={value}" for key, value in result["params"].items())
+    line = f"{result['name']:<34} {params:<34} {result['best_s'] * 1000:>10.2f} ms"
+    if result.get("throughput") is not None:
+        line += f"  {result['throughput']:>10.1f} {result['unit']}"
+    if result["peak_bytes"] is not None:
+        line += f"  {result['peak_bytes'] / MB:>8.1f} MB peak"
+    return line
+
+def _processor(model: FakeGenerativeModel, batch_size: int) -> BatchProcessor:
+    # Fresh memory-only cache, so every run does the model calls it is timing
+    return BatchProcessor(
+        model=model,
+        context_cache=ContextCache(),
+        scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0, base_delay=0.01),
+        batch_size=batch_size
+    )
+
+def bench_batch(repeat: int, latency: float = 0.02, questions: int = 64) -> List[Dict]:
+    """Batch throughput against the fake model at several concurrency levels."""
+    transcript = Transcript.from_segments(fake_transcript_fetcher("benchmark01", segments=2000)).text
+    question_list = [f"What does segment {i} discuss?" for i in range(questions)]
+    results = []
+
+    for batch_size in (1, 4, 16, 64):
+        model = FakeGenerativeModel(latency=latency)
+        results.append(measure(
+            "batch.individual",
+            lambda: _processor(model, batch_size).process_questions(question_list, transcript),
+            repeat, items=questions, unit="questions", trace_memory=False,
+            batch_size=batch_size, latency=latency
+        ))
+
+    model = FakeGenerativeModel(latency=latency)
+    results.append(measure(
+        "batch.packed",
+        lambda: _processor(model, 4).process_questions(question_list, transcript, strategy=STRATEGY_PACKED),
+        repeat, items=questions, unit="questions", trace_memory=False, batch_size=4, latency=latency
+    ))
+
+    # Retries with backoff under simulated 429s
+    model = FakeGenerativeModel(latency=latency, rate_limit_probability=0.1)
+    results.append(measure(
+        "batch.rate_limited",
+        lambda: _processor(model, 16).process_questions(question_list, transcript),
+        repeat, items=questions, unit="questions", trace_memory=False,
+        batch_size=16, latency=latency, rate_limit_probability=0.1
+    ))
+
+    # Time to the first streamed token, with simulated generation speed
+    model = FakeGenerativeModel(latency=latency, seconds_per_token=0.002)
+    first_event = []
+
+    def stream():
+        started_at = time.perf_counter()
+        events = _processor(model, 16).stream_questions(question_list[:16], transcript)
+        next(events)
+        first_event.append(time.perf_counter() - started_at)
+        for _ in events:
+            pass
+
+    result = measure(
+        "batch.stream", stream, repeat, items=16, unit="questions", trace_memory=False,
+        batch_size=16, latency=latency, seconds_per_token=0.002
+    )
+    result["first_event_s"] = min(first_event)
+    results.append(result)
+    return results
+
+def bench_cache(repeat: int, sizes_mb: List[float], lookups: int = 1000) -> List[Dict]:
+    """Cache key and lookup cost against transcript size."""
+    results = []
+    for size_mb in sizes_mb:
+        context = make_transcript(int(size_mb * MB))
+        cache = ContextCache()
+        cache.cache_response("What is the main topic?", context, "An answer.", video_id="benchmark01")
+
+        results.append(measure(
+            "cache.digest_cold", lambda: cache._generate_key(context), repeat,
+            items=size_mb, unit="MB", size_mb=size_mb
+        ))
+        results.append(measure(
+            "cache.hit_video_id",
+            lambda: [cache.get_response("What is the main topic?", context, "benchmark01") for _ in range(lookups)],
+            repeat, items=lookups, unit="lookups", size_mb=size_mb
+        ))
+        # Same string object, no video ID: served by the identity memo
+        results.append(measure(
+            "cache.hit_identity",
+            lambda: [cache.get_response("What is the main topic?", context) for _ in range(lookups)],
+            repeat, items=lookups, unit="lookups", size_mb=size_mb
+        ))
+        results.append(measure(
+            "cache.miss_video_id",
+            lambda: [cache.get_response(f"Unseen question {i}?", context, "benchmark01") for i in range(lookups)],
+            repeat, items=lookups, unit="lookups", size_mb=size_mb
+        ))
+    return results
+
+def _timestamped(text: str, every: int = 400) -> str:
+    """Insert an ``mm:ss`` timestamp every ``every`` characters."""
+    parts = []
+    for i, start in enumerate(range(0, len(text), every)):
+        parts.append(f"{(i * 4) // 60 % 60:02d}:{(i * 4) % 60:02d} ")
+        parts.append(text[start:start + every])
+    return "".join(parts)
+
+def bench_chunker(repeat: int, sizes_mb: List[float]) -> List[Dict]:
+    """Chunking, timestamp extraction and transcript building on large transcripts."""
+    char_chunker = TextChunker()
+    token_chunker = TextChunker(max_length=8000, token_counter=lambda s: len(s.split()))
+    results = []
+    for size_mb in sizes_mb:
+        text = make_transcript(int(size_mb * MB))
+        results.append(measure(
+            "chunker.spans_characters", lambda: sum(1 for _ in char_chunker.iter_chunk_spans(text)),
+            repeat, items=size_mb, unit="MB", size_mb=size_mb
+        ))
+        results.append(measure(
+            "chunker.chunk_text", lambda: char_chunker.chunk_text(text),
+            repeat, items=size_mb, unit="MB", size_mb=size_mb
+        ))
+        results.append(measure(
+            "chunker.spans_tokens", lambda: sum(1 for _ in token_chunker.iter_chunk_spans(text)),
+            repeat, items=size_mb, unit="MB", size_mb=size_mb
+        ))
+
+        stamped = _timestamped(text)
+        results.append(measure(
+            "chunker.extract_timestamps", lambda: char_chunker.extract_timestamps(stamped),
+            repeat, items=size_mb, unit="MB", size_mb=size_mb
+        ))
+        del stamped
+
+        segments = [
+            {"text": text[start:start + 200], "start": i * 4.0, "duration": 4.0}
+            for i, start in enumerate(range(0, len(text), 200))
+        ]
+        results.append(measure(
+            "transcript.from_segments", lambda: Transcript.from_segments(segments),
+            repeat, items=size_mb, unit="MB", size_mb=size_mb
+        ))
+    return results
+
+def make_rolling_captions(size_bytes: int, seed: int = 0) -> List[Dict]:
+    """
+    Build auto-caption style segments totalling roughly ``size_bytes`` characters.
+
+    Each segment repeats the last few words of the previous one, as rolling
+    captions do, and some carry ``[Music]``-style markers or filler sounds.
+    """
+    rng = random.Random(seed)
+    noise = ["[Music]", "[Applause]", "um", "uh,", "(laughter)", "♪"]
+    segments = []
+    previous: List[str] = []
+    total = 0
+    while total < size_bytes:
+        words = previous[-rng.randint(0, 4):] if previous else []
+        fresh = [rng.choice(WORDS) for _ in range(rng.randint(4, 10))]
+        if rng.random() < 0.3:
+            fresh.insert(rng.randrange(len(fresh) + 1), rng.choice(noise))
+        words = words + fresh
+        text = "  ".join(words) if rng.random() < 0.1 else " ".join(words)
+        segments.append({"text": text, "start": len(segments) * 2.0, "duration": 4.0})
+        previous = fresh
+        total += len(text) + 1
+    return segments
+
+def bench_compactor(repeat: int, sizes_mb: List[float]) -> List[Dict]:
+    """Compaction throughput and reduction on rolling auto-captions."""
+    compactor = TranscriptCompactor()
+    results = []
+    for size_mb in sizes_mb:
+        transcript = Transcript.from_segments(make_rolling_captions(int(size_mb * MB)))
+        # No video ID, so every run compacts instead of hitting the cache
+        result = measure(
+            "compactor.compact", lambda: compactor.compact_with_stats(transcript),
+            repeat, items=size_mb, unit="MB", size_mb=size_mb
+        )
+        stats = compactor.compact_with_stats(transcript)[1]
+        result["byte_reduction"] = stats.byte_reduction
+        result["token_reduction"] = stats.token_reduction
+        results.append(result)
+
+        compactor.compact(transcript, "benchmark01")
+        results.append(measure(
+            "compactor.cached", lambda: compactor.compact(transcript, "benchmark01"),
+            repeat, trace_memory=False, size_mb=size_mb
+        ))
+    return results
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def compare(results: List[Dict], baseline_path: str, threshold: float) -> int:
+    """
+    Print each benchmark's change against a baseline file.
+
+    Returns:
+        int: Number of benchmarks slower than the baseline by more than ``threshold``
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {
+            (row["name"], json.dumps(row["params"], sort_keys=True)): row
+            for row in json.load(f)["results"]
+        }
+
+    regressions = 0
+    for row in results:
+        previous = baseline.get((row["name"], json.dumps(row["params"], sort_keys=True)))
+        if previous is None:
+            continue
+        change = row["best_s"] / previous["best_s"] - 1 if previous["best_s"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        params = " ".join(f"{key}={value}" for key, value in row["params"].items())
+        print(f"{row['name']:<34} {params:<34} {change:>+8.1%}{flag}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", nargs="+", choices=SUITES, help="Suites to run (default: all)")
+    parser.add_argument("--sizes", nargs="+", type=float, default=DEFAULT_SIZES_MB,
+                        help="Transcript sizes in MB for the cache, chunker and compactor suites")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown reported as a regression (default 0.1)")
+    args = parser.parse_args(argv)
+
+    # Simulated rate limits would otherwise log every retry
+    logging.basicConfig(level=logging.ERROR)
+
+    # Benchmarks measure the code, not whatever an earlier run left on disk
+    settings.CACHE_BACKEND = "memory"
+
+    suites = args.only or SUITES
+    results = []
+    if "batch" in suites:
+        results.extend(bench_batch(args.repeat))
+    if "cache" in suites:
+        results.extend(bench_cache(args.repeat, args.sizes))
+    if "chunker" in suites:
+        results.extend(bench_chunker(args.repeat, args.sizes))
+    if "compactor" in suites:
+        results.extend(bench_compactor(args.repeat, args.sizes))
+
+    if args.output:
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,115 @@
-import os
-from dotenv import load_dotenv
-from pydantic_settings import BaseSettings
-
-# Load environment variables
-load_dotenv()
-
-class Settings(BaseSettings):
-    # API Configuration
-    google_api_key: str = os.getenv("google_api_key", "")
-    
-    # Model Configuration
-    MODEL_NAME: str = "gemini-1.5-pro"
-    MAX_TOKENS: int = 2048
-    TEMPERATURE: float = 0.7
-    
-    # Batch Processing Configuration
-    BATCH_SIZE: int = 5
-    MAX_RETRIES: int = 3
-    
-    # Context Configuration
-    MAX_CONTEXT_LENGTH: int = 30000  # Maximum context length in characters
-    CHUNK_OVERLAP: int = 500  # Overlap between chunks in characters
-    
-    # Cache Configuration
-    CACHE_TTL: int = 3600  # Cache time-to-live in seconds
-    
-    class Config:
-        env_file = ".env"
-
+import os
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings
+
+# Load environment variables
+load_dotenv()
+
+class Settings(BaseSettings):
+    # API Configuration
+    google_api_key: str = os.getenv("google_api_key", "")
+    
+    # Model Configuration
+    MODEL_NAME: str = "gemini-1.5-pro"
+    FAST_MODEL_NAME: str = "gemini-1.5-flash"  # Cheaper tier for simple questions
+    MAX_TOKENS: int = 2048
+    TEMPERATURE: float = 0.7
+    MODEL_BACKEND: str = "gemini"  # "gemini" or "fake" (offline, deterministic answers)
+    FAKE_MODEL_LATENCY: float = 0.0  # Simulated seconds per request for the fake backend
+    
+    # Batch Processing Configuration
+    BATCH_SIZE: int = 5  # Maximum number of model requests in flight at once
+    MAX_RETRIES: int = 3
+    REQUEST_TIMEOUT: float = 120.0  # Per-request timeout in seconds
+    
+    # Bulk (Batch Prediction) Configuration
+    BULK_WORK_DIR: str = ".cache/batch_jobs"  # Batch input and result files
+    BULK_POLL_INTERVAL: float = 10.0  # First delay between job status checks, in seconds
+    BULK_POLL_MAX_INTERVAL: float = 300.0
+    BULK_JOB_TIMEOUT: float = 24 * 3600.0
+    
+    # Rate Limiting Configuration (shared by all model calls in a process)
+    RATE_LIMIT_RPM: int = 60  # Requests per minute, 0 for unlimited
+    RATE_LIMIT_TPM: int = 1000000  # Input tokens per minute, 0 for unlimited
+    RETRY_BASE_DELAY: float = 1.0  # Backoff before the first retry in seconds
+    RETRY_MAX_DELAY: float = 30.0
+    CIRCUIT_BREAKER_THRESHOLD: int = 5  # Consecutive failures before pausing calls
+    CIRCUIT_BREAKER_RESET: float = 30.0  # Seconds before a trial call is allowed
+    
+    # Context Configuration
+    MAX_CONTEXT_LENGTH: int = 30000  # Maximum context length in characters
+    CHUNK_OVERLAP: int = 500  # Overlap between chunks in characters
+    
+    # Strategy Routing Configuration (used by strategy="auto"; sizes in tokens)
+    ROUTER_SHORT_CONTEXT_TOKENS: int = 32000  # Up to this, questions are packed into full-context calls
+    ROUTER_RETRIEVAL_TOKENS: int = 128000  # Above this, uncached contexts use retrieval
+    ROUTER_MAX_CONTEXT_TOKENS: int = 1000000  # Model input window
+    ROUTER_SIMPLE_QUESTION_WORDS: int = 12  # Longest question that may go to the fast model
+    
+    # Retrieval Configuration
+    RETRIEVAL_CHUNK_SIZE: int = 2000  # Size of retrievable chunks in characters
+    RETRIEVAL_CHUNK_OVERLAP: int = 200
+    RETRIEVAL_TOP_K: int = 4  # Chunks sent with each question
+    
+    # Cache Configuration
+    CACHE_TTL: int = 3600  # Cache time-to-live in seconds
+    CACHE_MAX_ENTRIES: int = 100  # Entries kept in the in-memory tier
+    CACHE_BACKEND: str = "sqlite"  # Persistent tier: "sqlite" or "memory" (none)
+    CACHE_DB_PATH: str = ".cache/context_cache.db"
+    CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # Byte budget for the persistent tier
+    
+    # Transcript Store Configuration
+    TRANSCRIPT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # In-memory budget for transcripts
+    TRANSCRIPT_STORE_PERSISTENT: bool = True  # Keep compressed transcripts in the cache database
+    TRANSCRIPT_STORE_MAX_BYTES: int = 512 * 1024 * 1024
+    TRANSCRIPT_TTL: int = 7 * 24 * 3600
+    TRANSCRIPT_PREFETCH_WORKERS: int = 8
+    
+    # Transcript Compaction Configuration (applied before transcripts reach the model)
+    COMPACTION_ENABLED: bool = True
+    COMPACTION_STRIP_MARKERS: bool = True  # [Music], [Applause], (laughter), ♪
+    COMPACTION_STRIP_FILLERS: bool = True  # um, uh, erm, hmm
+    COMPACTION_DEDUPE_OVERLAP: bool = True  # Words repeated from the previous rolling caption
+    COMPACTION_CACHE_SIZE: int = 128  # Compacted transcripts kept in memory
+    
+    # Conversation History Configuration (per session)
+    CONVERSATION_MAX_TURNS: int = 50  # Turns kept in memory; older ones spill to the cache database
+    CONVERSATION_MAX_BYTES: int = 1024 * 1024  # Characters of question and answer text kept in memory
+    CONVERSATION_TTL: int = 24 * 3600  # Lifetime of spilled turns
+    CONVERSATION_PAGE_SIZE: int = 10  # Turns rendered per history page
+    CONVERSATION_MAX_SESSIONS: int = 256  # Conversations ContextCache keeps before dropping the oldest
+    
+    # Multi-turn Session Configuration (BatchProcessor.start_session)
+    SESSION_HISTORY_TOKENS: int = 4000  # Verbatim history sent with each turn before older turns are summarized
+    SESSION_SUMMARY_TOKENS: int = 512  # Longest running summary of the older turns
+    
+    # Semantic Cache Configuration
+    SEMANTIC_CACHE_ENABLED: bool = False  # Off by default: the local encoder only matches rewordings, not synonyms
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9  # Minimum cosine similarity to reuse an answer
+    SEMANTIC_CACHE_ENCODER: str = "hashing"  # "hashing" (local) or "gemini" (embedding API)
+    
+    # Server-side Context Caching Configuration
+    CONTEXT_CACHE_ENABLED: bool = True
+    CONTEXT_CACHE_MODEL_NAME: str = ""  # Empty: versioned MODEL_NAME (caching requires a versioned model)
+    CONTEXT_CACHE_MIN_LENGTH: int = 131072  # ~32k tokens, the smallest context the API will cache
+    
+    # Prefetch Configuration (speculative answers to suggested questions)
+    PREFETCH_ENABLED: bool = True
+    PREFETCH_WORKERS: int = 2  # Suggested questions answered at once, shared by all sessions
+    PREFETCH_SESSION_TOKEN_BUDGET: int = 500000  # Estimated tokens a session may spend on prefetching
+    
+    # HTTP Service Configuration (service.py)
+    SERVICE_URL: str = ""  # When set, the Streamlit app calls this service instead of the model directly
+    SERVICE_HOST: str = "127.0.0.1"
+    SERVICE_PORT: int = 8000
+    SERVICE_WORKERS: int = 1  # Worker processes; rate limits are split evenly between them (must match uvicorn --workers)
+    SERVICE_MAX_CONCURRENT_REQUESTS: int = 32  # Requests in progress per worker
+    SERVICE_QUEUE_TIMEOUT: float = 5.0  # Seconds a request waits for a slot before a 503
+    
+    # Metrics Configuration
+    METRICS_ENABLED: bool = True  # False swaps every metric for a no-op
+    
+    class Config:
+        env_file = ".env"
+
 settings = Settings() 
\ No newline at end of file
@@ -0,0 +1,6 @@
+import os
+
+# Lets the tests import config and utils when pytest is run from the project root.
+# Tests run offline and must not write the cache database into the working tree.
+os.environ.setdefault("MODEL_BACKEND", "fake")
+os.environ.setdefault("CACHE_BACKEND", "memory")
@@ -0,0 +1,265 @@
+"""
+Async HTTP API over YouTubeHandler, BatchProcessor and ContextCache.
+
+Run from the project root:
+    python service.py                                # SERVICE_HOST/PORT/WORKERS from settings
+    MODEL_BACKEND=fake python service.py             # Offline, for load testing
+    SERVICE_WORKERS=4 uvicorn service:app --workers 4
+
+Workers cannot see uvicorn's ``--workers``; they split the model rate limits
+by ``SERVICE_WORKERS``. ``python service.py`` starts that many workers, so
+prefer it; when starting uvicorn directly, set ``SERVICE_WORKERS`` to the same
+number as ``--workers`` or every worker uses the full quota.
+
+Each worker process builds one BatchProcessor at startup and reuses its model
+clients for every request. Workers share the persistent cache database
+(responses and transcripts), so an answer computed by one worker is a cache
+hit for the others, and the model rate limits are split evenly between them.
+Server-side cached contexts are not shared: each worker uploads its own copy
+of a long transcript the first time it answers about that video, so with N
+workers a video can hold up to N cached contexts (each billed for storage
+until ``CACHE_TTL`` expires). Route requests for one video to the same
+worker, or run fewer workers, if that matters.
+Each worker admits at most ``SERVICE_MAX_CONCURRENT_REQUESTS`` requests at a
+time; a request that cannot get a slot within ``SERVICE_QUEUE_TIMEOUT``
+seconds is rejected with 503 so a load balancer can send it elsewhere.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterator, List, Literal, Tuple
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from config import settings
+from utils.batch_processor import BatchProcessor, StreamEvent
+from utils.router import (
+    STRATEGY_AUTO, STRATEGY_INDIVIDUAL, STRATEGY_MAP_REDUCE, STRATEGY_PACKED, STRATEGY_RETRIEVAL
+)
+from utils.context_cache import context_cache
+from utils.metrics import SERVICE_REJECTED, SERVICE_REQUEST_SECONDS, registry
+from utils.scheduler import RequestScheduler
+from utils.youtube_handler import YouTubeHandler
+
+logger = logging.getLogger(__name__)
+
+_VIDEO_ID_PATTERN = re.compile(r"^[\w-]{11}$")
+
+class TranscriptRequest(BaseModel):
+    video: str  # URL or video ID
+
+class SuggestRequest(BaseModel):
+    video: str
+    limit: int = Field(default=5, ge=1, le=20)
+
+class AnswerRequest(BaseModel):
+    video: str
+    questions: List[str] = Field(min_length=1)
+    # Anything else is rejected with 422 before reaching the processor
+    strategy: Literal[
+        STRATEGY_AUTO, STRATEGY_INDIVIDUAL, STRATEGY_PACKED, STRATEGY_RETRIEVAL, STRATEGY_MAP_REDUCE
+    ] = STRATEGY_AUTO
+
+class ConcurrencyLimiter:
+    """Caps the requests a worker has in progress, rejecting those that wait too long for a slot."""
+
+    def __init__(self, limit: int, timeout: float):
+        """
+        Args:
+            limit (int): Requests in progress at once
+            timeout (float): Seconds to wait for a slot before rejecting the request
+        """
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def acquire(self, endpoint: str) -> None:
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            SERVICE_REJECTED.inc(endpoint=endpoint)
+            raise HTTPException(status_code=503, detail="Server busy", headers={"Retry-After": "1"})
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+def _per_worker(limit: int, workers: int) -> int:
+    """Split a per-minute budget between workers; 0 stays unlimited."""
+    return max(1, limit // workers) if limit else 0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = max(1, settings.SERVICE_WORKERS)
+    if settings.MODEL_BACKEND == "fake":
+        # Load tests should not call YouTube either, and the fake model has no quota to protect
+        from utils.fake_backend import fake_transcript_fetcher
+        fetcher = fake_transcript_fetcher
+        scheduler = RequestScheduler(requests_per_minute=0, tokens_per_minute=0)
+    else:
+        fetcher = None
+        scheduler = RequestScheduler(
+            requests_per_minute=_per_worker(settings.RATE_LIMIT_RPM, workers),
+            tokens_per_minute=_per_worker(settings.RATE_LIMIT_TPM, workers)
+        )
+
+    app.state.youtube_handler = YouTubeHandler(fetcher=fetcher)
+    app.state.batch_processor = BatchProcessor(
+        context_cache=context_cache,
+        scheduler=scheduler,
+        transcript_lookup=app.state.youtube_handler.find_transcript
+    )
+    app.state.limiter = ConcurrencyLimiter(settings.SERVICE_MAX_CONCURRENT_REQUESTS, settings.SERVICE_QUEUE_TIMEOUT)
+    # Suggestions per (video ID, limit), generated once per TTL like the app did
+    app.state.suggestions = TTLCache(maxsize=1024, ttl=settings.CACHE_TTL)
+    app.state.suggestions_lock = threading.Lock()
+    logger.info(f"Service worker ready (model backend: {settings.MODEL_BACKEND})")
+    yield
+
+app = FastAPI(title="Video Content Analysis API", lifespan=lifespan)
+
+def _get_transcript(youtube_handler: YouTubeHandler, video: str) -> Tuple[str, str]:
+    """
+    Get a video's transcript, accepting a URL or a bare video ID.
+
+    Returns:
+        Tuple[str, str]: (video ID, transcript text)
+    """
+    url = f"https://youtu.be/{video}" if _VIDEO_ID_PATTERN.match(video) else video
+    try:
+        video_id = youtube_handler.extract_video_id(url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return video_id, youtube_handler.get_transcript(url)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error getting transcript: {str(e)}")
+
+async def _admitted(request: Request, endpoint: str, fn, *args):
+    """Run blocking work in the thread pool once the concurrency limiter admits the request."""
+    limiter: ConcurrencyLimiter = request.app.state.limiter
+    await limiter.acquire(endpoint)
+    try:
+        with SERVICE_REQUEST_SECONDS.time(endpoint=endpoint):
+            return await run_in_threadpool(fn, *args)
+    finally:
+        limiter.release()
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Per worker process; scrape each worker separately to see them all
+    return registry.render_prometheus()
+
+@app.post("/transcript")
+async def transcript(body: TranscriptRequest, request: Request):
+    youtube_handler: YouTubeHandler = request.app.state.youtube_handler
+    video_id, text = await _admitted(request, "transcript", _get_transcript, youtube_handler, body.video)
+    stats = youtube_handler.compactor.stats(video_id) if youtube_handler.compactor else None
+    return {
+        "video_id": video_id,
+        "transcript": text,
+        "compaction": stats._asdict() if stats else None
+    }
+
+@app.post("/questions/suggest")
+async def suggest_questions(body: SuggestRequest, request: Request):
+    state = request.app.state
+
+    def suggest() -> Tuple[str, List[str]]:
+        video_id, text = _get_transcript(state.youtube_handler, body.video)
+        key = (video_id, body.limit)
+        with state.suggestions_lock:
+            questions = state.suggestions.get(key)
+        if questions is None:
+            questions = state.batch_processor.generate_questions(text, limit=body.limit)
+            # Failed generations are not cached, so the next request retries
+            if questions:
+                with state.suggestions_lock:
+                    state.suggestions[key] = questions
+        return video_id, questions
+
+    video_id, questions = await _admitted(request, "suggest", suggest)
+    return {"video_id": video_id, "questions": questions}
+
+@app.post("/answers")
+async def answers(body: AnswerRequest, request: Request):
+    state = request.app.state
+
+    def answer() -> Tuple[str, dict]:
+        video_id, text = _get_transcript(state.youtube_handler, body.video)
+        return video_id, state.batch_processor.process_questions(
+            body.questions, text, video_id=video_id, strategy=body.strategy
+        )
+
+    video_id, results = await _admitted(request, "answers", answer)
+    return {"video_id": video_id, "answers": results}
+
+async def _ndjson(
+    events: Iterator[StreamEvent], limiter: ConcurrencyLimiter, started_at: float
+) -> AsyncIterator[str]:
+    """
+    Relay stream events as NDJSON lines. While an answer grows, a line carries
+    only the text added since the question's previous event (``delta``); the
+    final event, or one whose text does not extend what was sent (a failed
+    stream replaced by its error), carries the full ``text`` to use instead.
+    Releases the request's slot when the stream ends or the client disconnects.
+    """
+    sent = {}
+    try:
+        async for event in iterate_in_threadpool(events):
+            previous = sent.get(event.question, "")
+            sent[event.question] = event.text
+            line = {"question": event.question, "done": event.done}
+            if event.done or not event.text.startswith(previous):
+                line["text"] = event.text
+            else:
+                line["delta"] = event.text[len(previous):]
+            yield json.dumps(line) + "\n"
+    finally:
+        # Stops the questions still queued if the client went away
+        events.close()
+        limiter.release()
+        SERVICE_REQUEST_SECONDS.observe(time.perf_counter() - started_at, endpoint="answers_stream")
+
+@app.post("/answers/stream")
+async def stream_answers(body: AnswerRequest, request: Request):
+    state = request.app.state
+    limiter: ConcurrencyLimiter = state.limiter
+    await limiter.acquire("answers_stream")
+    started_at = time.perf_counter()
+    try:
+        video_id, text = await run_in_threadpool(_get_transcript, state.youtube_handler, body.video)
+        events = state.batch_processor.stream_questions(
+            body.questions, text, video_id=video_id, strategy=body.strategy
+        )
+    except BaseException:
+        limiter.release()
+        raise
+    return StreamingResponse(
+        _ndjson(events, limiter, started_at),
+        media_type="application/x-ndjson",
+        headers={"X-Video-Id": video_id}
+    )
+
+def main() -> None:
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    # Multiple workers need the app as an import string so each process can load it
+    uvicorn.run(
+        "service:app",
+        host=settings.SERVICE_HOST,
+        port=settings.SERVICE_PORT,
+        workers=max(1, settings.SERVICE_WORKERS)
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import threading
+import time
+import pytest
+from config import settings
+from utils.batch_processor import BatchProcessor
+from utils.context_cache import ContextCache
+from utils.fake_backend import FakeGenerativeModel, FakeResponse
+from utils.router import RouteDecision, RoutingPolicy, STRATEGY_MAP_REDUCE, STRATEGY_PACKED
+from utils.scheduler import RequestScheduler
+
+class MapReducePolicy(RoutingPolicy):
+    def choose(self, questions, context_tokens, cached_context):
+        return RouteDecision(STRATEGY_MAP_REDUCE, context_tokens, False, "test")
+
+class ConcurrencyModel(FakeGenerativeModel):
+    """Fake model that records how many requests it serves at once."""
+
+    def __init__(self, delay: float = 0.02):
+        super().__init__(seed=1)
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._counter_lock = threading.Lock()
+
+    def generate_content(self, contents, **kwargs):
+        with self._counter_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            return super().generate_content(contents, **kwargs)
+        finally:
+            with self._counter_lock:
+                self.active -= 1
+
+class PackedReplyModel(FakeGenerativeModel):
+    """Fake model whose packed (JSON) replies are replaced, counting every request."""
+
+    def __init__(self, packed_reply=None):
+        super().__init__(seed=1)
+        self.packed_reply = packed_reply
+        self.prompts = []
+
+    def _respond(self, prompt, generation_config):
+        self.prompts.append(prompt)
+        packed = generation_config and generation_config.get("response_mime_type") == "application/json"
+        if packed and self.packed_reply is not None:
+            return FakeResponse(self.packed_reply, 0)
+        return super()._respond(prompt, generation_config)
+
+def make_processor(model=None, **kwargs) -> BatchProcessor:
+    model = model or FakeGenerativeModel(seed=1)
+    return BatchProcessor(
+        model=model, fast_model=model, context_cache=ContextCache(semantic_cache=None),
+        scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0), **kwargs
+    )
+
+LONG_CONTEXT = "The speaker explains the topic in detail. " * (settings.MAX_CONTEXT_LENGTH // 20)
+
+def test_map_reduce_pool_fans_out_chunks_for_one_question():
+    processor = make_processor(batch_size=8)
+    chunks = len(processor._get_context_chunks(LONG_CONTEXT))
+    assert chunks > 1
+    assert processor._pool_size(STRATEGY_MAP_REDUCE, ["q"], LONG_CONTEXT) == min(8, chunks)
+    assert processor._pool_size("individual", ["q"], LONG_CONTEXT) == 1
+
+def test_stream_handles_a_map_reduce_route():
+    questions = ["What is the topic?", "Who is speaking?"]
+    expected = make_processor(routing_policy=MapReducePolicy()).process_questions(
+        questions, LONG_CONTEXT, strategy="auto"
+    )
+    events = list(make_processor(routing_policy=MapReducePolicy()).stream_questions(
+        questions, LONG_CONTEXT, strategy="auto"
+    ))
+    assert all(event.done for event in events)
+    assert {event.question: event.text for event in events} == expected
+
+def test_unknown_strategy_is_rejected():
+    processor = make_processor()
+    with pytest.raises(ValueError):
+        processor.process_questions(["q"], "context", strategy="bogus")
+    with pytest.raises(ValueError):
+        list(processor.stream_questions(["q"], "context", strategy="bogus"))
+
+def test_answers_keep_the_order_questions_were_asked():
+    processor = make_processor(batch_size=4)
+    processor.context_cache.cache_response("Question 5?", "context", "cached answer")
+    questions = [f"Question {i}?" for i in range(10, 0, -1)] + ["Question 3?"]
+    results = processor.process_questions(questions, "context")
+    assert list(results) == list(dict.fromkeys(questions))
+    assert results["Question 5?"] == "cached answer"
+    assert all(results[question].endswith(question) for question in results if question != "Question 5?")
+
+def test_requests_in_flight_are_bounded_by_batch_size():
+    model = ConcurrencyModel()
+    processor = make_processor(model, batch_size=3)
+    processor.process_questions([f"Question {i}?" for i in range(12)], "context")
+    assert 1 < model.max_active <= 3
+
+def test_packed_questions_share_one_request():
+    model = PackedReplyModel()
+    questions = [f"Question {i}?" for i in range(5)]
+    results = make_processor(model, batch_size=5).process_questions(questions, "context", strategy=STRATEGY_PACKED)
+    assert len(model.prompts) == 1
+    assert list(results) == questions
+    assert all(results[question].endswith(question) for question in questions)
+
+@pytest.mark.parametrize("packed_reply, fallbacks", [
+    ("not json", 3),
+    ('[{"index": 1, "answer": "One"}, {"index": 9, "answer": "Out of range"}, {"index": 3, "answer": ""}]', 2),
+])
+def test_questions_missing_from_a_packed_reply_are_asked_one_by_one(packed_reply, fallbacks):
+    model = PackedReplyModel(packed_reply)
+    questions = ["First?", "Second?", "Third?"]
+    results = make_processor(model, batch_size=3).process_questions(questions, "context", strategy=STRATEGY_PACKED)
+    assert len(model.prompts) == 1 + fallbacks
+    assert list(results) == questions
+    if fallbacks < 3:
+        assert results["First?"] == "One"
+    assert results["Third?"].endswith("Third?")
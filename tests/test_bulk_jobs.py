@@ -0,0 +1,88 @@
+import json
+import os
+from utils.bulk_jobs import (
+    BatchPredictionClient, BulkProcessor, JOB_STATE_EXPIRED, LocalBatchClient
+)
+from utils.context_cache import ContextCache
+from utils.fake_backend import fake_transcript_fetcher
+from utils.job_runner import JobRunner
+from utils.youtube_handler import YouTubeHandler
+
+class ExpiringClient(BatchPredictionClient):
+    """Accepts jobs that never produce results."""
+
+    def __init__(self):
+        self.inputs = []
+
+    def submit(self, input_path, model_name):
+        with open(input_path, encoding="utf-8") as f:
+            self.inputs.append([json.loads(line) for line in f])
+        return "batches/expired"
+
+    def get_state(self, job_name):
+        return JOB_STATE_EXPIRED
+
+    def download_results(self, job_name, destination):
+        raise AssertionError("expired jobs have no results")
+
+def make_processor(client, tmp_path, **kwargs) -> BulkProcessor:
+    return BulkProcessor(
+        client=client, context_cache=ContextCache(semantic_cache=None),
+        work_dir=str(tmp_path / "jobs"), poll_interval=0.01, **kwargs
+    )
+
+def test_questions_are_grouped_per_video(tmp_path):
+    client = ExpiringClient()
+    processor = make_processor(client, tmp_path, group_size=4)
+    processor.process_many([
+        ("video1", "transcript one", [f"Question {i}?" for i in range(6)]),
+        ("video2", "transcript two", ["Question?"])
+    ])
+    lines = client.inputs[0]
+    assert len(lines) == 3  # 4 + 2 questions about video1, 1 about video2
+    prompts = [line["request"]["contents"][0]["parts"][0]["text"] for line in lines]
+    assert sum(prompt.count("transcript one") for prompt in prompts) == 2
+
+def test_failed_job_answers_with_errors_and_cleans_up(tmp_path):
+    processor = make_processor(ExpiringClient(), tmp_path)
+    results = processor.process_questions(["What?", "Why?"], "transcript", video_id="video1")
+    assert list(results) == ["What?", "Why?"]
+    assert all(answer.startswith("Error:") and "JOB_STATE_EXPIRED" in answer for answer in results.values())
+    assert os.listdir(tmp_path / "jobs") == []
+
+def test_local_job_round_trip(tmp_path):
+    processor = make_processor(LocalBatchClient(work_dir=str(tmp_path)), tmp_path, group_size=2)
+    questions = ["What is the topic?", "Who speaks?", "When was it recorded?"]
+    results = processor.process_questions(questions, "transcript", video_id="video1")
+    assert list(results) == questions
+    assert all(answer.startswith("Fake answer") for answer in results.values())
+    assert processor.context_cache.get_response("Who speaks?", "transcript", "video1") == results["Who speaks?"]
+    assert [name for name in os.listdir(tmp_path / "jobs") if name.endswith(".jsonl")] == []
+
+def test_run_bulk_writes_failures_for_an_expired_job(tmp_path):
+    output_path = str(tmp_path / "results.jsonl")
+    runner = JobRunner(None, YouTubeHandler(fetcher=fake_transcript_fetcher), output_path)
+    stats = runner.run_bulk(
+        [{"video": "abcdefghijk", "questions": ["What?", "Why?"]}],
+        make_processor(ExpiringClient(), tmp_path)
+    )
+    with open(output_path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert stats.failed == 2
+    assert [(row["question"], row["ok"]) for row in rows] == [("What?", False), ("Why?", False)]
+
+def test_input_is_written_as_items_are_read(tmp_path):
+    processor = make_processor(ExpiringClient(), tmp_path, group_size=2)
+    written = []
+
+    def items():
+        for i in range(3):
+            input_files = [name for name in os.listdir(tmp_path / "jobs") if name.endswith("-input.jsonl")]
+            if input_files:
+                with open(tmp_path / "jobs" / input_files[0], encoding="utf-8") as f:
+                    written.append(f.read().count("\n"))
+            yield f"video{i}", f"transcript {i}", ["What?", "Why?", "How?"]
+
+    processor.process_many(items())
+    # Two requests per video are on disk before the next video's transcript is read
+    assert written == [0, 2, 4]
@@ -0,0 +1,73 @@
+import pytest
+from utils import cache_backends
+from utils.cache_backends import SQLiteCacheBackend
+from utils.context_cache import ContextCache
+
+class Clock:
+    """Stands in for the time module so tests control expiry and access order."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_backends, "time", clock)
+    return clock
+
+def make_backend(tmp_path, **kwargs) -> SQLiteCacheBackend:
+    return SQLiteCacheBackend(path=str(tmp_path / "cache.db"), **kwargs)
+
+def stored_bytes(backend: SQLiteCacheBackend) -> int:
+    return backend._connection().execute(f"SELECT COALESCE(SUM(size), 0) FROM {backend.table}").fetchone()[0]
+
+def test_triggers_keep_the_byte_total(tmp_path, clock):
+    backend = make_backend(tmp_path, max_bytes=10**6, ttl=60)
+    backend.set("a", b"x" * 10)
+    backend.set("b", b"x" * 20)
+    backend.set("a", b"x" * 5)  # Overwrite
+    backend.delete("b")
+    assert backend._total_bytes(backend._connection()) == stored_bytes(backend) == 5
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path, clock):
+    backend = make_backend(tmp_path, max_bytes=100, ttl=3600)
+    backend.ACCESS_RESOLUTION = 0
+    for key in "abc":
+        backend.set(key, b"x" * 30)
+        clock.now += 1
+    backend.get("a")  # Now more recent than b and c
+    clock.now += 1
+    backend.set("d", b"x" * 30)
+    assert backend.get("b") is None
+    assert all(backend.get(key) is not None for key in "acd")
+    assert stored_bytes(backend) <= 100
+
+def test_expired_entries_are_dropped_on_read(tmp_path, clock):
+    backend = make_backend(tmp_path, max_bytes=10**6, ttl=10)
+    backend.set("a", b"value")
+    clock.now += 9
+    assert backend.get("a") == b"value"
+    clock.now += 2
+    assert backend.get("a") is None
+    assert stored_bytes(backend) == 0
+
+def test_expired_entries_are_evicted_before_live_ones(tmp_path, clock):
+    backend = make_backend(tmp_path, max_bytes=60, ttl=100)
+    backend.set("live", b"x" * 30)
+    clock.now += 5
+    backend.ttl = 10
+    backend.set("expiring", b"x" * 30)  # Used more recently than "live"
+    clock.now += 11
+    backend.set("new", b"x" * 30)
+    assert backend.get("live") is not None
+    assert backend.get("new") is not None
+    assert backend._total_bytes(backend._connection()) == 60
+
+def test_answers_survive_a_restart(tmp_path):
+    question, context = "What is it about?", "transcript"
+    ContextCache(backend=make_backend(tmp_path), semantic_cache=None).cache_response(question, context, "answer")
+    reopened = ContextCache(backend=make_backend(tmp_path), semantic_cache=None)
+    assert reopened.get_response(question, context) == "answer"
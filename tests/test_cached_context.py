@@ -0,0 +1,71 @@
+import threading
+import time
+from utils.cached_context import CachedContextManager
+
+class StubCachedContent:
+    def __init__(self, display_name: str):
+        self.display_name = display_name
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+class StubCachingAPI:
+    """Records uploads; each takes ``latency`` seconds."""
+
+    def __init__(self, latency: float = 0.1):
+        self.latency = latency
+        self.created = []
+        self._lock = threading.Lock()
+
+    def create(self, model, display_name, system_instruction, contents, ttl):
+        time.sleep(self.latency)
+        cached_content = StubCachedContent(display_name)
+        with self._lock:
+            self.created.append(cached_content)
+        return cached_content
+
+def make_manager(api: StubCachingAPI, ttl: int = 3600) -> CachedContextManager:
+    return CachedContextManager(
+        model_name="models/test", ttl=ttl, min_context_length=10,
+        caching_api=api, model_factory=lambda cached_content: ("model", cached_content)
+    )
+
+def run_concurrently(fn, args_list):
+    results = [None] * len(args_list)
+
+    def run(i):
+        results[i] = fn(*args_list[i])
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(args_list))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_requests_for_one_video_share_an_upload():
+    api = StubCachingAPI()
+    manager = make_manager(api)
+    models = run_concurrently(manager.get_model, [("video1", "transcript " * 10)] * 8)
+    assert len(api.created) == 1
+    assert all(model is models[0] for model in models)
+
+def test_uploads_for_different_videos_run_in_parallel():
+    api = StubCachingAPI(latency=0.2)
+    manager = make_manager(api)
+    started_at = time.monotonic()
+    run_concurrently(manager.get_model, [(f"video{i}", "transcript " * 10) for i in range(4)])
+    assert len(api.created) == 4
+    assert time.monotonic() - started_at < 0.6
+
+def test_expired_entries_are_dropped():
+    api = StubCachingAPI(latency=0)
+    manager = make_manager(api, ttl=0)
+    manager.get_model("video1", "transcript " * 10)
+    manager.get_model("video2", "transcript " * 10)
+    assert list(manager._entries) == ["video2"]
+
+def test_short_contexts_are_not_cached():
+    api = StubCachingAPI(latency=0)
+    assert make_manager(api).get_model("video1", "short") is None
+    assert api.created == []
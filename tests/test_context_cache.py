@@ -0,0 +1,14 @@
+from utils.context_cache import ContextCache
+
+def test_digest_follows_the_video_text():
+    cache = ContextCache(semantic_cache=None)
+    old = "a" * 1000
+    new = "b" * 1000  # Same length, different transcript
+    assert cache.context_digest(old, "video01") != cache.context_digest(new, "video01")
+    assert cache.context_digest("".join(["a"] * 1000), "video01") == cache.context_digest(old)
+
+def test_answers_do_not_outlive_a_changed_transcript():
+    cache = ContextCache(semantic_cache=None)
+    cache.cache_response("What is it about?", "x" * 500, "old answer", video_id="video01")
+    assert cache.get_response("What is it about?", "y" * 500, video_id="video01") is None
+    assert cache.get_response("What is it about?", "x" * 500, video_id="video01") == "old answer"
@@ -0,0 +1,52 @@
+import pytest
+from utils.cache_backends import SQLiteCacheBackend
+from utils.conversation_store import AnswerPool, ConversationStore
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteCacheBackend(path=str(tmp_path / "cache.db"), table="conversations")
+
+def fill(store: ConversationStore, turns: int) -> None:
+    for i in range(turns):
+        store.add(f"question {i}", f"answer {i}", video_id="video01")
+
+def test_spilled_turns_are_paged_back_from_the_backend(backend):
+    store = ConversationStore(max_turns=3, max_bytes=10**6, backend=backend, pool=AnswerPool())
+    fill(store, 7)
+    assert len(store) == 7
+    assert len(store.recent(10)) == 3
+    assert store.page_count(page_size=3) == 3
+    assert [turn.question for turn in store.page(0, page_size=3)] == ["question 6", "question 5", "question 4"]
+    assert [turn.question for turn in store.page(1, page_size=3)] == ["question 3", "question 2", "question 1"]
+    assert [turn.question for turn in store.page(2, page_size=3)] == ["question 0"]
+
+def test_without_a_backend_dropped_turns_are_not_counted():
+    # CACHE_BACKEND=memory: no persistent tier to page old turns back from
+    store = ConversationStore(max_turns=3, max_bytes=10**6, backend=None, pool=AnswerPool())
+    assert store.backend is None
+    fill(store, 7)
+    assert len(store) == 3
+    assert store.page_count(page_size=3) == 1
+    assert [turn.question for turn in store.page(0, page_size=3)] == ["question 6", "question 5", "question 4"]
+
+def test_byte_limit_spills_oldest_turns(backend):
+    store = ConversationStore(max_turns=100, max_bytes=40, backend=backend, pool=AnswerPool())
+    fill(store, 5)
+    assert store.size <= 40
+    assert len(store) == 5
+    assert [turn.question for turn in store.page(0, page_size=5)][-1] == "question 0"
+
+def test_identical_answers_share_one_copy(backend):
+    pool = AnswerPool()
+    store = ConversationStore(backend=backend, pool=pool)
+    store.add("What is it?", "The same answer")
+    store.add("What is this?", "The same answer")
+    assert len(pool) == 1
+
+def test_clear_removes_spilled_turns(backend):
+    store = ConversationStore(max_turns=1, max_bytes=10**6, backend=backend, pool=AnswerPool())
+    fill(store, 3)
+    store.clear()
+    assert len(store) == 0
+    assert store.page(0) == []
+    assert backend.get(f"{store.session_id}:0") is None
@@ -0,0 +1,73 @@
+import json
+import pytest
+from benchmarks.run import compare
+from utils.fake_backend import FakeGenerativeModel, ResourceExhausted, fake_transcript_fetcher
+
+PROMPT = "Context: a talk about caching\n\nQuestion: What is covered?\n\nAnswer:"
+
+def test_answers_are_deterministic():
+    first = FakeGenerativeModel().generate_content(PROMPT)
+    second = FakeGenerativeModel(seed=7).generate_content(PROMPT)
+    assert first.text == second.text
+    assert "What is covered?" in first.text
+    assert first.usage_metadata.prompt_token_count == len(PROMPT) // 4
+    assert first.usage_metadata.total_token_count == (
+        first.usage_metadata.prompt_token_count + first.usage_metadata.candidates_token_count
+    )
+
+def test_packed_request_gets_one_json_answer_per_question():
+    prompt = "Context: a talk\n\nQuestions:\n1. Who spoke?\n2. When was it?\n"
+    response = FakeGenerativeModel().generate_content(
+        prompt, generation_config={"response_mime_type": "application/json"}
+    )
+    answers = json.loads(response.text)
+    assert [answer["index"] for answer in answers] == [1, 2]
+    assert "Who spoke?" in answers[0]["answer"]
+
+def test_rate_limit_errors_are_seeded_and_counted():
+    def failures(seed):
+        model = FakeGenerativeModel(rate_limit_probability=0.5, seed=seed)
+        outcomes = []
+        for _ in range(20):
+            try:
+                model.generate_content(PROMPT)
+                outcomes.append(False)
+            except ResourceExhausted as e:
+                assert e.code == 429
+                outcomes.append(True)
+        return model, outcomes
+
+    model, outcomes = failures(seed=3)
+    assert failures(seed=3)[1] == outcomes
+    assert model.requests == 20
+    assert model.rate_limited == sum(outcomes)
+    assert 0 < model.rate_limited < 20
+
+def test_stream_yields_words_with_usage_on_last_chunk():
+    model = FakeGenerativeModel()
+    chunks = list(model.generate_content(PROMPT, stream=True))
+    assert len(chunks) > 1
+    assert "".join(chunk.text for chunk in chunks) == model.generate_content(PROMPT).text
+    assert chunks[0].usage_metadata.prompt_token_count == 0
+    assert chunks[-1].usage_metadata.prompt_token_count == len(PROMPT) // 4
+
+def test_count_tokens_matches_usage():
+    model = FakeGenerativeModel()
+    assert model.count_tokens(PROMPT).total_tokens == model.generate_content(PROMPT).usage_metadata.prompt_token_count
+    assert model.count_tokens(["Context:", "text"]).total_tokens == model.count_tokens("Context:\ntext").total_tokens
+
+def test_fake_transcript_fetcher_builds_timed_segments():
+    segments = fake_transcript_fetcher("abc", segments=3)
+    assert [segment["start"] for segment in segments] == [0.0, 4.0, 8.0]
+    assert all("abc" in segment["text"] and segment["duration"] == 4.0 for segment in segments)
+    assert fake_transcript_fetcher("abc", segments=3) == segments
+
+@pytest.mark.parametrize("best_s, expected", [(1.05, 0), (1.5, 1)])
+def test_compare_flags_slowdowns_past_threshold(tmp_path, best_s, expected):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": [{"name": "chunker", "params": {"mb": 1}, "best_s": 1.0}]}))
+    results = [
+        {"name": "chunker", "params": {"mb": 1}, "best_s": best_s},
+        {"name": "new", "params": {}, "best_s": 9.0}
+    ]
+    assert compare(results, str(baseline), threshold=0.1) == expected
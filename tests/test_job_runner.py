@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+import pytest
+from utils.fake_backend import fake_transcript_fetcher
+from utils.job_runner import JobRunner, main
+from utils.youtube_handler import YouTubeHandler
+
+class RecordingProcessor:
+    """Answers every question, tracking how many videos are answered at once."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def process_questions(self, questions, context, video_id=None, strategy=None):
+        with self._lock:
+            self.calls.append((video_id, list(questions)))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return {question: f"Answer to {question}" for question in questions}
+
+def video_id(i: int) -> str:
+    return f"video{i:06d}"
+
+def read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def make_runner(processor, output_path, video_workers=2) -> JobRunner:
+    return JobRunner(
+        processor, YouTubeHandler(fetcher=fake_transcript_fetcher), output_path, video_workers=video_workers
+    )
+
+def test_rerun_resumes_without_redoing_answered_pairs(tmp_path):
+    output_path = str(tmp_path / "results.jsonl")
+    make_runner(RecordingProcessor(), output_path).run(
+        [{"video": video_id(0), "questions": ["What?", "Why?"]}]
+    )
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write('{"video_id": "video00')  # A killed run can leave a partial line
+
+    processor = RecordingProcessor()
+    runner = make_runner(processor, output_path)
+    assert runner.load_checkpoint() == 2
+    stats = runner.run([
+        {"video": video_id(0), "questions": ["What?", "Why?", "How?"]},
+        {"video": video_id(1), "questions": ["What?"]}
+    ])
+    assert sorted(processor.calls) == [(video_id(0), ["How?"]), (video_id(1), ["What?"])]
+    assert (stats.answered, stats.skipped, stats.failed) == (2, 2, 0)
+
+def test_videos_in_flight_are_bounded(tmp_path):
+    processor = RecordingProcessor(delay=0.02)
+    pulled = []
+
+    def records():
+        for i in range(12):
+            # Read lazily: at most twice the workers ahead of the videos being answered
+            assert i - len(processor.calls) <= 2 * 2
+            pulled.append(i)
+            yield {"video": video_id(i), "questions": ["What?"]}
+
+    stats = make_runner(processor, str(tmp_path / "results.jsonl"), video_workers=2).run(records())
+    assert len(pulled) == 12
+    assert stats.answered == 12
+    assert processor.max_active <= 2
+
+def test_strategy_must_be_known():
+    with pytest.raises(SystemExit):
+        main(["run", "jobs.jsonl", "--strategy", "fastest"])
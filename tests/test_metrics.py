@@ -0,0 +1,70 @@
+import pytest
+from utils.batch_processor import BatchProcessor
+from utils.context_cache import ContextCache
+from utils.fake_backend import FakeGenerativeModel
+from utils.metrics import (
+    CACHE_REQUESTS, MODEL_CALL_SECONDS, MODEL_TOKENS, Counter, Histogram, MetricsRegistry
+)
+from utils.scheduler import RequestScheduler
+
+def test_counter_values_and_totals_by_label():
+    counter = Counter("requests_total", "Requests")
+    counter.inc(tier="memory", result="hit")
+    counter.inc(2, tier="memory", result="miss")
+    counter.inc(tier="persistent", result="hit")
+    assert counter.value(tier="memory", result="miss") == 2
+    assert counter.total(tier="memory") == 3
+    assert counter.total(result="hit") == 2
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value, strategy="packed")
+    assert histogram.quantile(0.5, strategy="packed") == pytest.approx(1.5)
+    assert histogram.quantile(0.5, strategy="individual") is None
+
+def test_prometheus_rendering():
+    registry = MetricsRegistry()
+    registry.counter("answers_total", "Answers").inc(strategy='say "hi"')
+    registry.histogram("latency_seconds", "Latency", buckets=(1.0,)).observe(2.0)
+    lines = registry.render_prometheus().splitlines()
+    assert "# TYPE answers_total counter" in lines
+    assert 'answers_total{strategy="say \\"hi\\""} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 0' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in lines
+    assert "latency_seconds_count 1" in lines
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    counter = registry.counter("answers_total", "Answers")
+    counter.inc()
+    with registry.histogram("latency_seconds", "Latency").time():
+        pass
+    assert counter.value() == 0
+    assert registry.render_prometheus() == "\n"
+
+def observed(histogram, **labels) -> int:
+    """Number of observations in a histogram series, read from its rendering."""
+    prefix = f"{histogram.name}_count{{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "} "
+    lines = [line for line in histogram.render() if line.startswith(prefix)]
+    return int(lines[0][len(prefix):]) if lines else 0
+
+def test_answering_records_tokens_latency_and_cache_lookups():
+    processor = BatchProcessor(
+        model=FakeGenerativeModel(seed=1), context_cache=ContextCache(semantic_cache=None),
+        scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0)
+    )
+    prompt_tokens = MODEL_TOKENS.value(kind="prompt")
+    response_tokens = MODEL_TOKENS.value(kind="response")
+    calls = observed(MODEL_CALL_SECONDS, outcome="success")
+    misses = CACHE_REQUESTS.value(tier="memory", result="miss")
+    hits = CACHE_REQUESTS.value(tier="memory", result="hit")
+
+    processor.process_questions(["What is the topic?"], "A talk about metrics.")
+    processor.process_questions(["What is the topic?"], "A talk about metrics.")
+
+    assert MODEL_TOKENS.value(kind="prompt") > prompt_tokens
+    assert MODEL_TOKENS.value(kind="response") > response_tokens
+    assert observed(MODEL_CALL_SECONDS, outcome="success") == calls + 1
+    assert CACHE_REQUESTS.value(tier="memory", result="miss") == misses + 1
+    assert CACHE_REQUESTS.value(tier="memory", result="hit") == hits + 1
@@ -0,0 +1,64 @@
+import time
+from utils.batch_processor import BatchProcessor
+from utils.context_cache import ContextCache
+from utils.fake_backend import FakeGenerativeModel
+from utils.prefetcher import AnswerPrefetcher, PrefetchBudget
+from utils.scheduler import RequestScheduler
+
+CONTEXT = "The speaker explains how caching speeds up repeated questions."
+QUESTIONS = ["What is the topic?", "Who is speaking?", "Why cache answers?", "How fast is it?"]
+
+def make_prefetcher(latency: float = 0.0) -> AnswerPrefetcher:
+    model = FakeGenerativeModel(latency=latency, seed=1)
+    return AnswerPrefetcher(BatchProcessor(
+        model=model, fast_model=model, context_cache=ContextCache(semantic_cache=None),
+        scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0)
+    ), max_workers=1)
+
+def cost(prefetcher: AnswerPrefetcher, question: str, questions) -> int:
+    decision, _ = prefetcher.batch_processor.route(questions, CONTEXT, "video000001")
+    return prefetcher.estimate_cost(question, decision)
+
+def test_answered_questions_stay_charged():
+    prefetcher = make_prefetcher()
+    budget = PrefetchBudget(max_tokens=10**6)
+    job = prefetcher.prefetch(QUESTIONS[:2], CONTEXT, "video000001", budget)
+    assert all(job.wait(question, timeout=5) for question in QUESTIONS[:2])
+    assert budget.spent > 0
+    prefetcher.shutdown()
+
+def test_cancelled_questions_are_refunded():
+    prefetcher = make_prefetcher(latency=0.2)
+    budget = PrefetchBudget(max_tokens=10**6)
+    job = prefetcher.prefetch(QUESTIONS, CONTEXT, "video000001", budget)
+    while not job._futures[QUESTIONS[0]].running():
+        time.sleep(0.001)
+    job.cancel()
+    for question in QUESTIONS:
+        job.wait(question, timeout=5)
+    # Only the question already in flight is still charged
+    assert budget.spent == cost(prefetcher, QUESTIONS[0], QUESTIONS)
+    prefetcher.shutdown()
+
+def test_questions_answered_meanwhile_are_refunded():
+    prefetcher = make_prefetcher(latency=0.2)
+    budget = PrefetchBudget(max_tokens=10**6)
+    job = prefetcher.prefetch(QUESTIONS[:2], CONTEXT, "video000001", budget)
+    # The user asks the second question while the first is being prefetched
+    prefetcher.batch_processor.context_cache.cache_response(QUESTIONS[1], CONTEXT, "asked", "video000001")
+    assert job.wait(QUESTIONS[1], timeout=5)
+    job.wait(QUESTIONS[0], timeout=5)
+    assert budget.spent == cost(prefetcher, QUESTIONS[0], QUESTIONS[:2])
+    prefetcher.shutdown()
+
+def test_refunds_make_room_for_later_questions():
+    prefetcher = make_prefetcher(latency=0.2)
+    budget = PrefetchBudget(max_tokens=10**6)
+    job = prefetcher.prefetch(QUESTIONS, CONTEXT, "video000001", budget)
+    budget.max_tokens = budget.spent  # Exactly enough for this video's questions
+    job.cancel()
+    for question in QUESTIONS:
+        job.wait(question, timeout=5)
+    second = prefetcher.prefetch(QUESTIONS[1:3], CONTEXT, "video000002", budget)
+    assert second.skipped == []
+    prefetcher.shutdown()
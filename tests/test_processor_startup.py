@@ -0,0 +1,44 @@
+import pytest
+from config import settings
+from utils import batch_processor
+from utils.batch_processor import BatchProcessor
+
+class ModelListing:
+    """Counts calls to ``genai.list_models``, which is a network round trip."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return []
+
+@pytest.fixture
+def list_models(monkeypatch):
+    listing = ModelListing()
+    monkeypatch.setenv("google_api_key", "test-key")
+    monkeypatch.setattr(settings, "MODEL_BACKEND", "gemini")
+    monkeypatch.setattr(settings, "CONTEXT_CACHE_ENABLED", False)
+    monkeypatch.setattr(batch_processor.genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(batch_processor.genai, "list_models", listing)
+    return listing
+
+def test_startup_does_not_list_models(list_models):
+    processor = BatchProcessor()
+    assert processor.model.model_name.endswith(settings.MODEL_NAME)
+    assert list_models.calls == 0
+
+def test_model_list_is_fetched_once(list_models):
+    processor = BatchProcessor()
+    processor.available_models()
+    processor.available_models()
+    assert list_models.calls == 1
+
+def test_model_list_is_consulted_when_initialization_fails(list_models, monkeypatch):
+    def broken_model(*args, **kwargs):
+        raise ValueError("unknown model")
+
+    monkeypatch.setattr(batch_processor.genai, "GenerativeModel", broken_model)
+    with pytest.raises(ValueError):
+        BatchProcessor()
+    assert list_models.calls == 1
@@ -0,0 +1,44 @@
+from config import settings
+from utils.batch_processor import BatchProcessor
+from utils.context_cache import ContextCache
+from utils.fake_backend import FakeGenerativeModel
+from utils.scheduler import RequestScheduler
+
+class RecordingModel(FakeGenerativeModel):
+    """Fake model that keeps the size of every prompt it is sent."""
+
+    def __init__(self):
+        super().__init__(seed=1)
+        self.prompt_sizes = []
+
+    def generate_content(self, contents, **kwargs):
+        self.prompt_sizes.append(len(self._prompt_text(contents)))
+        return super().generate_content(contents, **kwargs)
+
+def make_processor(model) -> BatchProcessor:
+    return BatchProcessor(
+        model=model, fast_model=model, context_cache=ContextCache(semantic_cache=None),
+        scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0)
+    )
+
+def test_short_transcript_is_not_resent_every_turn():
+    # Too short for a server-side cached context, far longer than a few excerpts
+    transcript = " ".join(f"Part {i} covers topic number {i} in some detail." for i in range(2000))
+    assert len(transcript) < settings.CONTEXT_CACHE_MIN_LENGTH
+    model = RecordingModel()
+    session = make_processor(model).start_session(transcript, video_id="video000001")
+
+    for turn in range(6):
+        session.ask(f"What does part {turn * 300} cover?")
+    # Each turn sends its retrieved excerpts and the bounded history, not the transcript
+    excerpts = settings.RETRIEVAL_TOP_K * settings.RETRIEVAL_CHUNK_SIZE
+    assert max(model.prompt_sizes) < excerpts + 4 * settings.SESSION_HISTORY_TOKENS < len(transcript)
+    assert session.last_prompt_tokens * 4 < len(transcript)
+
+def test_follow_ups_see_earlier_turns():
+    model = RecordingModel()
+    session = make_processor(model).start_session("A short talk about caching.", video_id="video000001")
+    session.ask("What is the talk about?")
+    session.ask("Why does it matter?")
+    assert [question for question, _ in session.turns] == ["What is the talk about?", "Why does it matter?"]
+    assert model.prompt_sizes[1] > model.prompt_sizes[0]
@@ -0,0 +1,97 @@
+import pytest
+from config import settings
+from utils.batch_processor import BatchProcessor, STRATEGY_PACKED
+from utils.cached_context import CachedContextManager, cached_model_name
+from utils.context_cache import ContextCache
+from utils.fake_backend import FakeGenerativeModel
+from utils.router import (
+    STRATEGY_INDIVIDUAL, STRATEGY_RETRIEVAL, TIER_DEFAULT, TIER_FAST, RouteDecision, TokenBudgetPolicy
+)
+from utils.scheduler import RequestScheduler
+
+class RecordingModel(FakeGenerativeModel):
+    """Fake model that keeps the generation config of every request."""
+
+    def __init__(self):
+        super().__init__(seed=1)
+        self.configs = []
+
+    def _respond(self, prompt, generation_config):
+        self.configs.append(generation_config)
+        return super()._respond(prompt, generation_config)
+
+def make_processor(model, fast_model=None, **kwargs) -> BatchProcessor:
+    return BatchProcessor(
+        model=model, fast_model=fast_model or model, context_cache=ContextCache(semantic_cache=None),
+        scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0), **kwargs
+    )
+
+@pytest.fixture
+def policy():
+    return TokenBudgetPolicy(
+        short_context_tokens=1000, retrieval_tokens=10000, max_context_tokens=100000, simple_question_words=5
+    )
+
+@pytest.mark.parametrize("questions, tokens, cached, strategy", [
+    (["a", "b"], 500, False, STRATEGY_PACKED),
+    (["a"], 500, False, STRATEGY_INDIVIDUAL),
+    (["a", "b"], 50000, True, STRATEGY_INDIVIDUAL),
+    (["a", "b"], 5000, False, STRATEGY_INDIVIDUAL),
+    (["a", "b"], 50000, False, STRATEGY_RETRIEVAL),
+    (["a", "b"], 200000, True, STRATEGY_RETRIEVAL),
+])
+def test_strategy_follows_context_tokens(policy, questions, tokens, cached, strategy):
+    assert policy.choose(questions, tokens, cached).strategy == strategy
+
+def test_only_short_lookup_questions_go_to_the_fast_tier(policy):
+    uncached = RouteDecision(STRATEGY_INDIVIDUAL, 5000, False, "")
+    assert policy.question_tier("Who is speaking?", uncached) == TIER_FAST
+    assert policy.question_tier("Why does it fail?", uncached) == TIER_DEFAULT
+    assert policy.question_tier("What are all the tools mentioned in this talk?", uncached) == TIER_DEFAULT
+    cached = RouteDecision(STRATEGY_INDIVIDUAL, 50000, True, "")
+    assert policy.question_tier("Who is speaking?", cached) == TIER_DEFAULT
+
+def test_auto_strategy_sends_simple_questions_to_the_fast_model():
+    model, fast_model = RecordingModel(), RecordingModel()
+    processor = make_processor(model, fast_model)
+    processor.process_questions(["Who is speaking?"], "A short talk.", strategy="auto")
+    processor.process_questions(["Why does the speaker disagree?"], "A short talk.", strategy="auto")
+    assert len(fast_model.configs) == 1
+    assert len(model.configs) == 1
+
+def test_context_tokens_are_counted_once_per_video():
+    model = RecordingModel()
+    counted = []
+    count_tokens = model.count_tokens
+    model.count_tokens = lambda contents: counted.append(contents) or count_tokens(contents)
+    processor = make_processor(model)
+    assert processor.count_context_tokens("A short talk.", "video") == len("A short talk.") // 4
+    processor.count_context_tokens("A short talk.", "video")
+    assert len(counted) == 1
+
+def test_packed_request_allows_max_tokens_per_question():
+    model = RecordingModel()
+    questions = [f"Question {i}?" for i in range(4)]
+    make_processor(model, batch_size=4).process_questions(questions, "context", strategy=STRATEGY_PACKED)
+    assert len(model.configs) == 1
+    assert model.configs[0]["max_output_tokens"] == settings.MAX_TOKENS * 4
+
+@pytest.mark.parametrize("model_name, expected", [
+    ("gemini-1.5-pro", "models/gemini-1.5-pro-002"),
+    ("gemini-1.5-flash", "models/gemini-1.5-flash-002"),
+    ("models/gemini-1.5-pro", "models/gemini-1.5-pro-002"),
+    ("gemini-1.5-pro-001", "models/gemini-1.5-pro-001"),
+    ("gemini-2.0-flash", "models/gemini-2.0-flash"),
+])
+def test_cached_model_name(model_name, expected):
+    assert cached_model_name(model_name) == expected
+
+def test_cached_context_model_follows_model_name(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_NAME", "gemini-1.5-flash")
+    monkeypatch.setattr(settings, "CONTEXT_CACHE_MODEL_NAME", "")
+    manager = CachedContextManager(caching_api=object(), model_factory=lambda cached_content: None)
+    assert manager.model_name == "models/gemini-1.5-flash-002"
+
+    monkeypatch.setattr(settings, "CONTEXT_CACHE_MODEL_NAME", "models/gemini-1.5-pro-001")
+    manager = CachedContextManager(caching_api=object(), model_factory=lambda cached_content: None)
+    assert manager.model_name == "models/gemini-1.5-pro-001"
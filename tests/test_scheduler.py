@@ -0,0 +1,113 @@
+import threading
+import time
+import pytest
+from utils.scheduler import CircuitBreaker, CircuitOpenError, RequestScheduler
+
+class ResourceExhausted(Exception):
+    """Named like the Gemini client's 429 error."""
+    code = 429
+
+class ServiceUnavailable(Exception):
+    code = 503
+
+def make_scheduler(**kwargs) -> RequestScheduler:
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+    return RequestScheduler(requests_per_minute=0, tokens_per_minute=0, base_delay=0.001, max_delay=0.001, **kwargs)
+
+def flaky(errors):
+    """A call that raises the given errors in turn, then succeeds."""
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    return call
+
+def test_rate_limits_do_not_open_the_breaker():
+    scheduler = make_scheduler(max_retries=3)
+    for _ in range(5):
+        assert scheduler.call(flaky([ResourceExhausted()] * 3)) == "ok"
+    assert scheduler.breaker.opened_at is None
+    assert scheduler.breaker.failures == 0
+
+def test_server_errors_open_the_breaker():
+    scheduler = make_scheduler(max_retries=1, breaker_wait=0)
+    with pytest.raises(ServiceUnavailable):
+        scheduler.call(flaky([ServiceUnavailable()] * 2))
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(lambda: "ok")
+
+def test_calls_wait_for_the_half_open_trial():
+    scheduler = make_scheduler(max_retries=1)
+    with pytest.raises(ServiceUnavailable):
+        scheduler.call(flaky([ServiceUnavailable()] * 2))
+    assert scheduler.breaker.opened_at is not None
+
+    results = []
+    started_at = time.monotonic()
+    threads = [threading.Thread(target=lambda: results.append(scheduler.call(lambda: "ok"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["ok"] * 4
+    assert time.monotonic() - started_at >= 0.15
+    assert scheduler.breaker.opened_at is None
+
+def test_rate_limited_trial_frees_the_slot():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()  # Trial in flight
+    breaker.record_rate_limited()
+    assert breaker.allow()
+
+def flaky_stream(errors, chunks=("a", "b")):
+    """A streaming call whose streams raise the given errors in turn before any chunk, then succeed."""
+    errors = list(errors)
+
+    def call():
+        def chunks_until_error():
+            if errors:
+                raise errors.pop(0)
+            yield from chunks
+        return chunks_until_error()
+    return call
+
+def test_stream_errors_before_the_first_chunk_are_retried():
+    scheduler = make_scheduler(max_retries=2)
+    assert list(scheduler.stream(flaky_stream([ServiceUnavailable()]))) == ["a", "b"]
+    assert scheduler.breaker.failures == 0
+
+def test_stream_errors_midway_count_toward_the_breaker():
+    scheduler = make_scheduler(max_retries=3, breaker_wait=0)
+
+    def broken_stream():
+        yield "a"
+        raise ServiceUnavailable()
+
+    for _ in range(2):
+        with pytest.raises(ServiceUnavailable):
+            list(scheduler.stream(broken_stream))
+    assert scheduler.breaker.opened_at is not None
+    with pytest.raises(CircuitOpenError):
+        list(scheduler.stream(flaky_stream([])))
+
+def test_stream_rate_limits_slow_down_requests():
+    scheduler = RequestScheduler(requests_per_minute=60, tokens_per_minute=0, base_delay=0.001, max_delay=0.001)
+    list(scheduler.stream(flaky_stream([ResourceExhausted()])))
+    assert scheduler.request_bucket.rate < 60
+
+def test_token_budget_is_charged_for_input_tokens():
+    class Usage:
+        prompt_token_count = 100
+        candidates_token_count = 900
+        total_token_count = 1000
+
+    class Response:
+        usage_metadata = Usage()
+
+    scheduler = RequestScheduler(requests_per_minute=0, tokens_per_minute=10000)
+    scheduler.call(Response, estimated_tokens=40)
+    assert 9899 <= scheduler.token_bucket.tokens <= 9901
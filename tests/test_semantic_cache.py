@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from utils.semantic_cache import HashingEncoder, QuestionEncoder, SemanticCache, guarded_terms
+
+CONTEXT = "context-digest"
+
+class SynonymEncoder(QuestionEncoder):
+    """Stands in for a learned embedding model: maps synonyms onto the same words first."""
+
+    SYNONYMS = {"primary": "main", "subject": "topic"}
+
+    def __init__(self):
+        self.hashing = HashingEncoder()
+        self.dim = self.hashing.dim
+
+    def encode(self, text: str) -> np.ndarray:
+        words = [self.SYNONYMS.get(word.strip("?").lower(), word) for word in text.split()]
+        return self.hashing.encode(" ".join(words))
+
+@pytest.fixture
+def cache():
+    return SemanticCache(encoder=HashingEncoder(), threshold=0.9)
+
+@pytest.mark.parametrize("cached, asked", [
+    ("What is the main topic?", "what's the main topic of this video"),
+    ("What are the key takeaways?", "What are the key takeaways from the video?"),
+    ("Why isn't it working?", "Why is it not working?"),
+])
+def test_rewording_hits(cache, cached, asked):
+    cache.add(CONTEXT, cached, "answer")
+    assert cache.lookup(CONTEXT, asked) == "answer"
+
+@pytest.mark.parametrize("cached, asked", [
+    ("What advice is given for small businesses?", "What advice is given for large businesses?"),
+    ("What happens before installing the update?", "What happens after installing the update?"),
+    ("What are the 3 main steps?", "What are the 4 main steps?"),
+    ("Does the speaker recommend the product?", "Does the speaker not recommend the product?"),
+    ("Why did the project fail?", "When did the project fail?"),
+    ("What does he think about the plan?", "What does she think about the plan?"),
+    ("How long is the trip from London to Paris?", "How long is the trip to London from Paris?"),
+    ("Should I buy the camera?", "Can I buy the camera?"),
+    ("What did Alice say about the budget?", "What did Bob say about the budget?"),
+])
+def test_contrasting_questions_miss(cache, cached, asked):
+    cache.add(CONTEXT, cached, "answer")
+    assert cache.lookup(CONTEXT, asked) is None
+
+def test_paraphrase_hits_with_semantic_encoder():
+    cache = SemanticCache(encoder=SynonymEncoder(), threshold=0.9)
+    cache.add(CONTEXT, "What is the main topic?", "answer")
+    assert cache.lookup(CONTEXT, "What is the primary subject?") == "answer"
+
+def test_guard_rejects_questions_the_embedding_cannot_tell_apart():
+    encoder = HashingEncoder()
+    cached, asked = "How long is the trip from London to Paris?", "How long is the trip to London from Paris?"
+    assert float(encoder.encode(cached) @ encoder.encode(asked)) > 0.99
+    cache = SemanticCache(encoder=encoder, threshold=0.9)
+    cache.add(CONTEXT, cached, "answer")
+    assert cache.lookup(CONTEXT, asked) is None
+
+def test_threshold_decides_between_content_words():
+    # Same guarded terms, so only the similarity separates these
+    cached, asked = "What advice is given for small businesses?", "What advice is given for large businesses?"
+    assert guarded_terms(cached) == guarded_terms(asked)
+    strict = SemanticCache(encoder=HashingEncoder(), threshold=0.9)
+    loose = SemanticCache(encoder=HashingEncoder(), threshold=0.5)
+    for cache in (strict, loose):
+        cache.add(CONTEXT, cached, "answer")
+    assert strict.lookup(CONTEXT, asked) is None
+    assert loose.lookup(CONTEXT, asked) == "answer"
+
+def test_answers_are_kept_per_context(cache):
+    cache.add(CONTEXT, "What is the main topic?", "answer")
+    assert cache.lookup("other-digest", "What is the main topic?") is None
+
+def test_picks_matching_entry_among_similar_ones(cache):
+    cache.add(CONTEXT, "What advice is given for small businesses?", "small")
+    cache.add(CONTEXT, "What advice is given for large businesses?", "large")
+    assert cache.lookup(CONTEXT, "what advice is given for large businesses") == "large"
+
+def test_oldest_entries_are_replaced_when_full():
+    cache = SemanticCache(encoder=HashingEncoder(), threshold=0.9, max_entries_per_context=2)
+    for i in range(3):
+        cache.add(CONTEXT, f"What happens in chapter {i}?", str(i))
+    assert cache.lookup(CONTEXT, "What happens in chapter 0?") is None
+    assert cache.lookup(CONTEXT, "what happens in chapter 2") == "2"
+
+def test_guarded_terms():
+    assert guarded_terms("What's the main topic of this video?") == ("what",)
+    assert guarded_terms("Why can't he go from Rome to Oslo in 2 days?") == (
+        "why", "can", "not", "he", "from", "rome", "to", "oslo", "2"
+    )
+    assert guarded_terms("It cannot be done") == guarded_terms("It can not be done")
@@ -0,0 +1,63 @@
+import asyncio
+import json
+from service import _ndjson
+from utils.batch_processor import StreamEvent
+from utils.service_client import ServiceClient
+
+class NullLimiter:
+    def release(self):
+        pass
+
+class StreamedResponse:
+    def __init__(self, lines):
+        self.status_code = 200
+        self.lines = lines
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class StreamedSession:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def post(self, url, **kwargs):
+        return StreamedResponse(self.lines)
+
+def relay(events):
+    """NDJSON lines the service sends for a stream of events."""
+    async def collect():
+        # _ndjson closes the event iterator, so it must be a generator
+        generator = (event for event in events)
+        return [line.rstrip("\n") async for line in _ndjson(generator, NullLimiter(), 0.0)]
+
+    return asyncio.run(collect())
+
+def rebuild(lines):
+    client = ServiceClient(base_url="http://service.test")
+    client.session = StreamedSession(lines)
+    return list(client.stream_questions(["q"], "video"))
+
+def test_growing_answer_is_sent_as_deltas():
+    lines = relay([
+        StreamEvent("q", "The answer", False),
+        StreamEvent("q", "The answer is 42", False),
+        StreamEvent("q", "The answer is 42", True)
+    ])
+    assert [json.loads(line).get("delta") for line in lines[:2]] == ["The answer", " is 42"]
+    assert json.loads(lines[-1])["text"] == "The answer is 42"
+    assert rebuild(lines)[-1] == StreamEvent("q", "The answer is 42", True)
+
+def test_error_replacing_partial_answer_is_rebuilt_in_full():
+    lines = relay([
+        StreamEvent("q", "The answer is forty", False),
+        StreamEvent("q", "Error: 503 Service Unavailable", True)
+    ])
+    events = rebuild(lines)
+    assert events[0].text == "The answer is forty"
+    assert events[-1] == StreamEvent("q", "Error: 503 Service Unavailable", True)
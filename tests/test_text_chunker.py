@@ -0,0 +1,45 @@
+import pytest
+from utils.text_chunker import TextChunker
+
+TEXT = " ".join(f"Sentence number {i} says something." for i in range(400))
+
+def test_short_text_is_one_chunk():
+    assert TextChunker(max_length=100, chunk_overlap=10).chunk_text("Short.") == ["Short."]
+
+def test_chunks_cover_the_text_within_the_size_limit():
+    chunker = TextChunker(max_length=500, chunk_overlap=50)
+    spans = list(chunker.iter_chunk_spans(TEXT))
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT)
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        assert end - start <= 500
+        # Consecutive chunks overlap and always move forward
+        assert start < next_start <= end
+        assert end - next_start == 50
+
+def test_chunks_end_on_sentence_boundaries():
+    chunks = TextChunker(max_length=500, chunk_overlap=50).chunk_text(TEXT)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+@pytest.mark.parametrize("overlap", [0, 99, 100, 250])
+def test_overlap_as_large_as_a_chunk_still_advances(overlap):
+    spans = list(TextChunker(max_length=100, chunk_overlap=overlap).iter_chunk_spans("x" * 1000))
+    assert spans[-1][1] == 1000
+    assert all(start < next_start for (start, _), (next_start, _) in zip(spans, spans[1:]))
+
+def test_token_limit_is_respected_with_a_token_counter():
+    def count_words(text):
+        return len(text.split())
+
+    chunker = TextChunker(max_length=60, chunk_overlap=0, token_counter=count_words)
+    chunks = chunker.chunk_text(TEXT)
+    assert len(chunks) > 1
+    assert all(count_words(chunk) <= 60 for chunk in chunks)
+    assert "".join(chunks) == TEXT
+
+def test_extract_timestamps():
+    timestamps = TextChunker().extract_timestamps("0:05 Intro 1:02:03 Deep dive at 12:30 sharp")
+    assert timestamps == [
+        {"timestamp": "0:05", "text": "Intro"},
+        {"timestamp": "1:02:03", "text": "Deep dive at"},
+        {"timestamp": "12:30", "text": "sharp"}
+    ]
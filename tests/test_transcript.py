@@ -0,0 +1,69 @@
+from utils.batch_processor import BatchProcessor
+from utils.context_cache import ContextCache
+from utils.fake_backend import FakeGenerativeModel, fake_transcript_fetcher
+from utils.scheduler import RequestScheduler
+from utils.transcript import Transcript, format_timestamp, link_citations, parse_timestamp
+from utils.youtube_handler import YouTubeHandler
+
+def make_transcript(segments: int = 40) -> Transcript:
+    # Segment i starts at 4 * i seconds and lasts 4 seconds
+    return Transcript.from_segments(fake_transcript_fetcher("abcdefghijk", segments))
+
+def test_segment_lookup_by_time():
+    transcript = make_transcript()
+    assert transcript.segment_at_time(-1) is None
+    assert transcript.segment_at_time(0) == 0
+    assert transcript.segment_at_time(9.5) == 2
+    assert transcript.segment_at_time(10_000) == len(transcript) - 1
+
+def test_span_label_covers_the_span():
+    transcript = make_transcript()
+    start = transcript.offsets[15]
+    end = transcript.offsets[20] - 1
+    assert transcript.time_range(start, end) == (60.0, 80.0)
+    assert transcript.span_label(start, end) == "1:00-1:20"
+
+def test_timestamps_round_trip():
+    for seconds in (0, 59, 65, 3600, 3725):
+        assert parse_timestamp(format_timestamp(seconds)) == seconds
+
+def test_citations_link_to_the_cited_segment():
+    text = link_citations("At [0:09] and [1:05-1:20]; not [9].", make_transcript(), "abcdefghijk")
+    assert "[[0:09]](https://youtu.be/abcdefghijk?t=8)" in text
+    assert "[[1:05-1:20]](https://youtu.be/abcdefghijk?t=64)" in text
+    assert text.endswith("not [9].")
+
+def test_retrieval_excerpts_carry_time_ranges():
+    handler = YouTubeHandler(fetcher=lambda video_id: fake_transcript_fetcher(video_id, 400))
+    text = handler.get_transcript("https://youtu.be/abcdefghijk")
+    assert handler.find_transcript("abcdefghijk", text) is not None
+    assert handler.find_transcript("abcdefghijk", text + " edited") is None
+
+    processor = BatchProcessor(
+        model=FakeGenerativeModel(), context_cache=ContextCache(semantic_cache=None),
+        scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0),
+        transcript_lookup=handler.find_transcript
+    )
+    index = processor._get_retrieval_index(text, "abcdefghijk")
+    assert len(index.chunks) > 1 and all(index.labels)
+    excerpts = processor._retrieval_excerpts("What does segment 350 discuss?", index)
+    cited = next(i for i, chunk in enumerate(index.chunks) if "segment 350 " in chunk)
+    assert f"[{index.labels[cited]}] {index.chunks[cited]}" in excerpts
+    first, last = (parse_timestamp(value) for value in index.labels[cited].split("-"))
+    assert first <= 4 * 350 < last
+
+    unlabelled = BatchProcessor(
+        model=FakeGenerativeModel(), context_cache=ContextCache(semantic_cache=None),
+        scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0)
+    )._get_retrieval_index(text, "abcdefghijk")
+    assert unlabelled.labels is None
+
+def test_segments_can_be_snippet_objects():
+    # youtube-transcript-api 1.x returns snippet objects rather than dicts
+    class Snippet:
+        def __init__(self, text, start, duration):
+            self.text, self.start, self.duration = text, start, duration
+
+    transcript = Transcript.from_segments([Snippet("Hello", 1.0, 2.0), Snippet("world", 3.0, 1.5)])
+    assert transcript.text == "Hello world"
+    assert transcript.time_range(0, len(transcript.text)) == (1.0, 4.5)
@@ -0,0 +1,34 @@
+from utils.transcript import Transcript
+from utils.transcript_compactor import TranscriptCompactor
+
+def make_transcript(*texts: str) -> Transcript:
+    return Transcript.from_segments(
+        [{"text": text, "start": 2.0 * i, "duration": 2.0} for i, text in enumerate(texts)]
+    )
+
+def make_compactor() -> TranscriptCompactor:
+    return TranscriptCompactor(strip_markers=True, strip_fillers=True, dedupe_overlap=True, cache_size=8)
+
+def test_markers_are_removed():
+    compacted = make_compactor().compact(make_transcript("[Music] welcome back ♪♪", "(applause)", "thanks"))
+    assert compacted.text == "welcome back thanks"
+    assert list(compacted.starts) == [0.0, 4.0]
+
+def test_fillers_are_removed_but_words_kept():
+    compacted = make_compactor().compact(make_transcript("um so uh, I like hmm this umbrella"))
+    assert compacted.text == "so I like this umbrella"
+
+def test_rolling_caption_overlap_is_removed():
+    compacted = make_compactor().compact(make_transcript(
+        "today we are going", "we are going to talk about", "to talk about caching"
+    ))
+    assert compacted.text == "today we are going to talk about caching"
+
+def test_changed_transcript_of_same_length_is_compacted_again():
+    compactor = make_compactor()
+    old = make_transcript("[Music] first version")
+    new = make_transcript("[Music] other version")
+    assert len(old.text) == len(new.text)
+    assert compactor.compact(old, "video01").text == "first version"
+    assert compactor.compact(new, "video01").text == "other version"
+    assert compactor.compact(old, "video01").text == "first version"
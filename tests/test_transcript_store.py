@@ -0,0 +1,124 @@
+import threading
+import time
+import zlib
+import pytest
+from config import settings
+from utils.cache_backends import SQLiteCacheBackend
+from utils.fake_backend import fake_transcript_fetcher
+from utils.transcript import Transcript
+from utils.transcript_store import TranscriptStore
+
+def make_transcript(video_id: str, segments: int = 50) -> Transcript:
+    return Transcript.from_segments(fake_transcript_fetcher(video_id, segments))
+
+class StubFetcher:
+    """Counts calls and holds each fetch until released, so callers overlap."""
+
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self.calls = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self) -> Transcript:
+        with self._lock:
+            self.calls += 1
+        self.release.wait(5)
+        return make_transcript(self.video_id)
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCRIPT_STORE_PERSISTENT", False)
+    return TranscriptStore(max_bytes=10 * 1024 * 1024)
+
+def test_concurrent_fetches_are_coalesced(memory_store):
+    fetch = StubFetcher("abc")
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(memory_store.get_or_fetch("abc", fetch)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)  # Let every caller reach the in-flight fetch
+    fetch.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert fetch.calls == 1
+    assert len(results) == 8
+    assert all(result is results[0] for result in results)
+    assert memory_store.get_or_fetch("abc", fetch) is results[0]
+    assert fetch.calls == 1
+
+def test_failed_fetch_reaches_every_waiter_and_is_retried(memory_store):
+    release = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        release.wait(5)
+        raise ConnectionError("transcript API down")
+
+    errors = []
+
+    def get():
+        try:
+            memory_store.get_or_fetch("abc", failing)
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(errors) == 4
+
+    fetch = StubFetcher("abc")
+    fetch.release.set()
+    assert memory_store.get_or_fetch("abc", fetch).text == make_transcript("abc").text
+    assert fetch.calls == 1
+
+def test_lru_evicts_to_the_byte_budget(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCRIPT_STORE_PERSISTENT", False)
+    size = make_transcript("a").nbytes
+    store = TranscriptStore(max_bytes=int(2.5 * size))
+    store.put("a", make_transcript("a"))
+    store.put("b", make_transcript("b"))
+    assert store.get("a") is not None  # Now most recently used
+    store.put("c", make_transcript("c"))
+
+    assert "a" in store and "c" in store
+    assert "b" not in store
+    assert store._size <= store.max_bytes
+
+def test_oversized_transcript_is_still_kept(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCRIPT_STORE_PERSISTENT", False)
+    store = TranscriptStore(max_bytes=1)
+    store.put("a", make_transcript("a"))
+    store.put("b", make_transcript("b"))
+    assert "b" in store and "a" not in store
+
+def test_persistent_round_trip(tmp_path):
+    path = str(tmp_path / "cache.db")
+    original = make_transcript("abc")
+    store = TranscriptStore(backend=SQLiteCacheBackend(path=path, table="transcripts"))
+    store.put("abc", original)
+
+    stored = store.backend.get("abc")
+    assert zlib.decompress(stored) == original.to_bytes()
+    assert len(stored) < len(original.to_bytes())
+
+    # A new store (e.g. after a restart) reads it back without fetching
+    reopened = TranscriptStore(backend=SQLiteCacheBackend(path=path, table="transcripts"))
+    assert "abc" not in reopened
+    fetch = StubFetcher("abc")
+    transcript = reopened.get_or_fetch("abc", fetch)
+    assert fetch.calls == 0
+    assert transcript.text == original.text
+    assert transcript.time_range(0, len(transcript)) == original.time_range(0, len(original))
+    assert "abc" in reopened
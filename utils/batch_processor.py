@@ -1,119 +1,964 @@
-import google.generativeai as genai
-from typing import List, Dict, Optional
-import logging
-from .context_cache import ContextCache
-import os
-
-logger = logging.getLogger(__name__)
-
-class BatchProcessor:
-    def __init__(self):
-        # Initialize Google API
-        api_key = os.getenv('google_api_key')
-        if not api_key:
-            raise ValueError("API key not found. Please set the 'google_api_key' environment variable.")
-            
-        genai.configure(api_key=api_key)
-        
-        # Print first 5 characters of API key for debugging
-        logger.info(f"Using API key starting with: {api_key[:5]}...")
-        
-        # List available models
-        try:
-            models = [m.name for m in genai.list_models()]
-            logger.info(f"Available models: {models}")
-        except Exception as e:
-            logger.error(f"Error listing models: {str(e)}")
-        
-        # Initialize model
-        try:
-            self.model = genai.GenerativeModel('gemini-1.5-pro')
-            logger.info("Successfully initialized Gemini model")
-        except Exception as e:
-            logger.error(f"Error initializing model: {str(e)}")
-            raise
-        
-        # Initialize cache
-        self.context_cache = ContextCache()
-
-    def process_questions(self, questions: List[str], context: str) -> Dict[str, str]:
-        """
-        Process a batch of questions using the context.
-        
-        Args:
-            questions (List[str]): List of questions to process
-            context (str): Context text to use for answering questions
-            
-        Returns:
-            Dict[str, str]: Dictionary mapping questions to answers
-        """
-        try:
-            # Process questions in batches
-            results = {}
-            for question in questions:
-                try:
-                    # Check cache first
-                    cached_response = self.context_cache.get_response(question, context)
-                    if cached_response:
-                        results[question] = cached_response
-                        continue
-                    
-                    # Generate response
-                    response = self.model.generate_content(
-                        f"Context: {context}\n\nQuestion: {question}\n\nAnswer:"
-                    )
-                    
-                    if response and response.text:
-                        # Cache the response
-                        self.context_cache.cache_response(question, context, response.text)
-                        results[question] = response.text
-                    else:
-                        results[question] = "Failed to generate response."
-                        
-                except Exception as e:
-                    logger.error(f"Error processing question '{question}': {str(e)}")
-                    results[question] = f"Error: {str(e)}"
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"Error in batch processing: {str(e)}")
-            raise
-
-    def generate_questions(self, context: str, limit: int = 5) -> List[str]:
-        """
-        Generate relevant questions based on the context.
-        
-        Args:
-            context (str): Context text to generate questions from
-            limit (int): Maximum number of questions to generate
-            
-        Returns:
-            List[str]: List of generated questions
-        """
-        try:
-            # Generate questions using the model
-            prompt = f"""
-            Based on the following context, generate {limit} relevant and insightful questions.
-            Make sure the questions are diverse and cover different aspects of the content.
-            
-            Context: {context}
-            
-            Questions:
-            """
-            
-            response = self.model.generate_content(prompt)
-            
-            if response and response.text:
-                # Extract questions from response
-                questions = [
-                    line.strip().strip('0123456789.') for line in response.text.split('\n')
-                    if line.strip() and any(c.isalpha() for c in line)
-                ]
-                return questions[:limit]
-            
-            return []
-            
-        except Exception as e:
-            logger.error(f"Error generating questions: {str(e)}")
+import google.generativeai as genai
+from cachetools import LRUCache, TTLCache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Dict, NamedTuple, Optional, Tuple
+import json
+import logging
+import queue
+import threading
+import time
+from config import settings
+from .cached_context import CachedContextManager
+from .context_cache import ContextCache, context_cache as global_context_cache
+from .fake_backend import FakeGenerativeModel
+from .metrics import MODEL_CALL_SECONDS, QUESTION_SECONDS, record_usage
+from .model_client import ModelClient, default_generation_config
+from .qa_session import QASession
+from .retriever import BM25Index
+from .router import (
+    STRATEGY_AUTO, STRATEGY_INDIVIDUAL, STRATEGY_MAP_REDUCE, STRATEGY_PACKED, STRATEGY_RETRIEVAL,
+    TIER_DEFAULT, TIER_FAST, RouteDecision, RoutingPolicy, TokenBudgetPolicy
+)
+from .scheduler import (
+    PRIORITY_INTERACTIVE, RequestScheduler, estimate_tokens, request_scheduler
+)
+from .text_chunker import TextChunker
+from .transcript import Transcript
+import os
+
+logger = logging.getLogger(__name__)
+
+# Reply requested from the map step when a chunk has nothing relevant
+NO_RELEVANT_INFORMATION = "NO RELEVANT INFORMATION"
+
+# Response schema for packed requests: one {index, answer} object per question
+PACKED_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "answer": {"type": "STRING"}
+        },
+        "required": ["index", "answer"]
+    }
+}
+
+class StreamEvent(NamedTuple):
+    """Progress of one streamed answer."""
+    question: str
+    text: str  # Answer text received so far
+    done: bool
+
+class BatchProcessor:
+    def __init__(
+        self,
+        model: Optional[ModelClient] = None,
+        cached_contexts: Optional[CachedContextManager] = None,
+        context_cache: Optional[ContextCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        batch_size: Optional[int] = None,
+        fast_model: Optional[ModelClient] = None,
+        routing_policy: Optional[RoutingPolicy] = None,
+        transcript_lookup: Optional[Callable[[str, str], Optional[Transcript]]] = None
+    ):
+        """
+        Args:
+            model (Optional[ModelClient]): Generative model to use. When omitted, the backend
+                selected by ``settings.MODEL_BACKEND`` is used: a Gemini model configured
+                from the environment, or the offline ``FakeGenerativeModel``.
+            cached_contexts (Optional[CachedContextManager]): Manager for server-side cached
+                transcripts. Defaults to a Gemini-backed manager when the Gemini model is used.
+            context_cache (Optional[ContextCache]): Response cache. Defaults to the shared
+                global instance.
+            scheduler (Optional[RequestScheduler]): Rate limiter and retry policy for model
+                calls. Defaults to the shared global instance.
+            priority (int): Scheduling priority of this processor's calls; bulk jobs should
+                use ``PRIORITY_BULK`` so interactive questions go first
+            batch_size (Optional[int]): Maximum model requests in flight at once, and
+                questions per packed request. Defaults to ``settings.BATCH_SIZE``.
+            fast_model (Optional[ModelClient]): Cheaper model for simple questions. Defaults to
+                ``settings.FAST_MODEL_NAME`` when the model is built from the configuration,
+                otherwise to ``model`` itself.
+            routing_policy (Optional[RoutingPolicy]): Chooses strategies and model tiers for
+                ``strategy="auto"``. Defaults to ``TokenBudgetPolicy``.
+            transcript_lookup (Optional[Callable[[str, str], Optional[Transcript]]]): Finds the
+                timed transcript for a (video ID, context), e.g. ``YouTubeHandler.find_transcript``.
+                Retrieval excerpts are then labelled with the time range they cover, so answers
+                can cite it.
+        """
+        self._available_models: Optional[List[str]] = None
+        if model is None and settings.MODEL_BACKEND == "fake":
+            model = FakeGenerativeModel(latency=settings.FAKE_MODEL_LATENCY)
+            fast_model = fast_model or FakeGenerativeModel(
+                latency=settings.FAKE_MODEL_LATENCY, model_name="fake-fast-model"
+            )
+        elif model is None:
+            model = self._init_gemini_model(settings.MODEL_NAME)
+            fast_model = fast_model or self._init_gemini_model(settings.FAST_MODEL_NAME)
+            if cached_contexts is None and settings.CONTEXT_CACHE_ENABLED:
+                cached_contexts = CachedContextManager()
+        self.model = model
+        self.fast_model = fast_model or model
+        self.cached_contexts = cached_contexts
+        self.routing_policy = routing_policy or TokenBudgetPolicy()
+        self.transcript_lookup = transcript_lookup
+        
+        # Share the response cache with the rest of the process
+        self.context_cache = context_cache if context_cache is not None else global_context_cache
+        self.scheduler = scheduler if scheduler is not None else request_scheduler
+        self.priority = priority
+        self.batch_size = max(1, batch_size or settings.BATCH_SIZE)
+        
+        # Chunks and retrieval indexes per context digest, built once per transcript
+        self.context_chunker = TextChunker()
+        self.retrieval_chunker = TextChunker(
+            max_length=settings.RETRIEVAL_CHUNK_SIZE,
+            chunk_overlap=settings.RETRIEVAL_CHUNK_OVERLAP
+        )
+        self._context_chunks = TTLCache(maxsize=32, ttl=settings.CACHE_TTL)
+        self._retrieval_indexes = TTLCache(maxsize=32, ttl=settings.CACHE_TTL)
+        self._index_lock = threading.Lock()
+        # Context sizes in tokens per context digest, counted once per transcript
+        self._token_counts = LRUCache(maxsize=256)
+
+    def _init_gemini_model(self, model_name: str):
+        """Configure the Google API from the environment and build a Gemini model."""
+        # Initialize Google API
+        api_key = os.getenv('google_api_key')
+        if not api_key:
+            raise ValueError("API key not found. Please set the 'google_api_key' environment variable.")
+            
+        genai.configure(api_key=api_key)
+        
+        # Print first 5 characters of API key for debugging
+        logger.info(f"Using API key starting with: {api_key[:5]}...")
+        
+        # Initialize model; listing the available models is a network call, so it
+        # only happens when needed to diagnose a failure
+        try:
+            model = genai.GenerativeModel(model_name, generation_config=default_generation_config())
+            logger.info(f"Successfully initialized Gemini model {model_name}")
+            return model
+        except Exception as e:
+            logger.error(f"Error initializing model: {str(e)}")
+            try:
+                logger.info(f"Available models: {self.available_models()}")
+            except Exception as list_error:
+                logger.error(f"Error listing models: {str(list_error)}")
+            raise
+
+    def available_models(self) -> List[str]:
+        """
+        List the models available to the configured API key.
+        
+        Fetched from the API on first use and remembered afterwards.
+        
+        Returns:
+            List[str]: Model names
+        """
+        if self._available_models is None:
+            self._available_models = [m.name for m in genai.list_models()]
+        return self._available_models
+
+    def count_context_tokens(self, context: str, video_id: Optional[str] = None) -> int:
+        """
+        Size of a context in tokens, counted with the model once per transcript.
+        
+        Falls back to a character-based estimate if counting fails.
+        
+        Args:
+            context (str): Context text to measure
+            video_id (Optional[str]): ID of the video the context belongs to
+            
+        Returns:
+            int: Number of tokens
+        """
+        key = self.context_cache.context_digest(context, video_id)
+        with self._index_lock:
+            tokens = self._token_counts.get(key)
+        if tokens is not None:
+            return tokens
+        
+        try:
+            tokens = self.model.count_tokens(context).total_tokens
+        except Exception as e:
+            logger.warning(f"Error counting tokens, using an estimate: {str(e)}")
+            tokens = estimate_tokens(context)
+        with self._index_lock:
+            self._token_counts[key] = tokens
+        return tokens
+
+    def route(
+        self, questions: List[str], context: str, video_id: Optional[str] = None
+    ) -> Tuple[RouteDecision, Dict[str, str]]:
+        """
+        Choose the strategy for a batch of questions and the model tier for each one.
+        
+        Args:
+            questions (List[str]): Questions still to answer
+            context (str): Context text the questions are about
+            video_id (Optional[str]): ID of the video the context belongs to
+            
+        Returns:
+            Tuple[RouteDecision, Dict[str, str]]: The decision, and the tier for each question
+        """
+        decision = self.routing_policy.choose(
+            questions, self.count_context_tokens(context, video_id), self.can_cache_context(context, video_id)
+        )
+        tiers = {
+            question: self.routing_policy.question_tier(question, decision)
+            for question in questions
+        }
+        self.routing_policy.record(decision, video_id, list(tiers.values()))
+        return decision, tiers
+
+    def can_cache_context(self, context: str, video_id: Optional[str] = None) -> bool:
+        """Whether the context is long enough to be cached server-side and has a video ID to cache it under."""
+        return bool(
+            self.cached_contexts and video_id
+            and len(context) >= self.cached_contexts.min_context_length
+        )
+
+    def process_questions(
+        self,
+        questions: List[str],
+        context: str,
+        video_id: Optional[str] = None,
+        strategy: str = STRATEGY_INDIVIDUAL
+    ) -> Dict[str, str]:
+        """
+        Process a batch of questions using the context.
+        
+        Uncached questions are dispatched concurrently, keeping at most
+        ``batch_size`` model requests in flight at once. When a video ID
+        is given, long transcripts are cached server-side once and each request
+        only sends its question.
+        
+        Args:
+            questions (List[str]): List of questions to process
+            context (str): Context text to use for answering questions
+            video_id (Optional[str]): ID of the video the context belongs to
+            strategy (str): ``"auto"`` picks one of the strategies below from the context's
+                token size and sends simple questions to the fast model; ``"individual"``
+                sends one request per question; ``"packed"``
+                answers up to ``batch_size`` questions per request; ``"retrieval"``
+                sends each question only its most relevant transcript chunks; ``"map_reduce"``
+                answers from every chunk in parallel and combines the partial answers, for
+                transcripts larger than ``settings.MAX_CONTEXT_LENGTH``
+            
+        Returns:
+            Dict[str, str]: Dictionary mapping questions to answers, in input order
+        """
+        if strategy not in (
+            STRATEGY_AUTO, STRATEGY_INDIVIDUAL, STRATEGY_PACKED, STRATEGY_RETRIEVAL, STRATEGY_MAP_REDUCE
+        ):
+            raise ValueError(f"Unknown strategy: {strategy}")
+        
+        try:
+            results = {}
+            pending = []
+            for question in dict.fromkeys(questions):
+                # Check cache first
+                cached_response = self.context_cache.get_response(question, context, video_id)
+                if cached_response:
+                    results[question] = cached_response
+                else:
+                    pending.append(question)
+            
+            tiers: Dict[str, str] = {}
+            if pending and strategy == STRATEGY_AUTO:
+                decision, tiers = self.route(pending, context, video_id)
+                strategy = decision.strategy
+            
+            if pending:
+                batch_size = self.batch_size
+                with ThreadPoolExecutor(
+                    max_workers=self._pool_size(strategy, pending, context, video_id)
+                ) as executor:
+                    if strategy == STRATEGY_PACKED:
+                        groups = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+                        futures = [
+                            executor.submit(
+                                self._timed, STRATEGY_PACKED, self._answer_packed, group, context, video_id,
+                                # A group goes to the fast tier only if all of its questions may
+                                TIER_FAST if all(tiers.get(q) == TIER_FAST for q in group) else TIER_DEFAULT
+                            )
+                            for group in groups
+                        ]
+                        for future in futures:
+                            results.update(future.result())
+                    elif strategy == STRATEGY_RETRIEVAL:
+                        index = self._get_retrieval_index(context, video_id)
+                        futures = {
+                            question: executor.submit(
+                                self._timed, STRATEGY_RETRIEVAL, self._answer_with_retrieval,
+                                question, context, index, video_id, tiers.get(question, TIER_DEFAULT)
+                            )
+                            for question in pending
+                        }
+                        for question, future in futures.items():
+                            results[question] = future.result()
+                    elif strategy == STRATEGY_MAP_REDUCE:
+                        started_at = time.perf_counter()
+                        results.update(self._answer_map_reduce(pending, context, video_id, executor))
+                        # Questions share the map and reduce rounds; each waits for all of them
+                        elapsed = time.perf_counter() - started_at
+                        for _ in pending:
+                            QUESTION_SECONDS.observe(elapsed, strategy=STRATEGY_MAP_REDUCE)
+                    else:
+                        futures = {
+                            question: executor.submit(
+                                self._timed, STRATEGY_INDIVIDUAL, self._answer_question,
+                                question, context, video_id, tiers.get(question, TIER_DEFAULT)
+                            )
+                            for question in pending
+                        }
+                        for question, future in futures.items():
+                            results[question] = future.result()
+            
+            # Preserve the order in which the questions were asked
+            return {question: results[question] for question in questions}
+            
+        except Exception as e:
+            logger.error(f"Error in batch processing: {str(e)}")
+            raise
+
+    def stream_questions(
+        self,
+        questions: List[str],
+        context: str,
+        video_id: Optional[str] = None,
+        strategy: str = STRATEGY_INDIVIDUAL
+    ) -> Iterator[StreamEvent]:
+        """
+        Answer questions concurrently, streaming partial answers as tokens arrive.
+        
+        Events are yielded in arrival order, so answers show up as each one progresses
+        rather than in input order. Cached answers are yielded first, complete.
+        
+        Args:
+            questions (List[str]): List of questions to process
+            context (str): Context text to use for answering questions
+            video_id (Optional[str]): ID of the video the context belongs to
+            strategy (str): ``"individual"`` and ``"packed"`` stream one full-context answer
+                per question; ``"retrieval"`` streams answers from the most relevant chunks;
+                ``"map_reduce"`` yields each answer once, complete, since partial answers are
+                only combined at the end; ``"auto"`` routes as in ``process_questions``
+            
+        Returns:
+            Iterator[StreamEvent]: Events carrying each question's answer so far; the last
+            event for a question has ``done`` set
+        """
+        if strategy not in (
+            STRATEGY_AUTO, STRATEGY_INDIVIDUAL, STRATEGY_PACKED, STRATEGY_RETRIEVAL, STRATEGY_MAP_REDUCE
+        ):
+            raise ValueError(f"Unknown strategy: {strategy}")
+        
+        pending = []
+        for question in dict.fromkeys(questions):
+            cached_response = self.context_cache.get_response(question, context, video_id)
+            if cached_response:
+                yield StreamEvent(question, cached_response, True)
+            else:
+                pending.append(question)
+        if not pending:
+            return
+        
+        tiers: Dict[str, str] = {}
+        index = None
+        if strategy == STRATEGY_AUTO:
+            decision, tiers = self.route(pending, context, video_id)
+            strategy = decision.strategy
+        if strategy == STRATEGY_RETRIEVAL:
+            index = self._get_retrieval_index(context, video_id)
+        
+        executor = ThreadPoolExecutor(max_workers=self._pool_size(strategy, pending, context, video_id))
+        if strategy == STRATEGY_MAP_REDUCE:
+            try:
+                started_at = time.perf_counter()
+                results = self._answer_map_reduce(pending, context, video_id, executor)
+                elapsed = time.perf_counter() - started_at
+                for question in pending:
+                    QUESTION_SECONDS.observe(elapsed, strategy=STRATEGY_MAP_REDUCE)
+                    yield StreamEvent(question, results[question], True)
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+            return
+        
+        events: "queue.Queue[StreamEvent]" = queue.Queue()
+        try:
+            for question in pending:
+                executor.submit(
+                    self._stream_answer, question, context, video_id, events,
+                    tiers.get(question, TIER_DEFAULT), index
+                )
+            
+            remaining = len(pending)
+            while remaining:
+                event = events.get()
+                if event.done:
+                    remaining -= 1
+                yield event
+        finally:
+            # Stop queued questions if the consumer goes away early
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def start_session(
+        self,
+        context: str,
+        video_id: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> QASession:
+        """
+        Start a multi-turn conversation about a context.
+        
+        Unlike ``process_questions``, each answer sees the earlier turns. The context is
+        sent once (as a server-side cached context when it qualifies) and each turn sends
+        only a bounded summary and window of the history plus the new question.
+        
+        Args:
+            context (str): Context text the conversation is about
+            video_id (Optional[str]): ID of the video the context belongs to
+            session_id (Optional[str]): Conversation ID, e.g. to continue recording into
+                an existing conversation history; random by default
+            
+        Returns:
+            QASession: The session; call ``ask`` for each question
+        """
+        return QASession(self, context, video_id=video_id, session_id=session_id)
+
+    def _pool_size(self, strategy: str, questions: List[str], context: str, video_id: Optional[str] = None) -> int:
+        """
+        Worker threads needed to answer questions with a strategy.
+        
+        One per request that can run at once, at most ``batch_size``. Map-reduce
+        sends a request per (question, chunk) pair, so a single question over a
+        long context still fans its chunks out.
+        
+        Args:
+            strategy (str): Strategy the questions are answered with (not ``"auto"``)
+            questions (List[str]): Questions to answer
+            context (str): Context text to use for answering the questions
+            video_id (Optional[str]): ID of the video the context belongs to
+            
+        Returns:
+            int: Number of workers for the pool
+        """
+        if strategy == STRATEGY_MAP_REDUCE:
+            requests = len(questions) * len(self._get_context_chunks(context, video_id))
+        elif strategy == STRATEGY_PACKED:
+            requests = -(-len(questions) // self.batch_size)
+        else:
+            requests = len(questions)
+        return max(1, min(self.batch_size, requests))
+
+    def _stream_answer(
+        self,
+        question: str,
+        context: str,
+        video_id: Optional[str],
+        events: "queue.Queue[StreamEvent]",
+        tier: str = TIER_DEFAULT,
+        index: Optional[BM25Index] = None
+    ) -> None:
+        """
+        Stream one answer into the event queue and cache it once complete.
+        
+        Args:
+            question (str): Question to answer
+            context (str): Context text to use for answering the question
+            video_id (Optional[str]): ID of the video the context belongs to
+            events (queue.Queue): Queue receiving the question's events
+            tier (str): Model tier to answer with
+            index (Optional[BM25Index]): When given, only the most relevant chunks are sent
+        """
+        text = ""
+        last_chunk = None
+        try:
+            prompt = f"Question: {question}\n\nAnswer:"
+            if index is not None:
+                stream = self.generate(prompt, self._retrieval_excerpts(question, index), tier=tier, stream=True)
+            else:
+                stream = self.generate(prompt, context, video_id, tier=tier, stream=True)
+            for chunk in stream:
+                last_chunk = chunk
+                try:
+                    piece = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety or finish metadata)
+                    continue
+                if piece:
+                    text += piece
+                    events.put(StreamEvent(question, text, False))
+            
+            if last_chunk is not None:
+                # The final chunk carries the usage totals for the whole stream
+                record_usage(last_chunk)
+            if text:
+                self.context_cache.cache_response(question, context, text, video_id)
+                events.put(StreamEvent(question, text, True))
+            else:
+                events.put(StreamEvent(question, "Failed to generate response.", True))
+                
+        except Exception as e:
+            logger.error(f"Error streaming answer for question '{question}': {str(e)}")
+            events.put(StreamEvent(question, f"Error: {str(e)}", True))
+
+    def generate(
+        self,
+        prompt: str,
+        context: str,
+        video_id: Optional[str] = None,
+        tier: str = TIER_DEFAULT,
+        **kwargs
+    ):
+        """
+        Send a prompt about the context to the model.
+        
+        Uses the server-side cached context for the video when available, otherwise
+        prepends the context to the prompt. The fast tier always sends the context
+        inline, since cached contexts are bound to the default model.
+        
+        Args:
+            prompt (str): Prompt to send, without the context
+            context (str): Context text the prompt refers to
+            video_id (Optional[str]): ID of the video the context belongs to
+            tier (str): ``TIER_DEFAULT`` or ``TIER_FAST``
+            **kwargs: Extra arguments for ``generate_content``
+            
+        Returns:
+            The model response
+        """
+        if tier == TIER_FAST:
+            return self.call_model(self.fast_model, f"Context: {context}\n\n{prompt}", **kwargs)
+        
+        cached_model = None
+        if self.cached_contexts:
+            cached_model = self.cached_contexts.get_model(video_id, context)
+        
+        if cached_model:
+            # The transcript already lives server-side; send only the prompt
+            return self.call_model(cached_model, prompt, **kwargs)
+        return self.call_model(self.model, f"Context: {context}\n\n{prompt}", **kwargs)
+
+    def call_model(self, model, prompt: str, **kwargs):
+        """
+        Call ``generate_content`` through the shared request scheduler.
+        
+        Args:
+            model: Model to call
+            prompt (str): Full prompt to send
+            **kwargs: Extra arguments for ``generate_content``
+            
+        Returns:
+            The model response
+        """
+        def attempt():
+            started_at = time.perf_counter()
+            try:
+                response = model.generate_content(
+                    prompt, request_options={"timeout": settings.REQUEST_TIMEOUT}, **kwargs
+                )
+            except Exception:
+                MODEL_CALL_SECONDS.observe(time.perf_counter() - started_at, outcome="error")
+                raise
+            MODEL_CALL_SECONDS.observe(time.perf_counter() - started_at, outcome="success")
+            if not kwargs.get("stream"):
+                # Streamed usage is recorded from the final chunk by the consumer
+                record_usage(response)
+            return response
+        
+        if kwargs.get("stream"):
+            # Errors can surface while reading the stream, so the scheduler must see those too
+            return self.scheduler.stream(
+                attempt,
+                priority=self.priority,
+                estimated_tokens=estimate_tokens(prompt)
+            )
+        return self.scheduler.call(
+            attempt,
+            priority=self.priority,
+            estimated_tokens=estimate_tokens(prompt)
+        )
+
+    def _timed(self, strategy: str, fn, *args):
+        """
+        Run ``fn(*args)`` and observe its duration as question latency for the strategy.
+        
+        A dictionary result (a packed group) counts once per question it answered.
+        """
+        started_at = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started_at
+        for _ in range(len(result) if isinstance(result, dict) else 1):
+            QUESTION_SECONDS.observe(elapsed, strategy=strategy)
+        return result
+
+    def _answer_question(
+        self, question: str, context: str, video_id: Optional[str] = None, tier: str = TIER_DEFAULT
+    ) -> str:
+        """
+        Answer a single question against the context and cache the result.
+        
+        Args:
+            question (str): Question to answer
+            context (str): Context text to use for answering the question
+            video_id (Optional[str]): ID of the video the context belongs to
+            tier (str): Model tier to answer with
+            
+        Returns:
+            str: The answer, or an error message if generation failed
+        """
+        try:
+            response = self.generate(f"Question: {question}\n\nAnswer:", context, video_id, tier=tier)
+            
+            if response and response.text:
+                # Cache the response
+                self.context_cache.cache_response(question, context, response.text, video_id)
+                return response.text
+            
+            return "Failed to generate response."
+            
+        except Exception as e:
+            logger.error(f"Error processing question '{question}': {str(e)}")
+            return f"Error: {str(e)}"
+
+    def _answer_packed(
+        self,
+        questions: List[str],
+        context: str,
+        video_id: Optional[str] = None,
+        tier: str = TIER_DEFAULT
+    ) -> Dict[str, str]:
+        """
+        Answer a group of questions with a single structured-output request.
+        
+        Questions missing from the parsed response are answered individually.
+        
+        Args:
+            questions (List[str]): Questions to answer together
+            context (str): Context text to use for answering the questions
+            video_id (Optional[str]): ID of the video the context belongs to
+            tier (str): Model tier to answer with
+            
+        Returns:
+            Dict[str, str]: Dictionary mapping questions to answers
+        """
+        results = {}
+        numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+        prompt = (
+            "Answer each of the following questions. Respond with a JSON array containing "
+            "one object per question, with the question number as \"index\" and the answer "
+            f"as \"answer\".\n\nQuestions:\n{numbered}"
+        )
+        
+        try:
+            response = self.generate(
+                prompt,
+                context,
+                video_id,
+                tier=tier,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": PACKED_RESPONSE_SCHEMA,
+                    # MAX_TOKENS is per answer; a cap on the whole group would cut the JSON short
+                    "max_output_tokens": settings.MAX_TOKENS * len(questions)
+                }
+            )
+            for item in json.loads(response.text):
+                index = item.get("index")
+                answer = item.get("answer")
+                if isinstance(index, int) and 1 <= index <= len(questions) and answer:
+                    question = questions[index - 1]
+                    self.context_cache.cache_response(question, context, answer, video_id)
+                    results[question] = answer
+        except Exception as e:
+            logger.error(f"Error processing packed questions: {str(e)}")
+        
+        # Fall back to one request per question for anything the packed call missed
+        for question in questions:
+            if question not in results:
+                results[question] = self._answer_question(question, context, video_id, tier)
+        
+        return results
+
+    def _get_retrieval_index(self, context: str, video_id: Optional[str] = None) -> BM25Index:
+        """
+        Get the retrieval index for a context, chunking and indexing it on first use.
+        
+        Args:
+            context (str): Context text to index
+            video_id (Optional[str]): ID of the video the context belongs to
+            
+        Returns:
+            BM25Index: Index over the context's chunks
+        """
+        key = self.context_cache.context_digest(context, video_id)
+        with self._index_lock:
+            index = self._retrieval_indexes.get(key)
+            if index is None:
+                spans = list(self.retrieval_chunker.iter_chunk_spans(context))
+                labels = None
+                transcript = self.transcript_lookup(video_id, context) if self.transcript_lookup and video_id else None
+                if transcript is not None:
+                    labels = [transcript.span_label(start, end) for start, end in spans]
+                index = BM25Index([context[start:end] for start, end in spans], labels=labels)
+                self._retrieval_indexes[key] = index
+                logger.info(f"Built retrieval index with {len(index.chunks)} chunks")
+            return index
+
+    def retrieve(self, query: str, context: str, video_id: Optional[str] = None) -> str:
+        """
+        Get the excerpts of a context most relevant to a query.
+        
+        Args:
+            query (str): Text to search the context for, usually a question
+            context (str): Context text to search; indexed on first use
+            video_id (Optional[str]): ID of the video the context belongs to
+            
+        Returns:
+            str: The top ``settings.RETRIEVAL_TOP_K`` chunks in transcript order, labelled
+            with their time ranges when the transcript timing is known
+        """
+        return self._retrieval_excerpts(query, self._get_retrieval_index(context, video_id))
+
+    def _retrieval_excerpts(self, question: str, index: BM25Index) -> str:
+        """Join the chunks most relevant to a question, in transcript order."""
+        # Keep the selected chunks in transcript order so the excerpt reads naturally
+        top_chunks = sorted(index.search(question, settings.RETRIEVAL_TOP_K))
+        if not index.labels:
+            return "\n...\n".join(index.chunks[i] for i in top_chunks)
+        return (
+            "Each excerpt starts with the [M:SS-M:SS] time range it covers in the video. "
+            "Cite the time of the passages you use, e.g. [1:05].\n\n"
+            + "\n...\n".join(f"[{index.labels[i]}] {index.chunks[i]}" for i in top_chunks)
+        )
+
+    def _answer_with_retrieval(
+        self,
+        question: str,
+        context: str,
+        index: BM25Index,
+        video_id: Optional[str] = None,
+        tier: str = TIER_DEFAULT
+    ) -> str:
+        """
+        Answer a question using only the context chunks most relevant to it.
+        
+        Args:
+            question (str): Question to answer
+            context (str): Full context text, used as the cache key
+            index (BM25Index): Retrieval index over the context's chunks
+            video_id (Optional[str]): ID of the video the context belongs to
+            tier (str): Model tier to answer with
+            
+        Returns:
+            str: The answer, or an error message if generation failed
+        """
+        try:
+            excerpts = self._retrieval_excerpts(question, index)
+            response = self.generate(f"Question: {question}\n\nAnswer:", excerpts, tier=tier)
+            
+            if response and response.text:
+                self.context_cache.cache_response(question, context, response.text, video_id)
+                return response.text
+            
+            return "Failed to generate response."
+            
+        except Exception as e:
+            logger.error(f"Error processing question '{question}': {str(e)}")
+            return f"Error: {str(e)}"
+
+    def _get_context_chunks(self, context: str, video_id: Optional[str] = None) -> List[str]:
+        """
+        Get the context split into model-sized chunks, chunking it on first use.
+        
+        Args:
+            context (str): Context text to chunk
+            video_id (Optional[str]): ID of the video the context belongs to
+            
+        Returns:
+            List[str]: Chunks of at most ``settings.MAX_CONTEXT_LENGTH`` characters
+        """
+        key = self.context_cache.context_digest(context, video_id)
+        with self._index_lock:
+            chunks = self._context_chunks.get(key)
+            if chunks is None:
+                chunks = self.context_chunker.chunk_text(context)
+                self._context_chunks[key] = chunks
+            return chunks
+
+    def _answer_map_reduce(
+        self,
+        questions: List[str],
+        context: str,
+        video_id: Optional[str],
+        executor: ThreadPoolExecutor
+    ) -> Dict[str, str]:
+        """
+        Answer questions over a long context by mapping over its chunks and reducing the results.
+        
+        Every (question, chunk) pair is answered concurrently, then the partial answers
+        for each question are combined. Partial answers are cached per chunk, so
+        re-running or adding questions does not redo finished chunks.
+        
+        Args:
+            questions (List[str]): Questions to answer
+            context (str): Context text to use for answering the questions
+            video_id (Optional[str]): ID of the video the context belongs to
+            executor (ThreadPoolExecutor): Pool to fan the requests out on
+            
+        Returns:
+            Dict[str, str]: Dictionary mapping questions to answers
+        """
+        chunks = self._get_context_chunks(context, video_id)
+        if len(chunks) == 1:
+            # Fits in a single request; no need to split
+            futures = {
+                question: executor.submit(self._answer_question, question, context, video_id)
+                for question in questions
+            }
+            return {question: future.result() for question, future in futures.items()}
+        
+        # Map: answer each question against each chunk
+        map_futures = {
+            (question, i): executor.submit(self._map_chunk, question, chunk, i, len(chunks))
+            for question in questions
+            for i, chunk in enumerate(chunks)
+        }
+        partials: Dict[str, List[Optional[str]]] = {question: [] for question in questions}
+        for (question, _), future in map_futures.items():
+            partials[question].append(future.result())
+        
+        # Reduce: combine each question's partial answers
+        reduce_futures = {
+            question: executor.submit(
+                self._reduce_partials, question, partials[question], context, video_id
+            )
+            for question in questions
+        }
+        return {question: future.result() for question, future in reduce_futures.items()}
+
+    def _map_chunk(self, question: str, chunk: str, index: int, total: int) -> Optional[str]:
+        """
+        Answer a question from one chunk of the context.
+        
+        Args:
+            question (str): Question to answer
+            chunk (str): Chunk of the context
+            index (int): Position of the chunk
+            total (int): Number of chunks in the context
+            
+        Returns:
+            Optional[str]: Partial answer, or None if generation failed
+        """
+        cached_partial = self.context_cache.get_response(question, chunk, namespace="map")
+        if cached_partial:
+            return cached_partial
+        
+        try:
+            response = self.generate(
+                f"This is part {index + 1} of {total} of the transcript. Answer the question "
+                "using only this part. If it contains nothing relevant, reply exactly "
+                f"\"{NO_RELEVANT_INFORMATION}\".\n\nQuestion: {question}\n\nAnswer:",
+                chunk
+            )
+            if response and response.text:
+                self.context_cache.cache_response(question, chunk, response.text, namespace="map")
+                return response.text
+        except Exception as e:
+            logger.error(f"Error processing chunk {index + 1}/{total} for question '{question}': {str(e)}")
+        return None
+
+    def _reduce_partials(
+        self,
+        question: str,
+        partials: List[Optional[str]],
+        context: str,
+        video_id: Optional[str] = None
+    ) -> str:
+        """
+        Combine partial answers from the context's chunks into a final answer.
+        
+        Args:
+            question (str): Question being answered
+            partials (List[Optional[str]]): Partial answers in chunk order (None where a chunk failed)
+            context (str): Full context text, used as the cache key
+            video_id (Optional[str]): ID of the video the context belongs to
+            
+        Returns:
+            str: The answer, or an error message if generation failed
+        """
+        if all(partial is None for partial in partials):
+            return "Error: Failed to generate a response for any part of the transcript."
+        
+        relevant = [
+            partial for partial in partials
+            if partial and NO_RELEVANT_INFORMATION not in partial
+        ]
+        try:
+            if not relevant:
+                answer = "The transcript does not contain information to answer this question."
+            elif len(relevant) == 1:
+                answer = relevant[0]
+            else:
+                numbered = "\n\n".join(
+                    f"Partial answer {i}: {partial}" for i, partial in enumerate(relevant, 1)
+                )
+                response = self.generate(
+                    "The partial answers above were each drawn from a different part of the "
+                    "transcript. Combine them into one complete, non-repetitive answer."
+                    f"\n\nQuestion: {question}\n\nAnswer:",
+                    numbered
+                )
+                if not (response and response.text):
+                    return "Failed to generate response."
+                answer = response.text
+            
+            self.context_cache.cache_response(question, context, answer, video_id)
+            return answer
+            
+        except Exception as e:
+            logger.error(f"Error combining answers for question '{question}': {str(e)}")
+            return f"Error: {str(e)}"
+
+    def generate_questions(self, context: str, limit: int = 5) -> List[str]:
+        """
+        Generate relevant questions based on the context.
+        
+        Args:
+            context (str): Context text to generate questions from
+            limit (int): Maximum number of questions to generate
+            
+        Returns:
+            List[str]: List of generated questions
+        """
+        try:
+            # Generate questions using the model
+            prompt = f"""
+            Based on the following context, generate {limit} relevant and insightful questions.
+            Make sure the questions are diverse and cover different aspects of the content.
+            
+            Context: {context}
+            
+            Questions:
+            """
+            
+            # Suggesting questions does not need the stronger model
+            response = self.call_model(self.fast_model, prompt)
+            
+            if response and response.text:
+                # Extract questions from response
+                questions = [
+                    line.strip().strip('0123456789.') for line in response.text.split('\n')
+                    if line.strip() and any(c.isalpha() for c in line)
+                ]
+                return questions[:limit]
+            
+            return []
+            
+        except Exception as e:
+            logger.error(f"Error generating questions: {str(e)}")
             return [] 
\ No newline at end of file
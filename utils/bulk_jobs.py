@@ -0,0 +1,425 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import logging
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from config import settings
+from .batch_processor import PACKED_RESPONSE_SCHEMA
+from .context_cache import ContextCache, context_cache as global_context_cache
+from .fake_backend import FakeGenerativeModel
+from .model_client import ModelClient
+
+logger = logging.getLogger(__name__)
+
+# Job states, as reported by the Gemini batch API
+JOB_STATE_PENDING = "JOB_STATE_PENDING"
+JOB_STATE_RUNNING = "JOB_STATE_RUNNING"
+JOB_STATE_SUCCEEDED = "JOB_STATE_SUCCEEDED"
+JOB_STATE_FAILED = "JOB_STATE_FAILED"
+JOB_STATE_CANCELLED = "JOB_STATE_CANCELLED"
+JOB_STATE_EXPIRED = "JOB_STATE_EXPIRED"
+FINISHED_STATES = {JOB_STATE_SUCCEEDED, JOB_STATE_FAILED, JOB_STATE_CANCELLED, JOB_STATE_EXPIRED}
+
+class BulkGroup(NamedTuple):
+    """Questions about one context answered by one packed request; the context is kept only as its digest."""
+    video_id: Optional[str]
+    context_digest: str
+    questions: List[str]
+
+class BatchPredictionClient:
+    """Interface for submitting, polling and downloading batch prediction jobs."""
+
+    def submit(self, input_path: str, model_name: str) -> str:
+        """
+        Upload a JSONL input file and start a batch job on it.
+
+        Args:
+            input_path (str): JSONL file with one ``{"key", "request"}`` object per line
+            model_name (str): Model to run the requests on
+
+        Returns:
+            str: Job name to poll
+        """
+        raise NotImplementedError
+
+    def get_state(self, job_name: str) -> str:
+        """
+        Get a job's state.
+
+        Args:
+            job_name (str): Name returned by ``submit``
+
+        Returns:
+            str: One of the ``JOB_STATE_*`` values
+        """
+        raise NotImplementedError
+
+    def download_results(self, job_name: str, destination: str) -> str:
+        """
+        Download a finished job's JSONL result file.
+
+        Args:
+            job_name (str): Name returned by ``submit``
+            destination (str): Path to write the results to
+
+        Returns:
+            str: Path of the downloaded file
+        """
+        raise NotImplementedError
+
+class GeminiBatchClient(BatchPredictionClient):
+    """Batch prediction through the Gemini API (requires the ``google-genai`` package)."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Args:
+            api_key (Optional[str]): API key, defaults to the ``google_api_key`` environment variable
+        """
+        try:
+            from google import genai
+        except ImportError:
+            raise RuntimeError("Batch prediction requires google-genai: pip install google-genai")
+
+        api_key = api_key or os.getenv("google_api_key")
+        if not api_key:
+            raise ValueError("API key not found. Please set the 'google_api_key' environment variable.")
+        self.client = genai.Client(api_key=api_key)
+
+    def submit(self, input_path: str, model_name: str) -> str:
+        uploaded = self.client.files.upload(file=input_path, config={"mime_type": "jsonl"})
+        job = self.client.batches.create(model=model_name, src=uploaded.name)
+        return job.name
+
+    def get_state(self, job_name: str) -> str:
+        return self.client.batches.get(name=job_name).state.name
+
+    def download_results(self, job_name: str, destination: str) -> str:
+        job = self.client.batches.get(name=job_name)
+        data = self.client.files.download(file=job.dest.file_name)
+        with open(destination, "wb") as f:
+            f.write(data)
+        return destination
+
+class LocalBatchClient(BatchPredictionClient):
+    """
+    File-based stand-in for the batch endpoint, for running the bulk flow offline.
+
+    Each job gets a directory under ``work_dir`` holding its input, state and
+    output files. Jobs run on a background thread against a local model and
+    write results in the same JSONL format as the Gemini batch API.
+    """
+
+    def __init__(
+        self,
+        model: Optional[ModelClient] = None,
+        work_dir: Optional[str] = None,
+        queue_delay: float = 0.0
+    ):
+        """
+        Args:
+            model (Optional[ModelClient]): Model that answers the requests; defaults to
+                ``FakeGenerativeModel``
+            work_dir (Optional[str]): Directory for job files
+            queue_delay (float): Seconds a job stays pending before it runs
+        """
+        self.model = model if model is not None else FakeGenerativeModel()
+        self.work_dir = os.path.join(work_dir or settings.BULK_WORK_DIR, "local_jobs")
+        self.queue_delay = queue_delay
+
+    def _path(self, job_name: str, name: str) -> str:
+        return os.path.join(self.work_dir, job_name, name)
+
+    def _set_state(self, job_name: str, state: str) -> None:
+        path = self._path(job_name, "state")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(state)
+        os.replace(path + ".tmp", path)
+
+    def submit(self, input_path: str, model_name: str) -> str:
+        job_name = f"batches/local-{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.dirname(self._path(job_name, "input.jsonl")), exist_ok=True)
+        shutil.copyfile(input_path, self._path(job_name, "input.jsonl"))
+        self._set_state(job_name, JOB_STATE_PENDING)
+        threading.Thread(target=self._run, args=(job_name,), daemon=True).start()
+        return job_name
+
+    def _run(self, job_name: str) -> None:
+        if self.queue_delay:
+            time.sleep(self.queue_delay)
+        self._set_state(job_name, JOB_STATE_RUNNING)
+        try:
+            with open(self._path(job_name, "input.jsonl"), encoding="utf-8") as source, \
+                    open(self._path(job_name, "output.jsonl"), "w", encoding="utf-8") as output:
+                for line in source:
+                    if line.strip():
+                        output.write(json.dumps(self._predict(json.loads(line))) + "\n")
+        except Exception as e:
+            logger.error(f"Local batch job {job_name} failed: {str(e)}")
+            self._set_state(job_name, JOB_STATE_FAILED)
+            return
+        self._set_state(job_name, JOB_STATE_SUCCEEDED)
+
+    def _predict(self, line: Dict) -> Dict:
+        request = line["request"]
+        prompt = "".join(part.get("text", "") for content in request["contents"] for part in content["parts"])
+        try:
+            response = self.model.generate_content(prompt, generation_config=request.get("generation_config"))
+        except Exception as e:
+            return {"key": line["key"], "error": {"message": str(e)}}
+        return {
+            "key": line["key"],
+            "response": {"candidates": [{"content": {"parts": [{"text": response.text}], "role": "model"}}]}
+        }
+
+    def get_state(self, job_name: str) -> str:
+        with open(self._path(job_name, "state"), encoding="utf-8") as f:
+            return f.read()
+
+    def download_results(self, job_name: str, destination: str) -> str:
+        shutil.copyfile(self._path(job_name, "output.jsonl"), destination)
+        return destination
+
+def _response_text(row: Dict) -> Optional[str]:
+    """Extract the answer text from one result line, or None if it has none."""
+    try:
+        parts = row["response"]["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError):
+        return None
+    text = "".join(part.get("text", "") for part in parts)
+    return text or None
+
+class BulkProcessor:
+    """
+    Answers questions through one batch prediction job instead of interactive calls.
+
+    Batch jobs are cheaper and not subject to the interactive rate limits, but take
+    minutes to hours, so this is meant for headless workloads. Cached answers are
+    reused and only the rest are submitted, packed up to ``group_size`` questions
+    per request so each transcript is sent once per group rather than once per
+    question. Each video's requests are written to the job's input file as its
+    item is read, so transcripts are not all held in memory at once. Results are
+    returned in the same shape as ``BatchProcessor.process_questions`` and cached
+    as they are read back; if the job fails or expires, every submitted question
+    is answered with the error.
+    """
+
+    def __init__(
+        self,
+        client: Optional[BatchPredictionClient] = None,
+        context_cache: Optional[ContextCache] = None,
+        model_name: Optional[str] = None,
+        work_dir: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+        max_poll_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+        group_size: Optional[int] = None
+    ):
+        """
+        Args:
+            client (Optional[BatchPredictionClient]): Batch endpoint client; defaults to
+                ``GeminiBatchClient``, or ``LocalBatchClient`` when ``settings.MODEL_BACKEND`` is ``"fake"``
+            context_cache (Optional[ContextCache]): Response cache. Defaults to the shared
+                global instance.
+            model_name (Optional[str]): Model to run the job on, defaults to ``settings.MODEL_NAME``
+            work_dir (Optional[str]): Directory for input and result files
+            poll_interval (Optional[float]): First delay between status checks, in seconds
+            max_poll_interval (Optional[float]): Upper bound on the delay between status checks
+            timeout (Optional[float]): Seconds to wait for the job before giving up
+            group_size (Optional[int]): Questions about one context answered per request,
+                defaults to ``settings.BATCH_SIZE``
+        """
+        if client is None:
+            client = LocalBatchClient() if settings.MODEL_BACKEND == "fake" else GeminiBatchClient()
+        self.client = client
+        self.context_cache = context_cache if context_cache is not None else global_context_cache
+        self.model_name = model_name or settings.MODEL_NAME
+        self.work_dir = work_dir or settings.BULK_WORK_DIR
+        self.poll_interval = poll_interval if poll_interval is not None else settings.BULK_POLL_INTERVAL
+        self.max_poll_interval = (
+            max_poll_interval if max_poll_interval is not None else settings.BULK_POLL_MAX_INTERVAL
+        )
+        self.timeout = timeout if timeout is not None else settings.BULK_JOB_TIMEOUT
+        self.group_size = max(1, group_size or settings.BATCH_SIZE)
+
+    def process_questions(
+        self, questions: List[str], context: str, video_id: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Answer questions about one context with a batch job.
+
+        Args:
+            questions (List[str]): List of questions to process
+            context (str): Context text to use for answering questions
+            video_id (Optional[str]): ID of the video the context belongs to
+
+        Returns:
+            Dict[str, str]: Dictionary mapping questions to answers, in input order
+        """
+        return self.process_many([(video_id, context, questions)])[video_id]
+
+    def process_many(
+        self, items: Iterable[Tuple[Optional[str], str, List[str]]]
+    ) -> Dict[Optional[str], Dict[str, str]]:
+        """
+        Answer questions about many contexts with a single batch job.
+
+        Args:
+            items (Iterable[Tuple[Optional[str], str, List[str]]]): (video ID, context,
+                questions) for each video, consumed lazily
+
+        Returns:
+            Dict[Optional[str], Dict[str, str]]: Answers by video ID, each mapping
+            questions to answers in input order
+        """
+        results: Dict[Optional[str], Dict[str, str]] = {}
+        order: Dict[Optional[str], List[str]] = {}
+        groups: List[BulkGroup] = []
+        os.makedirs(self.work_dir, exist_ok=True)
+        run_id = uuid.uuid4().hex[:12]
+        input_path = os.path.join(self.work_dir, f"{run_id}-input.jsonl")
+        output_path = os.path.join(self.work_dir, f"{run_id}-output.jsonl")
+
+        try:
+            with open(input_path, "w", encoding="utf-8") as f:
+                for video_id, context, questions in items:
+                    answers = results.setdefault(video_id, {})
+                    order[video_id] = list(dict.fromkeys(order.get(video_id, []) + list(questions)))
+                    pending = []
+                    for question in dict.fromkeys(questions):
+                        cached_response = self.context_cache.get_response(question, context, video_id)
+                        if cached_response:
+                            answers[question] = cached_response
+                        else:
+                            pending.append(question)
+                    if not pending:
+                        continue
+                    # Written now, so only the digest outlives this video's transcript
+                    digest = self.context_cache.context_digest(context, video_id)
+                    for i in range(0, len(pending), self.group_size):
+                        group = BulkGroup(video_id, digest, pending[i:i + self.group_size])
+                        self._write_request(f, len(groups), context, group.questions)
+                        groups.append(group)
+                    f.flush()
+
+            if groups:
+                try:
+                    for group, question, answer in self._run_job(groups, input_path, output_path):
+                        results[group.video_id][question] = answer
+                except Exception as e:
+                    # Failed, expired or timed out: the questions not yet answered get the error
+                    logger.error(f"Error running batch job: {str(e)}")
+                    for group in groups:
+                        for question in group.questions:
+                            results[group.video_id].setdefault(question, f"Error: {str(e)}")
+        finally:
+            for path in (input_path, output_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        return {
+            video_id: {question: answers.get(question, "Failed to generate response.") for question in order[video_id]}
+            for video_id, answers in results.items()
+        }
+
+    def _run_job(
+        self, groups: List[BulkGroup], input_path: str, output_path: str
+    ) -> Iterator[Tuple[BulkGroup, str, str]]:
+        """Submit the input file as one job, wait for it and yield each question's answer."""
+        job_name = self.client.submit(input_path, self.model_name)
+        questions = sum(len(group.questions) for group in groups)
+        logger.info(f"Submitted batch job {job_name} with {questions} questions in {len(groups)} requests")
+
+        state = self._wait(job_name)
+        if state != JOB_STATE_SUCCEEDED:
+            raise RuntimeError(f"Batch job {job_name} finished in state {state}")
+
+        self.client.download_results(job_name, output_path)
+        yield from self._read_results(groups, output_path)
+
+    def _write_request(self, f, key: int, context: str, questions: List[str]) -> None:
+        """Append one packed request for questions about a context to the batch input file."""
+        numbered = "\n".join(f"{j}. {question}" for j, question in enumerate(questions, 1))
+        prompt = (
+            f"Context: {context}\n\n"
+            "Answer each of the following questions. Respond with a JSON array containing "
+            "one object per question, with the question number as \"index\" and the answer "
+            f"as \"answer\".\n\nQuestions:\n{numbered}"
+        )
+        f.write(json.dumps({
+            "key": str(key),
+            "request": {
+                "contents": [{"parts": [{"text": prompt}], "role": "user"}],
+                "generation_config": {
+                    "max_output_tokens": settings.MAX_TOKENS * len(questions),
+                    "temperature": settings.TEMPERATURE,
+                    "response_mime_type": "application/json",
+                    "response_schema": PACKED_RESPONSE_SCHEMA
+                }
+            }
+        }, ensure_ascii=False) + "\n")
+
+    def _wait(self, job_name: str) -> str:
+        """
+        Poll a job until it finishes, backing off exponentially between checks.
+
+        Returns:
+            str: The final job state
+        """
+        deadline = time.monotonic() + self.timeout
+        delay = self.poll_interval
+        while True:
+            try:
+                state = self.client.get_state(job_name)
+            except Exception as e:
+                # Status checks are cheap to retry; a transient failure should not lose the job
+                logger.warning(f"Error polling batch job {job_name}: {str(e)}")
+                state = None
+            if state in FINISHED_STATES:
+                return state
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Batch job {job_name} did not finish within {self.timeout:.0f}s")
+            time.sleep(delay)
+            delay = min(self.max_poll_interval, delay * 2)
+
+    def _read_results(self, groups: List[BulkGroup], path: str) -> Iterator[Tuple[BulkGroup, str, str]]:
+        """Stream the result file, caching each answer as it is read."""
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                try:
+                    group = groups[int(row["key"])]
+                except (KeyError, ValueError, IndexError):
+                    logger.warning(f"Skipping batch result with unknown key: {row.get('key')}")
+                    continue
+
+                text = _response_text(row)
+                if text is None:
+                    error = row.get("error") or {}
+                    message = f"Error: {error.get('message', 'Failed to generate response.')}"
+                    for question in group.questions:
+                        yield group, question, message
+                    continue
+
+                answers = {}
+                try:
+                    for item in json.loads(text):
+                        index = item.get("index")
+                        if isinstance(index, int) and 1 <= index <= len(group.questions) and item.get("answer"):
+                            answers[index - 1] = item["answer"]
+                except (ValueError, AttributeError, TypeError) as e:
+                    logger.warning(f"Invalid batch result for key {row['key']}: {str(e)}")
+                for i, question in enumerate(group.questions):
+                    answer = answers.get(i)
+                    if answer is None:
+                        # Not cached, so a later run asks again
+                        yield group, question, "Failed to generate response."
+                        continue
+                    self.context_cache.cache_response_for_digest(question, group.context_digest, answer)
+                    yield group, question, answer
@@ -0,0 +1,247 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from typing import Optional
+from config import settings
+from .metrics import CACHE_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend:
+    """Storage interface for the persistent tier behind the in-memory cache."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Get a stored value.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Optional[bytes]: Stored value if present and not expired, None otherwise
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        """
+        Store a value.
+
+        Args:
+            key (str): Cache key
+            value (bytes): Value to store
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a stored value.
+
+        Args:
+            key (str): Cache key
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove all stored values."""
+        raise NotImplementedError
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    SQLite-backed cache shared across threads, processes and restarts.
+
+    Uses WAL journaling so readers never block the writer. Entries expire after
+    ``ttl`` seconds and the least recently used entries are evicted once the
+    stored values exceed ``max_bytes``. The running total is maintained by
+    triggers, so the budget check does not scan the table.
+    """
+
+    # Access times are only rewritten when older than this, to keep reads mostly read-only
+    ACCESS_RESOLUTION = 60.0
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[int] = None,
+        table: str = "responses"
+    ):
+        """
+        Args:
+            path (Optional[str]): Database file path
+            max_bytes (Optional[int]): Byte budget for stored values
+            ttl (Optional[int]): Entry time-to-live in seconds
+            table (str): Table name, so several caches can share one database file
+        """
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Invalid table name: {table}")
+
+        self.path = path or settings.CACHE_DB_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else settings.CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else settings.CACHE_TTL
+        self.table = table
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._create_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self) -> None:
+        t = self.table
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {t} (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {t}_accessed ON {t} (accessed_at)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {t}_expires ON {t} (expires_at)")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {t}_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total_bytes INTEGER NOT NULL
+                )
+            """)
+            conn.execute(f"INSERT OR IGNORE INTO {t}_stats (id, total_bytes) VALUES (0, 0)")
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {t}_insert AFTER INSERT ON {t} BEGIN
+                    UPDATE {t}_stats SET total_bytes = total_bytes + NEW.size WHERE id = 0;
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {t}_update AFTER UPDATE OF size ON {t} BEGIN
+                    UPDATE {t}_stats SET total_bytes = total_bytes + NEW.size - OLD.size WHERE id = 0;
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {t}_delete AFTER DELETE ON {t} BEGIN
+                    UPDATE {t}_stats SET total_bytes = total_bytes - OLD.size WHERE id = 0;
+                END
+            """)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._connection()
+        row = conn.execute(
+            f"SELECT value, expires_at, accessed_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at <= now:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ? AND expires_at <= ?", (key, now))
+            return None
+        if accessed_at < now - self.ACCESS_RESOLUTION:
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"""
+                INSERT INTO {self.table} (key, value, size, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = excluded.value,
+                    size = excluded.size,
+                    expires_at = excluded.expires_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                (key, value, len(value), now + self.ttl, now)
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> int:
+        """
+        Bring the stored bytes back under budget, dropping expired entries first
+        and then the least recently used ones. Must run inside a write transaction.
+
+        Returns:
+            int: Number of entries evicted
+        """
+        total = self._total_bytes(conn)
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+        total = self._total_bytes(conn)
+        if total > self.max_bytes:
+            victims = []
+            excess = total - self.max_bytes
+            for key, size in conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY accessed_at"
+            ):
+                victims.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+            evicted += len(victims)
+
+        CACHE_EVICTIONS.inc(evicted, tier="persistent", table=self.table)
+        logger.info(f"Evicted {evicted} entries from {self.table} cache")
+        return evicted
+
+    def _total_bytes(self, conn: sqlite3.Connection) -> int:
+        return conn.execute(f"SELECT total_bytes FROM {self.table}_stats WHERE id = 0").fetchone()[0]
+
+    def delete(self, key: str) -> None:
+        self._connection().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._connection().execute(f"DELETE FROM {self.table}")
+
+def create_backend(
+    table: str = "responses", max_bytes: Optional[int] = None, ttl: Optional[int] = None
+) -> Optional[CacheBackend]:
+    """
+    Build the persistent cache backend selected by ``settings.CACHE_BACKEND``.
+
+    Args:
+        table (str): Table name for the cache within the backend
+        max_bytes (Optional[int]): Byte budget, defaults to ``settings.CACHE_MAX_BYTES``
+        ttl (Optional[int]): Entry time-to-live, defaults to ``settings.CACHE_TTL``
+
+    Returns:
+        Optional[CacheBackend]: The backend, or None for memory-only caching
+    """
+    if settings.CACHE_BACKEND == "memory":
+        return None
+    if settings.CACHE_BACKEND == "sqlite":
+        try:
+            return SQLiteCacheBackend(table=table, max_bytes=max_bytes, ttl=ttl)
+        except Exception as e:
+            logger.error(f"Error opening SQLite cache, falling back to memory: {str(e)}")
+            return None
+    raise ValueError(f"Unknown cache backend: {settings.CACHE_BACKEND}")
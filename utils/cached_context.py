@@ -0,0 +1,189 @@
+import datetime
+import re
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import settings
+from .model_client import default_generation_config
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_INSTRUCTION = (
+    "You answer questions about a video using its transcript, which is provided "
+    "as the cached context. Base your answers on the transcript."
+)
+
+def cached_model_name(model_name: str) -> str:
+    """
+    Versioned name of a model for the caching API, which rejects unversioned
+    Gemini 1.x aliases such as ``gemini-1.5-pro``.
+
+    Args:
+        model_name (str): Model name, e.g. ``settings.MODEL_NAME``
+
+    Returns:
+        str: Name with the ``models/`` prefix and, for 1.x aliases, the latest stable version
+    """
+    name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+    if re.fullmatch(r"models/gemini-1\.\d-[a-z-]+", name) and not re.search(r"-\d{3}$", name):
+        name += "-002"
+    return name
+
+class CachedContextManager:
+    """
+    Creates Gemini cached-content objects for transcripts and reuses them across questions.
+
+    The transcript is uploaded once per video ID and kept server-side for
+    ``settings.CACHE_TTL`` seconds, so each question only sends the question text.
+    Concurrent requests for the same uncached video wait for a single upload,
+    while uploads for different videos run in parallel. Entries are kept per
+    process, so separate processes (e.g. service workers) upload their own copies.
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        ttl: Optional[int] = None,
+        min_context_length: Optional[int] = None,
+        caching_api: Any = None,
+        model_factory: Optional[Callable[[Any], Any]] = None
+    ):
+        """
+        Args:
+            model_name (Optional[str]): Versioned model name the cached content is created for;
+                defaults to ``settings.CONTEXT_CACHE_MODEL_NAME``, else the versioned ``settings.MODEL_NAME``
+            ttl (Optional[int]): Lifetime of cached contents in seconds
+            min_context_length (Optional[int]): Shortest context (in characters) worth caching
+            caching_api (Any): Object exposing ``create(model=..., ...)``; defaults to
+                ``google.generativeai.caching.CachedContent``
+            model_factory (Optional[Callable]): Builds a model bound to a cached content; defaults
+                to ``genai.GenerativeModel.from_cached_content``
+        """
+        # Bound to the same model that answers uncached questions
+        self.model_name = model_name or settings.CONTEXT_CACHE_MODEL_NAME or cached_model_name(settings.MODEL_NAME)
+        self.ttl = ttl if ttl is not None else settings.CACHE_TTL
+        self.min_context_length = (
+            min_context_length if min_context_length is not None
+            else settings.CONTEXT_CACHE_MIN_LENGTH
+        )
+
+        if caching_api is None or model_factory is None:
+            import google.generativeai as genai
+            from google.generativeai import caching
+            caching_api = caching_api or caching.CachedContent
+            model_factory = model_factory or (
+                lambda cached_content: genai.GenerativeModel.from_cached_content(
+                    cached_content, generation_config=default_generation_config()
+                )
+            )
+        self.caching_api = caching_api
+        self.model_factory = model_factory
+
+        # video_id -> {"cached_content", "model", "context_hash", "expires_at"}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # Uploads in progress, by (video_id, context_hash)
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, video_id: Optional[str], context: str) -> Optional[Any]:
+        """
+        Get a model bound to the cached transcript for a video, creating the cache if needed.
+
+        Args:
+            video_id (Optional[str]): Video the context belongs to
+            context (str): Transcript to cache
+
+        Returns:
+            Optional[Any]: Model serving from the cached context, or None if the context
+            should be sent inline (no video ID, context too short or creation failed)
+        """
+        if not video_id or len(context) < self.min_context_length:
+            return None
+
+        context_hash = hash(context)
+        key = (video_id, context_hash)
+        with self._lock:
+            self._prune_expired()
+            entry = self._entries.get(video_id)
+            # Refresh slightly before the server-side expiry to avoid racing it
+            if (
+                entry
+                and entry["context_hash"] == context_hash
+                and entry["expires_at"] - 30 > time.time()
+            ):
+                return entry["model"]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result()
+
+        model = None
+        try:
+            # Not under the lock: the upload can take seconds
+            cached_content = self.caching_api.create(
+                model=self.model_name,
+                display_name=f"transcript-{video_id}",
+                system_instruction=SYSTEM_INSTRUCTION,
+                contents=[context],
+                ttl=datetime.timedelta(seconds=self.ttl)
+            )
+            model = self.model_factory(cached_content)
+        except Exception as e:
+            logger.error(f"Error creating cached context for video {video_id}: {str(e)}")
+        else:
+            with self._lock:
+                entry = self._entries.get(video_id)
+                self._entries[video_id] = {
+                    "cached_content": cached_content,
+                    "model": model,
+                    "context_hash": context_hash,
+                    "expires_at": time.time() + self.ttl
+                }
+            if entry:
+                self._delete(entry["cached_content"])
+            logger.info(f"Created cached context for video: {video_id}")
+        finally:
+            # Waiters get None on failure and send the context inline, like the leader
+            future.set_result(model)
+            with self._lock:
+                self._inflight.pop(key, None)
+        return model
+
+    def _prune_expired(self) -> None:
+        """Drop entries whose cached contents have expired server-side. Must hold the lock."""
+        now = time.time()
+        for video_id in [video_id for video_id, entry in self._entries.items() if entry["expires_at"] <= now]:
+            del self._entries[video_id]
+
+    def invalidate(self, video_id: str) -> None:
+        """
+        Drop the cached context for a video and delete it server-side.
+
+        Args:
+            video_id (str): Video whose cached context should be removed
+        """
+        with self._lock:
+            entry = self._entries.pop(video_id, None)
+        if entry:
+            self._delete(entry["cached_content"])
+
+    def clear(self) -> None:
+        """Drop all cached contexts and delete them server-side."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._delete(entry["cached_content"])
+
+    def _delete(self, cached_content: Any) -> None:
+        """Delete a cached content server-side, ignoring failures (it expires anyway)."""
+        try:
+            cached_content.delete()
+        except Exception as e:
+            logger.warning(f"Error deleting cached context: {str(e)}")
@@ -1,139 +1,286 @@
-from cachetools import TTLCache
-from typing import Dict, List, Optional, Tuple
-import hashlib
-from config import settings
-import json
-
-class ContextCache:
-    def __init__(self):
-        self.cache = TTLCache(maxsize=100, ttl=settings.CACHE_TTL)
-        self.conversation_history: Dict[str, List[Dict]] = {}
-        self.language_cache: Dict[str, Tuple[str, float]] = {}
-        self.cultural_cache: Dict[str, List[Dict]] = {}
-    
-    def _generate_key(self, text: str) -> str:
-        """Generate a unique key for the given text."""
-        return hashlib.md5(text.encode()).hexdigest()
-    
-    def get_response(self, question: str, context: str) -> Optional[str]:
-        """
-        Get cached response for a question and context.
-        
-        Args:
-            question (str): The question being asked
-            context (str): The context for the question
-            
-        Returns:
-            Optional[str]: Cached response if available, None otherwise
-        """
-        key = self._generate_key(f"{question}:{context}")
-        return self.cache.get(key)
-    
-    def cache_response(self, question: str, context: str, response: str) -> None:
-        """
-        Cache a response for a question and context.
-        
-        Args:
-            question (str): The question being asked
-            context (str): The context for the question
-            response (str): The response to cache
-        """
-        key = self._generate_key(f"{question}:{context}")
-        self.cache[key] = response
-    
-    def get_language_info(self, text: str) -> Optional[Tuple[str, float]]:
-        """
-        Get cached language detection info.
-        
-        Args:
-            text (str): Text to get language info for
-            
-        Returns:
-            Optional[Tuple[str, float]]: (language_code, confidence) if cached
-        """
-        key = self._generate_key(text)
-        return self.language_cache.get(key)
-    
-    def cache_language_info(self, text: str, lang_code: str, confidence: float) -> None:
-        """
-        Cache language detection info.
-        
-        Args:
-            text (str): Text to cache language info for
-            lang_code (str): Detected language code
-            confidence (float): Detection confidence
-        """
-        key = self._generate_key(text)
-        self.language_cache[key] = (lang_code, confidence)
-    
-    def get_cultural_references(self, text: str) -> Optional[List[Dict]]:
-        """
-        Get cached cultural references.
-        
-        Args:
-            text (str): Text to get cultural references for
-            
-        Returns:
-            Optional[List[Dict]]: List of cultural references if cached
-        """
-        key = self._generate_key(text)
-        return self.cultural_cache.get(key)
-    
-    def cache_cultural_references(self, text: str, references: List[Dict]) -> None:
-        """
-        Cache cultural references.
-        
-        Args:
-            text (str): Text to cache cultural references for
-            references (List[Dict]): Cultural references to cache
-        """
-        key = self._generate_key(text)
-        self.cultural_cache[key] = references
-    
-    def add_to_conversation(self, conversation_id: str, role: str, content: str) -> None:
-        """
-        Add a message to the conversation history.
-        
-        Args:
-            conversation_id (str): Unique conversation identifier
-            role (str): Role of the message sender (user/assistant)
-            content (str): Message content
-        """
-        if conversation_id not in self.conversation_history:
-            self.conversation_history[conversation_id] = []
-        self.conversation_history[conversation_id].append({
-            "role": role,
-            "content": content
-        })
-    
-    def get_conversation_history(self, conversation_id: str) -> List[Dict]:
-        """
-        Retrieve the conversation history for a given ID.
-        
-        Args:
-            conversation_id (str): Unique conversation identifier
-            
-        Returns:
-            List[Dict]: List of conversation messages
-        """
-        return self.conversation_history.get(conversation_id, [])
-    
-    def clear_conversation(self, conversation_id: str) -> None:
-        """
-        Clear the conversation history for a given ID.
-        
-        Args:
-            conversation_id (str): Unique conversation identifier
-        """
-        if conversation_id in self.conversation_history:
-            del self.conversation_history[conversation_id]
-    
-    def clear_all(self) -> None:
-        """Clear all cached data and conversation histories."""
-        self.cache.clear()
-        self.conversation_history.clear()
-        self.language_cache.clear()
-        self.cultural_cache.clear()
-
-# Create a global instance
+from cachetools import LRUCache, TTLCache
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import hashlib
+import threading
+import logging
+from config import settings
+import json
+from .cache_backends import CacheBackend, create_backend
+from .metrics import CACHE_EVICTIONS, CACHE_REQUESTS
+from .semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+class ContextCache:
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        semantic_cache: Optional[SemanticCache] = None
+    ):
+        """
+        Args:
+            backend (Optional[CacheBackend]): Persistent tier behind the in-memory cache.
+                Defaults to the backend selected by ``settings.CACHE_BACKEND``.
+            semantic_cache (Optional[SemanticCache]): Tier matching near-duplicate questions.
+                Defaults to a new one when ``settings.SEMANTIC_CACHE_ENABLED`` is set.
+        """
+        # In-memory L1 in front of the persistent backend
+        self.cache = TTLCache(maxsize=settings.CACHE_MAX_ENTRIES, ttl=settings.CACHE_TTL)
+        self.backend = backend if backend is not None else create_backend()
+        if semantic_cache is None and settings.SEMANTIC_CACHE_ENABLED:
+            semantic_cache = SemanticCache()
+        self.semantic_cache = semantic_cache
+        # TTLCache is not thread-safe and responses are cached from worker threads
+        self._lock = threading.Lock()
+        # Context digests memoized by video ID and by object identity; entries hold
+        # the context, so a video's digest is only reused for equal text and an
+        # id cannot be reused while its entry exists
+        self._video_digests = LRUCache(maxsize=64)
+        self._identity_digests = LRUCache(maxsize=8)
+        # Bounded per conversation and in the number of conversations
+        self.conversation_history: "LRUCache[str, Deque[Tuple[str, str]]]" = LRUCache(
+            maxsize=settings.CONVERSATION_MAX_SESSIONS
+        )
+        self.language_cache: Dict[str, Tuple[str, float]] = {}
+        self.cultural_cache: Dict[str, List[Dict]] = {}
+    
+    def _generate_key(self, text: str) -> str:
+        """Generate a unique key for the given text."""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def context_digest(self, context: str, video_id: Optional[str] = None) -> str:
+        """
+        Fingerprint a context, hashing each transcript only once.
+        
+        Args:
+            context (str): The context to fingerprint
+            video_id (Optional[str]): ID of the video the context belongs to
+            
+        Returns:
+            str: Hex digest of the context
+        """
+        with self._lock:
+            if video_id is not None:
+                entry = self._video_digests.get(video_id)
+                # Usually the same object; otherwise comparing is still cheaper than hashing
+                if entry is not None and entry[0] == context:
+                    return entry[1]
+            entry = self._identity_digests.get(id(context))
+            if entry is not None and entry[0] is context:
+                return entry[1]
+        
+        digest = self._generate_key(context)
+        with self._lock:
+            self._identity_digests[id(context)] = (context, digest)
+            if video_id is not None:
+                self._video_digests[video_id] = (context, digest)
+        return digest
+    
+    def _response_key(self, question: str, digest: str, namespace: str = "") -> str:
+        """Build the cache key for a question from the context digest and normalized question."""
+        # The digest is fixed-length hex, so the separator cannot be ambiguous
+        normalized_question = " ".join(question.split()).casefold()
+        key = f"{digest}:{normalized_question}"
+        return f"{namespace}/{key}" if namespace else key
+    
+    def get_response(
+        self, question: str, context: str, video_id: Optional[str] = None, namespace: str = ""
+    ) -> Optional[str]:
+        """
+        Get cached response for a question and context.
+        
+        Args:
+            question (str): The question being asked
+            context (str): The context for the question
+            video_id (Optional[str]): ID of the video the context belongs to
+            namespace (str): Keeps intermediate results (e.g. per-chunk partial answers)
+                apart from final answers; namespaced entries skip the semantic tier
+            
+        Returns:
+            Optional[str]: Cached response if available, None otherwise
+        """
+        key = self._response_key(question, self.context_digest(context, video_id), namespace)
+        with self._lock:
+            response = self.cache.get(key)
+        if response is not None:
+            CACHE_REQUESTS.inc(tier="memory", result="hit")
+            return response
+        CACHE_REQUESTS.inc(tier="memory", result="miss")
+        
+        if self.backend is not None:
+            value = None
+            try:
+                value = self.backend.get(key)
+            except Exception as e:
+                logger.warning(f"Error reading from cache backend: {str(e)}")
+            if value is not None:
+                CACHE_REQUESTS.inc(tier="persistent", result="hit")
+                # Promote to the in-memory tier
+                response = value.decode("utf-8")
+                with self._lock:
+                    self.cache[key] = response
+                return response
+            CACHE_REQUESTS.inc(tier="persistent", result="miss")
+        
+        # Fall back to answers for similarly worded questions
+        if self.semantic_cache is not None and not namespace:
+            response = self.semantic_cache.lookup(self.context_digest(context, video_id), question)
+            CACHE_REQUESTS.inc(tier="semantic", result="miss" if response is None else "hit")
+            return response
+        return None
+    
+    def cache_response(
+        self,
+        question: str,
+        context: str,
+        response: str,
+        video_id: Optional[str] = None,
+        namespace: str = ""
+    ) -> None:
+        """
+        Cache a response for a question and context.
+        
+        Args:
+            question (str): The question being asked
+            context (str): The context for the question
+            response (str): The response to cache
+            video_id (Optional[str]): ID of the video the context belongs to
+            namespace (str): Namespace the response belongs to, see ``get_response``
+        """
+        self.cache_response_for_digest(question, self.context_digest(context, video_id), response, namespace)
+    
+    def cache_response_for_digest(
+        self, question: str, digest: str, response: str, namespace: str = ""
+    ) -> None:
+        """
+        Cache a response for a question about a context known only by its digest.
+        
+        Lets callers that do not keep large contexts around (e.g. bulk jobs
+        reading results back) still cache answers for them.
+        
+        Args:
+            question (str): The question being asked
+            digest (str): ``context_digest`` of the context
+            response (str): The response to cache
+            namespace (str): Namespace the response belongs to, see ``get_response``
+        """
+        key = self._response_key(question, digest, namespace)
+        with self._lock:
+            if key not in self.cache and len(self.cache) >= self.cache.maxsize:
+                CACHE_EVICTIONS.inc(tier="memory")
+            self.cache[key] = response
+        if self.backend is not None:
+            try:
+                self.backend.set(key, response.encode("utf-8"))
+            except Exception as e:
+                logger.warning(f"Error writing to cache backend: {str(e)}")
+        if self.semantic_cache is not None and not namespace:
+            self.semantic_cache.add(digest, question, response)
+    
+    def get_language_info(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Get cached language detection info.
+        
+        Args:
+            text (str): Text to get language info for
+            
+        Returns:
+            Optional[Tuple[str, float]]: (language_code, confidence) if cached
+        """
+        key = self._generate_key(text)
+        return self.language_cache.get(key)
+    
+    def cache_language_info(self, text: str, lang_code: str, confidence: float) -> None:
+        """
+        Cache language detection info.
+        
+        Args:
+            text (str): Text to cache language info for
+            lang_code (str): Detected language code
+            confidence (float): Detection confidence
+        """
+        key = self._generate_key(text)
+        self.language_cache[key] = (lang_code, confidence)
+    
+    def get_cultural_references(self, text: str) -> Optional[List[Dict]]:
+        """
+        Get cached cultural references.
+        
+        Args:
+            text (str): Text to get cultural references for
+            
+        Returns:
+            Optional[List[Dict]]: List of cultural references if cached
+        """
+        key = self._generate_key(text)
+        return self.cultural_cache.get(key)
+    
+    def cache_cultural_references(self, text: str, references: List[Dict]) -> None:
+        """
+        Cache cultural references.
+        
+        Args:
+            text (str): Text to cache cultural references for
+            references (List[Dict]): Cultural references to cache
+        """
+        key = self._generate_key(text)
+        self.cultural_cache[key] = references
+    
+    def add_to_conversation(self, conversation_id: str, role: str, content: str) -> None:
+        """
+        Add a message to the conversation history.
+        
+        Args:
+            conversation_id (str): Unique conversation identifier
+            role (str): Role of the message sender (user/assistant)
+            content (str): Message content
+        """
+        with self._lock:
+            messages = self.conversation_history.get(conversation_id)
+            if messages is None:
+                # Two messages (question and answer) per turn
+                messages = deque(maxlen=2 * settings.CONVERSATION_MAX_TURNS)
+                self.conversation_history[conversation_id] = messages
+            messages.append((role, content))
+    
+    def get_conversation_history(self, conversation_id: str) -> List[Dict]:
+        """
+        Retrieve the conversation history for a given ID.
+        
+        Only the most recent ``2 * settings.CONVERSATION_MAX_TURNS`` messages are kept.
+        
+        Args:
+            conversation_id (str): Unique conversation identifier
+            
+        Returns:
+            List[Dict]: List of conversation messages
+        """
+        with self._lock:
+            messages = list(self.conversation_history.get(conversation_id, ()))
+        return [{"role": role, "content": content} for role, content in messages]
+    
+    def clear_conversation(self, conversation_id: str) -> None:
+        """
+        Clear the conversation history for a given ID.
+        
+        Args:
+            conversation_id (str): Unique conversation identifier
+        """
+        with self._lock:
+            self.conversation_history.pop(conversation_id, None)
+    
+    def clear_all(self) -> None:
+        """Clear all cached data and conversation histories."""
+        with self._lock:
+            self.cache.clear()
+            self.conversation_history.clear()
+        if self.backend is not None:
+            self.backend.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+        self.language_cache.clear()
+        self.cultural_cache.clear()
+
+# Create a global instance
 context_cache = ContextCache() 
\ No newline at end of file
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+import weakref
+import logging
+from collections import deque
+from typing import Deque, List, Optional
+from config import settings
+from .cache_backends import CacheBackend, create_backend
+
+logger = logging.getLogger(__name__)
+
+class _Answer:
+    """Answer text shared by every turn, in any session, that received the same answer."""
+
+    __slots__ = ("text", "__weakref__")
+
+    def __init__(self, text: str):
+        self.text = text
+
+class AnswerPool:
+    """
+    Deduplicates answer text across turns and sessions.
+
+    Entries are held weakly, so an answer is freed once no stored turn refers to it.
+    """
+
+    def __init__(self):
+        self._answers: "weakref.WeakValueDictionary[str, _Answer]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def intern(self, text: str) -> _Answer:
+        """
+        Get the shared copy of an answer, adding it if new.
+
+        Args:
+            text (str): Answer text
+
+        Returns:
+            _Answer: The shared answer
+        """
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer is None:
+                answer = _Answer(text)
+                self._answers[key] = answer
+            return answer
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+class ConversationTurn:
+    """One question and its answer."""
+
+    __slots__ = ("question", "_answer", "video_id", "created_at", "size")
+
+    def __init__(self, question: str, answer: _Answer, video_id: Optional[str], created_at: float):
+        self.question = question
+        self._answer = answer
+        self.video_id = video_id
+        self.created_at = created_at
+        self.size = len(question) + len(answer.text)
+
+    @property
+    def answer(self) -> str:
+        return self._answer.text
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            "question": self.question,
+            "answer": self.answer,
+            "video_id": self.video_id,
+            "created_at": self.created_at
+        }).encode("utf-8")
+
+class ConversationStore:
+    """
+    Conversation history for one session, bounded in turns and size.
+
+    The most recent turns stay in memory; once either limit is exceeded the oldest
+    turns spill to the persistent cache and are read back only when a page that
+    contains them is shown. Answer text is shared through the answer pool rather
+    than copied per turn.
+    """
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        max_turns: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        backend: Optional[CacheBackend] = None,
+        pool: Optional[AnswerPool] = None
+    ):
+        """
+        Args:
+            session_id (Optional[str]): Identifies the session's spilled turns; random by default
+            max_turns (Optional[int]): Turns kept in memory
+            max_bytes (Optional[int]): Characters of question and answer text kept in memory
+            backend (Optional[CacheBackend]): Tier old turns spill to; defaults to a
+                ``conversations`` table in the cache database. Without one (``CACHE_BACKEND=memory``),
+                old turns are dropped and no longer counted, so the history holds the in-memory turns.
+            pool (Optional[AnswerPool]): Answer pool, defaults to the shared global instance
+        """
+        self.session_id = session_id or uuid.uuid4().hex
+        self.max_turns = max(1, max_turns or settings.CONVERSATION_MAX_TURNS)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.CONVERSATION_MAX_BYTES
+        if backend is None:
+            backend = create_backend(table="conversations", ttl=settings.CONVERSATION_TTL)
+        self.backend = backend
+        self.pool = pool if pool is not None else answer_pool
+
+        self._turns: Deque[ConversationTurn] = deque()
+        self._size = 0
+        # Turns [0, _spilled) live in the backend, [_spilled, _count) in memory
+        self._spilled = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of turns, including spilled ones."""
+        return self._count
+
+    @property
+    def size(self) -> int:
+        """Characters of text held in memory."""
+        return self._size
+
+    def add(self, question: str, answer: str, video_id: Optional[str] = None) -> ConversationTurn:
+        """
+        Record a turn, spilling the oldest turns if a limit is exceeded.
+
+        Args:
+            question (str): The question asked
+            answer (str): The answer given
+            video_id (Optional[str]): Video the question was about
+
+        Returns:
+            ConversationTurn: The recorded turn
+        """
+        turn = ConversationTurn(question, self.pool.intern(answer), video_id, time.time())
+        with self._lock:
+            self._turns.append(turn)
+            self._size += turn.size
+            self._count += 1
+            while len(self._turns) > 1 and (
+                len(self._turns) > self.max_turns or self._size > self.max_bytes
+            ):
+                self._spill(self._turns.popleft())
+        return turn
+
+    def _spill(self, turn: ConversationTurn) -> None:
+        """Move the oldest in-memory turn to the backend, or drop it without one. Must hold the lock."""
+        self._size -= turn.size
+        if self.backend is None:
+            # Nowhere to read it back from, so pages must not count it
+            self._count -= 1
+            return
+        try:
+            self.backend.set(self._key(self._spilled), turn.to_bytes())
+        except Exception as e:
+            logger.warning(f"Error spilling conversation turn: {str(e)}")
+        self._spilled += 1
+
+    def _key(self, index: int) -> str:
+        return f"{self.session_id}:{index}"
+
+    def _load(self, index: int) -> Optional[ConversationTurn]:
+        """Read a spilled turn back from the backend."""
+        if self.backend is None:
+            return None
+        try:
+            data = self.backend.get(self._key(index))
+        except Exception as e:
+            logger.warning(f"Error reading conversation turn: {str(e)}")
+            return None
+        if data is None:
+            # Expired or evicted from the persistent cache
+            return None
+        row = json.loads(data)
+        return ConversationTurn(
+            row["question"], self.pool.intern(row["answer"]), row.get("video_id"), row["created_at"]
+        )
+
+    def page_count(self, page_size: Optional[int] = None) -> int:
+        page_size = page_size or settings.CONVERSATION_PAGE_SIZE
+        return max(1, -(-self._count // page_size))
+
+    def page(self, number: int, page_size: Optional[int] = None) -> List[ConversationTurn]:
+        """
+        Get one page of turns, newest first; page 0 holds the most recent turns.
+
+        Only the turns on the page are materialized, and spilled turns are read
+        from the backend only when the page reaches them.
+
+        Args:
+            number (int): Page number
+            page_size (Optional[int]): Turns per page, defaults to ``settings.CONVERSATION_PAGE_SIZE``
+
+        Returns:
+            List[ConversationTurn]: The page's turns; spilled turns that expired are skipped
+        """
+        page_size = page_size or settings.CONVERSATION_PAGE_SIZE
+        with self._lock:
+            stop = self._count - number * page_size
+            start = max(0, stop - page_size)
+            spilled = self._spilled
+            in_memory = [
+                self._turns[index - spilled]
+                for index in range(max(start, spilled), max(stop, spilled))
+            ]
+
+        turns = []
+        for index in range(start, min(stop, spilled)):
+            turn = self._load(index)
+            if turn is not None:
+                turns.append(turn)
+        turns.extend(in_memory)
+        turns.reverse()
+        return turns
+
+    def recent(self, limit: int) -> List[ConversationTurn]:
+        """
+        Get the most recent in-memory turns, oldest first.
+
+        Args:
+            limit (int): Maximum number of turns
+
+        Returns:
+            List[ConversationTurn]: The turns
+        """
+        with self._lock:
+            start = max(0, len(self._turns) - limit)
+            return [self._turns[i] for i in range(start, len(self._turns))]
+
+    def clear(self) -> None:
+        """Drop all turns, including spilled ones."""
+        with self._lock:
+            spilled = self._spilled
+            self._turns.clear()
+            self._size = 0
+            self._spilled = 0
+            self._count = 0
+        if self.backend is not None:
+            for index in range(spilled):
+                try:
+                    self.backend.delete(self._key(index))
+                except Exception as e:
+                    logger.warning(f"Error deleting conversation turn: {str(e)}")
+                    break
+
+# Shared by every session in the process
+answer_pool = AnswerPool()
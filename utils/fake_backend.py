@@ -0,0 +1,160 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from .model_client import ModelClient
+
+_QUESTION_PATTERN = re.compile(r"Question: (.*?)\n", re.S)
+_NUMBERED_PATTERN = re.compile(r"^(\d+)\. (.+)$", re.M)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+class ResourceExhausted(Exception):
+    """Simulated quota error, shaped like ``google.api_core.exceptions.ResourceExhausted``."""
+
+    code = 429
+
+class FakeUsageMetadata:
+    """Mirrors the token counts reported on Gemini responses."""
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+class FakeResponse:
+    """Minimal stand-in for ``GenerateContentResponse``."""
+
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.usage_metadata = FakeUsageMetadata(prompt_tokens, estimate_tokens(text))
+
+class FakeTokenCount:
+    """Minimal stand-in for ``CountTokensResponse``."""
+
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+class FakeGenerativeModel(ModelClient):
+    """
+    Deterministic, offline stand-in for ``genai.GenerativeModel``.
+
+    Answers are derived from the question text, so repeated runs produce the
+    same output. Packed (JSON) requests get one answer per numbered question.
+    Latency, generation speed and rate-limit errors can be simulated; errors are
+    drawn from a seeded generator so a run can be replayed.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        model_name: str = "fake-model",
+        seconds_per_token: float = 0.0,
+        rate_limit_probability: float = 0.0,
+        seed: int = 0
+    ):
+        """
+        Args:
+            latency (float): Seconds to sleep per request before the first token, to
+                simulate network time
+            model_name (str): Name reported by the model
+            seconds_per_token (float): Seconds to sleep per response token, to simulate
+                generation time; streamed chunks are spread out accordingly
+            rate_limit_probability (float): Chance that a request fails with ``ResourceExhausted``
+            seed (int): Seed for the rate-limit error draws
+        """
+        self.latency = latency
+        self.model_name = model_name
+        self.seconds_per_token = seconds_per_token
+        self.rate_limit_probability = rate_limit_probability
+        self.requests = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(
+        self,
+        contents: Any,
+        generation_config: Optional[Dict[str, Any]] = None,
+        request_options: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+        **kwargs
+    ):
+        prompt = self._prompt_text(contents)
+        with self._lock:
+            self.requests += 1
+            limited = self.rate_limit_probability and self._random.random() < self.rate_limit_probability
+            if limited:
+                self.rate_limited += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if limited:
+            raise ResourceExhausted("429 Resource has been exhausted (simulated)")
+
+        response = self._respond(prompt, generation_config)
+        if stream:
+            return self._stream(response)
+        if self.seconds_per_token:
+            time.sleep(response.usage_metadata.candidates_token_count * self.seconds_per_token)
+        return response
+
+    def count_tokens(self, contents: Any) -> FakeTokenCount:
+        return FakeTokenCount(estimate_tokens(self._prompt_text(contents)))
+
+    def _prompt_text(self, contents: Any) -> str:
+        return contents if isinstance(contents, str) else "\n".join(str(part) for part in contents)
+
+    def _respond(self, prompt: str, generation_config: Optional[Dict[str, Any]]) -> FakeResponse:
+        if generation_config and generation_config.get("response_mime_type") == "application/json":
+            answers = [
+                {"index": int(index), "answer": self._answer(question)}
+                for index, question in _NUMBERED_PATTERN.findall(prompt)
+            ]
+            return FakeResponse(json.dumps(answers), estimate_tokens(prompt))
+
+        match = _QUESTION_PATTERN.search(prompt)
+        question = match.group(1).strip() if match else prompt[-200:]
+        return FakeResponse(self._answer(question), estimate_tokens(prompt))
+
+    def _stream(self, response: FakeResponse) -> Iterator[FakeResponse]:
+        """
+        Yield the answer a word at a time, like a streamed response. The last chunk
+        carries the usage totals for the whole response, as the API does.
+        """
+        words = response.text.split(" ")
+        for i, word in enumerate(words):
+            chunk = FakeResponse(word if i == 0 else " " + word, 0)
+            if self.seconds_per_token:
+                time.sleep(chunk.usage_metadata.candidates_token_count * self.seconds_per_token)
+            if i == len(words) - 1:
+                chunk.usage_metadata = response.usage_metadata
+            yield chunk
+
+    def _answer(self, question: str) -> str:
+        digest = hashlib.blake2b(question.encode("utf-8"), digest_size=4).hexdigest()
+        return f"Fake answer [{digest}] to: {question}"
+
+def fake_transcript_fetcher(video_id: str, segments: int = 200) -> List[Dict[str, Any]]:
+    """
+    Build deterministic transcript segments for a video without calling YouTube.
+
+    Args:
+        video_id (str): YouTube video ID
+        segments (int): Number of segments to generate
+
+    Returns:
+        List[Dict[str, Any]]: Segments shaped like the transcript API's output
+    """
+    return [
+        {
+            "text": f"In video {video_id}, segment {i} discusses topic {i % 7}.",
+            "start": i * 4.0,
+            "duration": 4.0
+        }
+        for i in range(segments)
+    ]
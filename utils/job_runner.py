@@ -0,0 +1,382 @@
+"""
+Headless batch runner for "these questions against these videos" workloads.
+
+Usage (from the project root):
+    python -m utils.job_runner run jobs.jsonl --output results.jsonl
+
+Each input line is a JSON object:
+    {"video": "<url or video id>", "questions": ["..."], "transcript": "..."}
+``questions`` falls back to ``--questions`` and ``transcript`` is fetched when
+omitted. Results are appended to the output JSONL as they complete, one line
+per (video, question). Re-running with the same output skips pairs already
+answered, so a killed run resumes where it stopped. ``--bulk`` submits every
+pending question as one batch prediction job instead of interactive calls.
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from config import settings
+from .batch_processor import BatchProcessor
+from .router import (
+    STRATEGY_AUTO, STRATEGY_INDIVIDUAL, STRATEGY_MAP_REDUCE, STRATEGY_PACKED, STRATEGY_RETRIEVAL
+)
+from .bulk_jobs import BulkProcessor, LocalBatchClient
+from .scheduler import PRIORITY_BULK, RequestScheduler
+from .youtube_handler import YouTubeHandler
+
+logger = logging.getLogger(__name__)
+
+_VIDEO_ID_PATTERN = re.compile(r"^[\w-]{11}$")
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """
+    Stream job records from a JSONL file without loading it all.
+
+    Args:
+        path (str): Path to the JSONL file
+
+    Returns:
+        Iterator[Dict]: One record per non-empty line
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error(f"Skipping invalid record on line {line_number}: {str(e)}")
+
+def load_questions(path: str) -> List[str]:
+    """Read one question per non-empty line."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+class JobStats:
+    """Counters for a job run."""
+
+    def __init__(self):
+        self.videos = 0
+        self.answered = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, answered: int = 0, skipped: int = 0, failed: int = 0) -> None:
+        with self._lock:
+            self.videos += 1
+            self.answered += answered
+            self.skipped += skipped
+            self.failed += failed
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.answered / elapsed if elapsed > 0 else 0.0
+        return (
+            f"{self.videos} videos, {self.answered} answered, {self.skipped} already done, "
+            f"{self.failed} failed in {elapsed:.1f}s ({rate:.2f} questions/s)"
+        )
+
+class JobRunner:
+    """Runs job records through YouTubeHandler and BatchProcessor, writing results incrementally."""
+
+    def __init__(
+        self,
+        batch_processor: BatchProcessor,
+        youtube_handler: YouTubeHandler,
+        output_path: str,
+        default_questions: Optional[List[str]] = None,
+        strategy: str = STRATEGY_INDIVIDUAL,
+        video_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            batch_processor (BatchProcessor): Answers the questions
+            youtube_handler (YouTubeHandler): Fetches transcripts
+            output_path (str): JSONL file results are appended to; also the checkpoint
+            default_questions (Optional[List[str]]): Questions for records that have none
+            strategy (str): Strategy passed to ``process_questions``
+            video_workers (Optional[int]): Number of videos processed concurrently
+        """
+        self.batch_processor = batch_processor
+        self.youtube_handler = youtube_handler
+        self.output_path = output_path
+        self.default_questions = default_questions or []
+        self.strategy = strategy
+        self.video_workers = max(1, video_workers or settings.TRANSCRIPT_PREFETCH_WORKERS)
+        self._done: Set[Tuple[str, str]] = set()
+        self._write_lock = threading.Lock()
+
+    def load_checkpoint(self) -> int:
+        """
+        Read already answered (video, question) pairs from the output file.
+
+        Returns:
+            int: Number of finished pairs found
+        """
+        try:
+            with open(self.output_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A run killed mid-write can leave a partial last line
+                        continue
+                    if row.get("ok"):
+                        self._done.add((row["video_id"], row["question"]))
+        except FileNotFoundError:
+            pass
+        return len(self._done)
+
+    def run(self, records: Iterable[Dict]) -> JobStats:
+        """
+        Process job records, keeping a bounded number of videos in flight.
+
+        Args:
+            records (Iterable[Dict]): Job records, consumed lazily
+
+        Returns:
+            JobStats: Counters for the run
+        """
+        stats = JobStats()
+        with open(self.output_path, "a", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=self.video_workers) as executor:
+            in_flight = set()
+            for record in records:
+                if len(in_flight) >= 2 * self.video_workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self._collect(done, stats)
+                in_flight.add(executor.submit(self._run_record, record, output))
+            self._collect(in_flight, stats)
+        return stats
+
+    def _collect(self, futures, stats: JobStats) -> None:
+        for future in futures:
+            try:
+                stats.add(*future.result())
+            except Exception as e:
+                logger.error(f"Error running job record: {str(e)}")
+                stats.add(failed=1)
+
+    def _prepare(self, record: Dict, output) -> Tuple[str, List[str], int, Optional[str]]:
+        """
+        Work out which of a record's questions still need answers and get its transcript.
+
+        Returns:
+            Tuple[str, List[str], int, Optional[str]]: (video ID, pending questions, skipped
+            count, transcript); the transcript is None when nothing is pending or it could
+            not be fetched, in which case the failures have already been written
+        """
+        video = str(record["video"])
+        url = f"https://youtu.be/{video}" if _VIDEO_ID_PATTERN.match(video) else video
+        video_id = self.youtube_handler.extract_video_id(url)
+
+        questions = record.get("questions") or ([record["question"]] if record.get("question") else None)
+        questions = list(dict.fromkeys(questions or self.default_questions))
+        pending = [question for question in questions if (video_id, question) not in self._done]
+        skipped = len(questions) - len(pending)
+        if not pending:
+            return video_id, pending, skipped, None
+
+        try:
+            transcript = record.get("transcript") or self.youtube_handler.get_transcript(url)
+        except Exception as e:
+            self._write(output, [
+                {"video_id": video_id, "question": question, "answer": f"Error: {str(e)}", "ok": False}
+                for question in pending
+            ])
+            return video_id, pending, skipped, None
+        return video_id, pending, skipped, transcript
+
+    def _run_record(self, record: Dict, output) -> Tuple[int, int, int]:
+        """
+        Answer one record's questions and append the results.
+
+        Returns:
+            Tuple[int, int, int]: (answered, skipped, failed) counts
+        """
+        video_id, pending, skipped, transcript = self._prepare(record, output)
+        if transcript is None:
+            return 0, skipped, len(pending)
+
+        results = self.batch_processor.process_questions(
+            pending, transcript, video_id=video_id, strategy=self.strategy
+        )
+        answered, failed = self._write_results(output, video_id, results)
+        return answered, skipped, failed
+
+    def run_bulk(self, records: Iterable[Dict], bulk_processor: BulkProcessor) -> JobStats:
+        """
+        Answer all records' questions with a single batch prediction job.
+
+        Transcripts are fetched concurrently, with a bounded number of videos in
+        flight, and each video's requests are written to the job's input file as
+        soon as its transcript arrives. Every pending question is then submitted
+        together and the results are written once the job finishes. If the job
+        fails or expires, its questions are written as failures, so the next run
+        submits them again.
+
+        Args:
+            records (Iterable[Dict]): Job records
+            bulk_processor (BulkProcessor): Submits and collects the batch job
+
+        Returns:
+            JobStats: Counters for the run
+        """
+        stats = JobStats()
+        counts: Dict[str, int] = {}
+        with open(self.output_path, "a", encoding="utf-8") as output:
+            items = self._prepared_items(records, output, stats, counts)
+            for video_id, results in bulk_processor.process_many(items).items():
+                answered, failed = self._write_results(output, video_id, results)
+                stats.add(answered, counts[video_id], failed)
+        return stats
+
+    def _prepared_items(
+        self, records: Iterable[Dict], output, stats: JobStats, counts: Dict[str, int]
+    ) -> Iterator[Tuple[str, str, List[str]]]:
+        """
+        Prepare records concurrently and yield (video ID, transcript, pending questions)
+        as they finish, keeping a bounded number in flight.
+
+        Records with nothing to do, or whose transcript failed, are counted in
+        ``stats`` instead; skipped counts of the yielded videos go to ``counts``.
+        """
+        with ThreadPoolExecutor(max_workers=self.video_workers) as executor:
+            in_flight = set()
+            for record in records:
+                if len(in_flight) >= 2 * self.video_workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    yield from self._ready_items(done, stats, counts)
+                in_flight.add(executor.submit(self._prepare, record, output))
+            yield from self._ready_items(in_flight, stats, counts)
+
+    def _ready_items(self, futures, stats: JobStats, counts: Dict[str, int]) -> Iterator[Tuple[str, str, List[str]]]:
+        for future in futures:
+            try:
+                video_id, pending, skipped, transcript = future.result()
+            except Exception as e:
+                logger.error(f"Error preparing job record: {str(e)}")
+                stats.add(failed=1)
+                continue
+            if transcript is None:
+                stats.add(skipped=skipped, failed=len(pending))
+            else:
+                counts[video_id] = counts.get(video_id, 0) + skipped
+                yield video_id, transcript, pending
+
+    def _write_results(self, output, video_id: str, results: Dict[str, str]) -> Tuple[int, int]:
+        """
+        Append one video's answers.
+
+        Returns:
+            Tuple[int, int]: (answered, failed) counts
+        """
+        rows = [
+            {
+                "video_id": video_id,
+                "question": question,
+                "answer": answer,
+                "ok": not answer.startswith("Error:") and answer != "Failed to generate response."
+            }
+            for question, answer in results.items()
+        ]
+        self._write(output, rows)
+        answered = sum(1 for row in rows if row["ok"])
+        return answered, len(rows) - answered
+
+    def _write(self, output, rows: List[Dict]) -> None:
+        with self._write_lock:
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + "\n")
+            output.flush()
+
+def write_parquet(jsonl_path: str, parquet_path: str) -> None:
+    """
+    Convert the JSONL results to Parquet (requires pyarrow).
+
+    Args:
+        jsonl_path (str): Results file written by the runner
+        parquet_path (str): Parquet file to create
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Writing Parquet requires pyarrow: pip install pyarrow")
+
+    rows = list(iter_records(jsonl_path))
+    pq.write_table(pa.Table.from_pylist(rows), parquet_path)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.job_runner", description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="Answer questions for every video in a JSONL job file")
+    run.add_argument("jobs", help="JSONL file of job records")
+    run.add_argument("--output", default="results.jsonl", help="JSONL results file (also the checkpoint)")
+    run.add_argument("--questions", help="File with one question per line for records without questions")
+    run.add_argument(
+        "--strategy",
+        default=STRATEGY_INDIVIDUAL,
+        choices=[STRATEGY_INDIVIDUAL, STRATEGY_PACKED, STRATEGY_RETRIEVAL, STRATEGY_MAP_REDUCE, STRATEGY_AUTO],
+        help="process_questions strategy"
+    )
+    run.add_argument("--workers", type=int, default=None, help="Videos processed concurrently")
+    run.add_argument("--parquet", help="Also write the results to this Parquet file")
+    run.add_argument("--offline", action="store_true", help="Use the fake model and transcript backend")
+    run.add_argument("--bulk", action="store_true",
+                     help="Submit all questions as one batch prediction job instead of interactive calls")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.offline:
+        from .fake_backend import FakeGenerativeModel, fake_transcript_fetcher
+        youtube_handler = YouTubeHandler(fetcher=fake_transcript_fetcher)
+        # The fake model has no quota to protect
+        batch_processor = BatchProcessor(
+            model=FakeGenerativeModel(),
+            scheduler=RequestScheduler(requests_per_minute=0, tokens_per_minute=0),
+            priority=PRIORITY_BULK,
+            transcript_lookup=youtube_handler.find_transcript
+        )
+    else:
+        youtube_handler = YouTubeHandler()
+        batch_processor = BatchProcessor(priority=PRIORITY_BULK, transcript_lookup=youtube_handler.find_transcript)
+
+    runner = JobRunner(
+        batch_processor,
+        youtube_handler,
+        args.output,
+        default_questions=load_questions(args.questions) if args.questions else None,
+        strategy=args.strategy,
+        video_workers=args.workers
+    )
+    finished = runner.load_checkpoint()
+    if finished:
+        logger.info(f"Resuming: {finished} (video, question) pairs already answered")
+
+    if args.bulk:
+        # The local stand-in finishes in moments, so there is no point polling slowly
+        bulk_processor = (
+            BulkProcessor(client=LocalBatchClient(), poll_interval=0.1) if args.offline else BulkProcessor()
+        )
+        stats = runner.run_bulk(iter_records(args.jobs), bulk_processor)
+    else:
+        stats = runner.run(iter_records(args.jobs))
+    print(stats.summary(), file=sys.stderr)
+
+    if args.parquet:
+        write_parquet(args.output, args.parquet)
+    return 0 if stats.failed == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
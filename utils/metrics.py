@@ -0,0 +1,264 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import settings
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Seconds; covers cache hits through long-context model calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value for exactly these labels."""
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def total(self, **labels) -> float:
+        """Sum over all label sets matching the given labels."""
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(value for key, value in self._values.items() if wanted <= set(key))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+class _Timer:
+    """Context manager observing elapsed seconds into a histogram."""
+
+    __slots__ = ("histogram", "labels", "started_at")
+
+    def __init__(self, histogram: "Histogram", labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started_at, **self.labels)
+        return False
+
+class Histogram:
+    """Bucketed histogram with optional labels."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One extra slot for the +Inf bucket
+                series = self._series[key] = _HistogramSeries(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def time(self, **labels) -> _Timer:
+        """Time a block: ``with histogram.time(stage="fetch"): ...``"""
+        return _Timer(self, labels)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """
+        Estimate a quantile over all series matching the labels, interpolating within buckets.
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            Optional[float]: Estimated value, or None if nothing was observed
+        """
+        wanted = set(_label_key(labels))
+        counts = [0] * (len(self.buckets) + 1)
+        with self._lock:
+            for key, series in self._series.items():
+                if wanted <= set(key):
+                    for i, count in enumerate(series.counts):
+                        counts[i] += count
+        total = sum(counts)
+        if total == 0:
+            return None
+
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series.sum}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series.count}")
+        return lines
+
+class _NoOpTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_TIMER = _NoOpTimer()
+
+class _NoOpMetric:
+    """Stands in for any metric when instrumentation is disabled."""
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        pass
+
+    def observe(self, value: float, **labels) -> None:
+        pass
+
+    def time(self, **labels) -> _NoOpTimer:
+        return _NOOP_TIMER
+
+    def value(self, **labels) -> float:
+        return 0
+
+    def total(self, **labels) -> float:
+        return 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        return None
+
+    def render(self) -> List[str]:
+        return []
+
+class MetricsRegistry:
+    """Creates metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str):
+        if not self.enabled:
+            return _NoOpMetric()
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        if not self.enabled:
+            return _NoOpMetric()
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+MODEL_CALL_SECONDS = registry.histogram(
+    "model_call_seconds", "Latency of generate_content calls, by outcome"
+)
+MODEL_TOKENS = registry.counter(
+    "model_tokens_total", "Tokens reported by usage_metadata, by kind (prompt/response)"
+)
+QUESTION_SECONDS = registry.histogram(
+    "question_seconds", "Time to answer a question that missed the cache, by strategy"
+)
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "Cache lookups, by tier and result (hit/miss)"
+)
+CACHE_EVICTIONS = registry.counter(
+    "cache_evictions_total", "Entries evicted to stay within a cache budget, by tier"
+)
+TRANSCRIPT_FETCH_SECONDS = registry.histogram(
+    "transcript_fetch_seconds", "Latency of transcript API fetches"
+)
+TRANSCRIPT_COMPACTION_BYTES = registry.counter(
+    "transcript_compaction_bytes_total", "Transcript bytes before and after compaction, by stage"
+)
+PREFETCH_QUESTIONS = registry.counter(
+    "prefetch_questions_total", "Suggested questions answered speculatively, by result"
+)
+SERVICE_REQUEST_SECONDS = registry.histogram(
+    "service_request_seconds", "Time to serve an HTTP API request, by endpoint"
+)
+SERVICE_REJECTED = registry.counter(
+    "service_rejected_requests_total", "HTTP API requests turned away at the concurrency limit, by endpoint"
+)
+
+def record_usage(response) -> None:
+    """Count the prompt and response tokens reported on a model response."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    if isinstance(prompt_tokens, int):
+        MODEL_TOKENS.inc(prompt_tokens, kind="prompt")
+    if isinstance(response_tokens, int):
+        MODEL_TOKENS.inc(response_tokens, kind="response")
+
+def hit_rate(tier: str) -> Optional[float]:
+    """Fraction of lookups in a cache tier that hit, or None before any lookup."""
+    hits = CACHE_REQUESTS.value(tier=tier, result="hit")
+    misses = CACHE_REQUESTS.value(tier=tier, result="miss")
+    total = hits + misses
+    return hits / total if total else None
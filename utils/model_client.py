@@ -0,0 +1,49 @@
+from typing import Any, Dict, Optional
+from config import settings
+
+class ModelClient:
+    """
+    Interface ``BatchProcessor`` expects from a generative model.
+
+    ``genai.GenerativeModel`` satisfies it as is; ``FakeGenerativeModel`` implements
+    it offline for development and benchmarks.
+    """
+
+    def generate_content(
+        self,
+        contents: Any,
+        generation_config: Optional[Dict[str, Any]] = None,
+        request_options: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+        **kwargs
+    ):
+        """
+        Generate a response to a prompt.
+
+        Args:
+            contents (Any): Prompt text or list of parts
+            generation_config (Optional[Dict[str, Any]]): Generation settings, e.g.
+                ``response_mime_type`` and ``response_schema``
+            request_options (Optional[Dict[str, Any]]): Transport options such as ``timeout``
+            stream (bool): Return an iterator of partial responses instead of one response
+
+        Returns:
+            A response with ``text`` and ``usage_metadata``, or an iterator of them when streaming
+        """
+        raise NotImplementedError
+
+    def count_tokens(self, contents: Any):
+        """
+        Count the tokens a prompt would use.
+
+        Args:
+            contents (Any): Prompt text or list of parts
+
+        Returns:
+            A response with ``total_tokens``
+        """
+        raise NotImplementedError
+
+def default_generation_config() -> Dict[str, Any]:
+    """Generation settings applied to every model built from the configuration."""
+    return {"max_output_tokens": settings.MAX_TOKENS, "temperature": settings.TEMPERATURE}
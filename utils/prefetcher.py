@@ -0,0 +1,215 @@
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from config import settings
+from .batch_processor import BatchProcessor
+from .metrics import PREFETCH_QUESTIONS
+from .router import STRATEGY_AUTO, STRATEGY_RETRIEVAL, RouteDecision
+from .scheduler import PRIORITY_PREFETCH, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+class PrefetchBudget:
+    """
+    Estimated tokens one session may spend on answers it has not asked for yet.
+
+    Tokens are reserved when a question is queued and refunded if no model call
+    is made for it after all (cancelled, or answered from the cache by then).
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None):
+        """
+        Args:
+            max_tokens (Optional[int]): Budget, defaults to ``settings.PREFETCH_SESSION_TOKEN_BUDGET``
+        """
+        self.max_tokens = max_tokens if max_tokens is not None else settings.PREFETCH_SESSION_TOKEN_BUDGET
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.max_tokens - self.spent)
+
+    def try_spend(self, tokens: int) -> bool:
+        """Reserve tokens if the budget allows it."""
+        with self._lock:
+            if self.spent + tokens > self.max_tokens:
+                return False
+            self.spent += tokens
+            return True
+
+    def refund(self, tokens: int) -> None:
+        """Return tokens reserved for a call that was not made."""
+        with self._lock:
+            self.spent = max(0, self.spent - tokens)
+
+class PrefetchJob:
+    """Speculative answers for one video's suggested questions; cancel it when the user moves on."""
+
+    def __init__(self, video_id: Optional[str], budget: Optional[PrefetchBudget] = None):
+        self.video_id = video_id
+        self.budget = budget
+        self.skipped: List[str] = []  # Questions left out to stay within the budget
+        self._futures: Dict[str, Future] = {}
+        self._costs: Dict[str, int] = {}  # Tokens reserved per question
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def questions(self) -> List[str]:
+        """Questions being answered in the background."""
+        return list(self._futures)
+
+    def cancel(self) -> None:
+        """Drop the questions not started yet; answers already in flight still reach the cache."""
+        self._cancelled.set()
+        dropped = [question for question, future in self._futures.items() if future.cancel()]
+        for question in dropped:
+            self.refund(question)
+        if dropped:
+            PREFETCH_QUESTIONS.inc(len(dropped), result="cancelled")
+
+    def refund(self, question: str) -> None:
+        """Return a question's reserved tokens to the budget; only the first refund counts."""
+        cost = self._costs.pop(question, 0)
+        if cost and self.budget is not None:
+            self.budget.refund(cost)
+
+    def done(self) -> bool:
+        return all(future.done() for future in self._futures.values())
+
+    def wait(self, question: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a question's speculative answer, so asking it does not start a second call.
+
+        Args:
+            question (str): Question the user asked
+            timeout (Optional[float]): Seconds to wait at most
+
+        Returns:
+            bool: Whether the answer is now in the response cache
+        """
+        future = self._futures.get(question)
+        if future is None or future.cancelled():
+            return False
+        try:
+            answered = future.result(timeout=timeout) is not None
+        except Exception:
+            return False
+        if answered:
+            PREFETCH_QUESTIONS.inc(result="claimed")
+        return answered
+
+class AnswerPrefetcher:
+    """
+    Answers suggested questions in the background, before anyone asks them.
+
+    Answers go into the response cache, so asking a prefetched question is a
+    cache hit. Calls are made at ``PRIORITY_PREFETCH``, behind interactive
+    questions, on a small worker pool shared by every session. Each session's
+    spending is capped by its ``PrefetchBudget``.
+    """
+
+    def __init__(self, batch_processor: Optional[BatchProcessor] = None, max_workers: Optional[int] = None):
+        """
+        Args:
+            batch_processor (Optional[BatchProcessor]): Answers the questions; should use
+                ``PRIORITY_PREFETCH``. Defaults to a new processor at that priority.
+            max_workers (Optional[int]): Questions answered at once, defaults to
+                ``settings.PREFETCH_WORKERS``
+        """
+        self.batch_processor = batch_processor or BatchProcessor(priority=PRIORITY_PREFETCH)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers or settings.PREFETCH_WORKERS), thread_name_prefix="prefetch"
+        )
+
+    def estimate_cost(self, question: str, decision: RouteDecision) -> int:
+        """
+        Tokens answering a question is expected to use.
+
+        Args:
+            question (str): Question to answer
+            decision (RouteDecision): Routing decision for the video's questions
+
+        Returns:
+            int: Estimated prompt tokens plus the most the answer can use
+        """
+        if decision.cached_context:
+            context_tokens = 0
+        elif decision.strategy == STRATEGY_RETRIEVAL:
+            context_tokens = settings.RETRIEVAL_TOP_K * settings.RETRIEVAL_CHUNK_SIZE // 4
+        else:
+            context_tokens = decision.context_tokens
+        return context_tokens + estimate_tokens(question) + settings.MAX_TOKENS
+
+    def prefetch(
+        self,
+        questions: List[str],
+        context: str,
+        video_id: Optional[str],
+        budget: PrefetchBudget
+    ) -> PrefetchJob:
+        """
+        Start answering questions in the background, in order, while the budget lasts.
+
+        Args:
+            questions (List[str]): Suggested questions, most likely to be asked first
+            context (str): Context text to answer from
+            video_id (Optional[str]): ID of the video the context belongs to
+            budget (PrefetchBudget): The session's remaining budget
+
+        Returns:
+            PrefetchJob: Handle to wait on or cancel
+        """
+        job = PrefetchJob(video_id, budget)
+        context_cache = self.batch_processor.context_cache
+        pending = [
+            question for question in dict.fromkeys(questions)
+            if context_cache.get_response(question, context, video_id) is None
+        ]
+        if not pending:
+            return job
+
+        decision, _ = self.batch_processor.route(pending, context, video_id)
+        for i, question in enumerate(pending):
+            cost = self.estimate_cost(question, decision)
+            if not budget.try_spend(cost):
+                job.skipped = pending[i:]
+                PREFETCH_QUESTIONS.inc(len(job.skipped), result="over_budget")
+                logger.info(
+                    f"Prefetch budget reached for video {video_id or '-'}: "
+                    f"skipping {len(job.skipped)} of {len(pending)} questions"
+                )
+                break
+            job._costs[question] = cost
+            job._futures[question] = self._executor.submit(self._answer, job, question, context, video_id)
+        return job
+
+    def _answer(self, job: PrefetchJob, question: str, context: str, video_id: Optional[str]) -> Optional[str]:
+        if job.cancelled:
+            job.refund(question)
+            PREFETCH_QUESTIONS.inc(result="cancelled")
+            return None
+        # Asked interactively, or answered by another session, while this one waited
+        cached_response = self.batch_processor.context_cache.get_response(question, context, video_id)
+        if cached_response is not None:
+            job.refund(question)
+            PREFETCH_QUESTIONS.inc(result="cached")
+            return cached_response
+        try:
+            answer = self.batch_processor.process_questions(
+                [question], context, video_id=video_id, strategy=STRATEGY_AUTO
+            )[question]
+        except Exception as e:
+            logger.warning(f"Error prefetching answer for question '{question}': {str(e)}")
+            PREFETCH_QUESTIONS.inc(result="failed")
+            return None
+        PREFETCH_QUESTIONS.inc(result="answered")
+        return answer
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,180 @@
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from typing import TYPE_CHECKING, Deque, List, Optional, Tuple
+from config import settings
+from .metrics import QUESTION_SECONDS
+from .router import STRATEGY_INDIVIDUAL, STRATEGY_RETRIEVAL, TIER_DEFAULT
+from .scheduler import estimate_tokens
+
+if TYPE_CHECKING:
+    from .batch_processor import BatchProcessor
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_SESSION = "session"
+
+class QASession:
+    """
+    A multi-turn conversation about one transcript, created by ``BatchProcessor.start_session``.
+
+    The transcript is uploaded once as a server-side cached context when it is
+    long enough to cache, so later turns send no context at all. Shorter
+    transcripts would otherwise be resent in full every turn, so each turn sends
+    only the excerpts retrieved for its question (and the previous one, which
+    follow-ups often lean on). Transcripts no longer than those excerpts are
+    sent inline.
+
+    Each turn sends a bounded history: a running summary of older turns, then
+    the most recent turns verbatim, then the new question. When the verbatim
+    turns exceed ``history_tokens``, the oldest are folded into the summary by
+    the fast model. If summarizing fails they are simply dropped. Either way the
+    per-turn payload stays flat however long the conversation runs. Every turn
+    is also recorded in the response cache's conversation history.
+    """
+
+    def __init__(
+        self,
+        batch_processor: "BatchProcessor",
+        context: str,
+        video_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        history_tokens: Optional[int] = None,
+        summary_tokens: Optional[int] = None
+    ):
+        """
+        Args:
+            batch_processor (BatchProcessor): Processor whose models, cache and scheduler are used
+            context (str): Transcript the conversation is about
+            video_id (Optional[str]): ID of the video the transcript belongs to
+            session_id (Optional[str]): Conversation ID in the response cache; random by default
+            history_tokens (Optional[int]): Verbatim history sent with each turn, in tokens
+            summary_tokens (Optional[int]): Longest summary of older turns, in tokens
+        """
+        self.batch_processor = batch_processor
+        self.context = context
+        self.video_id = video_id
+        self.session_id = session_id or uuid.uuid4().hex
+        self.history_tokens = history_tokens or settings.SESSION_HISTORY_TOKENS
+        self.summary_tokens = summary_tokens or settings.SESSION_SUMMARY_TOKENS
+
+        self.summary = ""
+        self.last_prompt_tokens = 0  # Estimated size of the last turn's prompt, without any cached context
+        self._turns: Deque[Tuple[str, str]] = deque()
+        self._turn_tokens = 0
+        self._strategy: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def turns(self) -> List[Tuple[str, str]]:
+        """(question, answer) pairs still sent verbatim, oldest first."""
+        with self._lock:
+            return list(self._turns)
+
+    def history(self) -> List[dict]:
+        """Every message of the conversation, as recorded in the response cache."""
+        return self.batch_processor.context_cache.get_conversation_history(self.session_id)
+
+    def ask(self, question: str) -> str:
+        """
+        Answer the next question in the conversation.
+
+        Args:
+            question (str): The follow-up question
+
+        Returns:
+            str: The answer
+        """
+        processor = self.batch_processor
+        with self._lock:
+            started_at = time.perf_counter()
+            if self._strategy is None:
+                # Chosen once: the transcript's size and cache status do not change between turns
+                self._strategy = self._choose_strategy()
+
+            prompt = self._prompt(question)
+            try:
+                if self._strategy == STRATEGY_RETRIEVAL:
+                    query = f"{self._turns[-1][0]} {question}" if self._turns else question
+                    excerpts = processor.retrieve(query, self.context, self.video_id)
+                    self.last_prompt_tokens = estimate_tokens(excerpts) + estimate_tokens(prompt)
+                    response = processor.generate(prompt, excerpts, tier=TIER_DEFAULT)
+                else:
+                    self.last_prompt_tokens = estimate_tokens(prompt)
+                    if not processor.can_cache_context(self.context, self.video_id):
+                        self.last_prompt_tokens += estimate_tokens(self.context)
+                    response = processor.generate(prompt, self.context, self.video_id, tier=TIER_DEFAULT)
+                answer = response.text if response and response.text else "Failed to generate response."
+            except Exception as e:
+                logger.error(f"Error answering question '{question}' in session {self.session_id}: {str(e)}")
+                return f"Error: {str(e)}"
+
+            self._turns.append((question, answer))
+            self._turn_tokens += estimate_tokens(question) + estimate_tokens(answer)
+            processor.context_cache.add_to_conversation(self.session_id, "user", question)
+            processor.context_cache.add_to_conversation(self.session_id, "assistant", answer)
+            if self._turn_tokens > self.history_tokens:
+                self._compact_history()
+            QUESTION_SECONDS.observe(time.perf_counter() - started_at, strategy=STRATEGY_SESSION)
+            return answer
+
+    def _choose_strategy(self) -> str:
+        """Send the whole transcript when it is cached server-side or no larger than retrieved excerpts."""
+        if self.batch_processor.can_cache_context(self.context, self.video_id):
+            return STRATEGY_INDIVIDUAL
+        if len(self.context) <= settings.RETRIEVAL_TOP_K * settings.RETRIEVAL_CHUNK_SIZE:
+            return STRATEGY_INDIVIDUAL
+        return STRATEGY_RETRIEVAL
+
+    def _prompt(self, question: str) -> str:
+        """Summary, recent turns and the new question. Must hold the lock."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation: {self.summary}")
+        if self._turns:
+            parts.append("Recent conversation:\n" + "\n".join(
+                f"User: {past_question}\nAssistant: {past_answer}" for past_question, past_answer in self._turns
+            ))
+        parts.append(f"Question: {question}\n\nAnswer:")
+        return "\n\n".join(parts)
+
+    def _compact_history(self) -> None:
+        """Fold the oldest turns into the summary until the rest fit in half the budget. Must hold the lock."""
+        folded = []
+        # Always keep the latest turn verbatim so follow-ups can refer to it
+        while len(self._turns) > 1 and self._turn_tokens > self.history_tokens // 2:
+            question, answer = self._turns.popleft()
+            self._turn_tokens -= estimate_tokens(question) + estimate_tokens(answer)
+            folded.append(f"User: {question}\nAssistant: {answer}")
+        if not folded:
+            return
+
+        words = self.summary_tokens * 3 // 4
+        prompt = (
+            f"Update the summary of a conversation about a video with the exchanges below. "
+            f"Keep names, facts and open questions the user may refer back to. "
+            f"Reply with the summary only, in under {words} words.\n\n"
+            f"Current summary: {self.summary or '(none)'}\n\n"
+            f"Exchanges:\n" + "\n".join(folded)
+        )
+        try:
+            response = self.batch_processor.call_model(
+                self.batch_processor.fast_model,
+                prompt,
+                generation_config={"max_output_tokens": self.summary_tokens}
+            )
+            if response and response.text:
+                self.summary = response.text.strip()
+        except Exception as e:
+            # The turns are dropped regardless, so the payload stays bounded
+            logger.warning(f"Error summarizing session {self.session_id}, dropping {len(folded)} turns: {str(e)}")
+
+    def close(self) -> None:
+        """Forget the conversation, including its recorded history."""
+        with self._lock:
+            self._turns.clear()
+            self._turn_tokens = 0
+            self.summary = ""
+        self.batch_processor.context_cache.clear_conversation(self.session_id)
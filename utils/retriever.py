@@ -0,0 +1,72 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class BM25Index:
+    """In-memory BM25 index over a list of text chunks."""
+
+    def __init__(
+        self, chunks: List[str], k1: float = 1.5, b: float = 0.75, labels: Optional[List[Optional[str]]] = None
+    ):
+        """
+        Args:
+            chunks (List[str]): Chunks to index
+            k1 (float): Term frequency saturation parameter
+            b (float): Length normalization parameter
+            labels (Optional[List[Optional[str]]]): Label per chunk, e.g. the time range it
+                covers; shown with the chunk but not indexed
+        """
+        self.chunks = chunks
+        self.labels = labels
+        self.k1 = k1
+        self.b = b
+
+        # term -> [(chunk index, term frequency)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        for i, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self.lengths.append(sum(counts.values()))
+            for term, freq in counts.items():
+                self.postings.setdefault(term, []).append((i, freq))
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        n = len(chunks)
+        self.idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, k: int) -> List[int]:
+        """
+        Find the chunks most relevant to a query.
+
+        Args:
+            query (str): Query text
+            k (int): Number of chunks to return
+
+        Returns:
+            List[int]: Indices of the top-k chunks, best first. Falls back to the
+            leading chunks when no query term occurs in the index.
+        """
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for i, freq in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+
+        if not scores:
+            return list(range(min(k, len(self.chunks))))
+        return heapq.nlargest(k, scores, key=lambda i: (scores[i], -i))
@@ -0,0 +1,118 @@
+import re
+import logging
+from typing import List, NamedTuple, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_INDIVIDUAL = "individual"
+STRATEGY_PACKED = "packed"
+STRATEGY_RETRIEVAL = "retrieval"
+STRATEGY_MAP_REDUCE = "map_reduce"
+STRATEGY_AUTO = "auto"
+
+TIER_DEFAULT = "default"
+TIER_FAST = "fast"
+
+# Questions asking for reasoning rather than lookup stay on the default model
+_COMPLEX_QUESTION_PATTERN = re.compile(
+    r"\b(why|how does|how do|how did|explain|compare|contrast|analy[sz]e|evaluate|summar\w*|"
+    r"implications?|argue|critique|relationship|difference)\b",
+    re.IGNORECASE
+)
+
+class RouteDecision(NamedTuple):
+    """How a batch of questions about one context will be answered."""
+    strategy: str
+    context_tokens: int
+    cached_context: bool  # Whether the context is served from a server-side cache
+    reason: str
+
+class RoutingPolicy:
+    """Interface for choosing the strategy and model tier for questions."""
+
+    def choose(self, questions: List[str], context_tokens: int, cached_context: bool) -> RouteDecision:
+        """
+        Pick the strategy for a batch of uncached questions.
+
+        Args:
+            questions (List[str]): Questions still to answer
+            context_tokens (int): Size of the context in tokens
+            cached_context (bool): Whether the context can be served from a server-side cache
+
+        Returns:
+            RouteDecision: The chosen strategy and why
+        """
+        raise NotImplementedError
+
+    def question_tier(self, question: str, decision: RouteDecision) -> str:
+        """
+        Pick the model tier for one question.
+
+        Args:
+            question (str): Question to answer
+            decision (RouteDecision): Decision for the batch the question belongs to
+
+        Returns:
+            str: ``TIER_DEFAULT`` or ``TIER_FAST``
+        """
+        return TIER_DEFAULT
+
+    def record(self, decision: RouteDecision, video_id: Optional[str], tiers: List[str]) -> None:
+        """Report a decision; override to send decisions somewhere other than the log."""
+        fast = tiers.count(TIER_FAST)
+        logger.info(
+            f"Routing {len(tiers)} questions for video {video_id or '-'} to {decision.strategy} "
+            f"({decision.context_tokens} context tokens, {fast} on the fast tier): {decision.reason}"
+        )
+
+class TokenBudgetPolicy(RoutingPolicy):
+    """
+    Picks the cheapest strategy that fits the context's token size.
+
+    - Short contexts: one full-context call, packing several questions together
+    - Contexts served from a server-side cache: one call per question, sending only the question
+    - Large uncached contexts, and anything beyond the model window: retrieval over chunks
+
+    Short factual questions go to the fast tier unless the context is served from
+    the cache, which is bound to the default model.
+    """
+
+    def __init__(
+        self,
+        short_context_tokens: Optional[int] = None,
+        retrieval_tokens: Optional[int] = None,
+        max_context_tokens: Optional[int] = None,
+        simple_question_words: Optional[int] = None
+    ):
+        """
+        Args:
+            short_context_tokens (Optional[int]): Largest context answered with packed calls
+            retrieval_tokens (Optional[int]): Uncached contexts above this use retrieval
+            max_context_tokens (Optional[int]): Model input window
+            simple_question_words (Optional[int]): Longest question considered simple
+        """
+        self.short_context_tokens = short_context_tokens or settings.ROUTER_SHORT_CONTEXT_TOKENS
+        self.retrieval_tokens = retrieval_tokens or settings.ROUTER_RETRIEVAL_TOKENS
+        self.max_context_tokens = max_context_tokens or settings.ROUTER_MAX_CONTEXT_TOKENS
+        self.simple_question_words = simple_question_words or settings.ROUTER_SIMPLE_QUESTION_WORDS
+
+    def choose(self, questions: List[str], context_tokens: int, cached_context: bool) -> RouteDecision:
+        if context_tokens > self.max_context_tokens:
+            return RouteDecision(STRATEGY_RETRIEVAL, context_tokens, False, "context exceeds the model window")
+        if context_tokens <= self.short_context_tokens:
+            if len(questions) > 1:
+                return RouteDecision(STRATEGY_PACKED, context_tokens, cached_context, "short context, packed")
+            return RouteDecision(STRATEGY_INDIVIDUAL, context_tokens, cached_context, "short context")
+        if cached_context:
+            return RouteDecision(STRATEGY_INDIVIDUAL, context_tokens, True, "context reused from server-side cache")
+        if context_tokens > self.retrieval_tokens:
+            return RouteDecision(STRATEGY_RETRIEVAL, context_tokens, False, "large uncached context")
+        return RouteDecision(STRATEGY_INDIVIDUAL, context_tokens, False, "context fits in one call")
+
+    def question_tier(self, question: str, decision: RouteDecision) -> str:
+        if decision.cached_context:
+            return TIER_DEFAULT
+        if len(question.split()) > self.simple_question_words or _COMPLEX_QUESTION_PATTERN.search(question):
+            return TIER_DEFAULT
+        return TIER_FAST
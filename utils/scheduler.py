@@ -0,0 +1,357 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+import logging
+from typing import Any, Callable, Iterable, Iterator, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lower values are admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 5  # Speculative answers nobody has asked for yet
+PRIORITY_BULK = 10
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "GatewayTimeout", "Aborted"
+}
+RATE_LIMIT_ERROR_NAMES = {"ResourceExhausted", "TooManyRequests"}
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is transient (rate limit, timeout or server error)."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an error is a quota / 429 response."""
+    return getattr(error, "code", None) == 429 or type(error).__name__ in RATE_LIMIT_ERROR_NAMES
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the circuit breaker is rejecting calls."""
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at ``rate`` units per minute.
+
+    The bucket may go into debt when actual usage exceeds the estimate that was
+    acquired, which delays later requests accordingly.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.max_rate = float(rate_per_minute)
+        self.rate = float(rate_per_minute)
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` units are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= amount
+
+    def slow_down(self, factor: float = 0.5, floor: float = 0.1) -> None:
+        """Multiplicatively lower the refill rate after a rate-limit response."""
+        self.rate = max(self.max_rate * floor, self.rate * factor)
+
+    def speed_up(self, step: float = 0.05) -> None:
+        """Additively restore the refill rate after a success."""
+        self.rate = min(self.max_rate, self.rate + self.max_rate * step)
+
+class CircuitBreaker:
+    """
+    Stops sending requests after repeated failures, then lets a single trial
+    request through once ``reset_timeout`` has passed.
+
+    Rate-limit responses are not failures: the service is up, just busy, so
+    they neither count toward ``failure_threshold`` nor close the breaker.
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold or settings.CIRCUIT_BREAKER_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else settings.CIRCUIT_BREAKER_RESET
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._condition = threading.Condition()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now, without waiting."""
+        return self.wait(0)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait until a request may be sent: the breaker is closed, or it is
+        half-open and no other trial is in flight.
+
+        Args:
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            bool: Whether the request may be sent
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self.opened_at is None:
+                    return True
+                now = time.monotonic()
+                half_open_in = self.opened_at + self.reset_timeout - now
+                if half_open_in <= 0 and not self._trial_in_flight:
+                    # Half-open: let one request probe the service
+                    self._trial_in_flight = True
+                    return True
+                remaining = deadline - now
+                if remaining <= 0:
+                    return False
+                # Woken early when the trial ends
+                self._condition.wait(min(remaining, half_open_in) if half_open_in > 0 else remaining)
+
+    def record_success(self) -> None:
+        with self._condition:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+            self._condition.notify_all()
+
+    def record_failure(self) -> None:
+        with self._condition:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit breaker opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self._condition.notify_all()
+
+    def record_rate_limited(self) -> None:
+        """Neither a success nor a failure; frees the trial slot so another request can probe."""
+        with self._condition:
+            self._trial_in_flight = False
+            self._condition.notify_all()
+
+class RequestScheduler:
+    """
+    Shared gate in front of every model call.
+
+    Admits requests under requests-per-minute and tokens-per-minute budgets,
+    highest priority first, retries transient failures with exponential backoff
+    and full jitter, halves the request rate on rate-limit responses (restoring
+    it gradually on success), and trips a circuit breaker on repeated failures
+    other than rate limits. While the breaker is open, calls wait for its
+    half-open trial for up to ``breaker_wait`` seconds before giving up.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        breaker_wait: Optional[float] = None
+    ):
+        """
+        Args:
+            requests_per_minute (Optional[int]): Request budget, 0 for unlimited
+            tokens_per_minute (Optional[int]): Token budget, 0 for unlimited
+            max_retries (Optional[int]): Retries after the first attempt
+            base_delay (Optional[float]): Backoff before the first retry, in seconds
+            max_delay (Optional[float]): Upper bound on the backoff, in seconds
+            breaker (Optional[CircuitBreaker]): Circuit breaker to use
+            breaker_wait (Optional[float]): Seconds a call waits while the breaker is open,
+                defaults to twice its reset timeout (enough for the next trial to finish)
+        """
+        rpm = requests_per_minute if requests_per_minute is not None else settings.RATE_LIMIT_RPM
+        tpm = tokens_per_minute if tokens_per_minute is not None else settings.RATE_LIMIT_TPM
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries if max_retries is not None else settings.MAX_RETRIES
+        self.base_delay = base_delay if base_delay is not None else settings.RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else settings.RETRY_MAX_DELAY
+        self.breaker = breaker or CircuitBreaker()
+        self.breaker_wait = breaker_wait if breaker_wait is not None else 2 * self.breaker.reset_timeout
+
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def call(
+        self,
+        fn: Callable[[], Any],
+        priority: int = PRIORITY_INTERACTIVE,
+        estimated_tokens: int = 0
+    ) -> Any:
+        """
+        Run a model call under the scheduler's limits, retrying transient failures.
+
+        Args:
+            fn (Callable[[], Any]): The call to make
+            priority (int): Admission priority, lower goes first
+            estimated_tokens (int): Tokens the call is expected to use
+
+        Returns:
+            Any: Whatever ``fn`` returns
+        """
+        attempt = 0
+        while True:
+            self._admit(priority, estimated_tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                if not self._record_error(e) or attempt >= self.max_retries:
+                    raise
+                self._back_off(attempt, e)
+                attempt += 1
+                continue
+
+            self.breaker.record_success()
+            self._settle(result, estimated_tokens)
+            return result
+
+    def stream(
+        self,
+        fn: Callable[[], Iterable[Any]],
+        priority: int = PRIORITY_INTERACTIVE,
+        estimated_tokens: int = 0
+    ) -> Iterator[Any]:
+        """
+        Run a streaming model call under the scheduler's limits.
+
+        Errors raised while iterating the stream count like those of ``call``:
+        they feed the circuit breaker and rate control, and are retried while
+        no chunk has been yielded yet. Once chunks have been passed on the error
+        is raised instead, since a retry would repeat them. Usage is settled
+        from the last chunk.
+
+        Args:
+            fn (Callable[[], Iterable[Any]]): Starts the call and returns its chunks
+            priority (int): Admission priority, lower goes first
+            estimated_tokens (int): Tokens the call is expected to use
+
+        Returns:
+            Iterator[Any]: The stream's chunks
+        """
+        attempt = 0
+        while True:
+            self._admit(priority, estimated_tokens)
+            last_chunk = None
+            try:
+                for chunk in fn():
+                    last_chunk = chunk
+                    yield chunk
+            except GeneratorExit:
+                # The consumer stopped reading: no verdict on the service, but free a trial slot
+                self.breaker.record_rate_limited()
+                raise
+            except Exception as e:
+                if not self._record_error(e) or last_chunk is not None or attempt >= self.max_retries:
+                    raise
+                self._back_off(attempt, e)
+                attempt += 1
+                continue
+
+            self.breaker.record_success()
+            self._settle(last_chunk, estimated_tokens)
+            return
+
+    def _admit(self, priority: int, tokens: int) -> None:
+        """Wait for the circuit breaker, then for the rate budgets."""
+        if not self.breaker.wait(self.breaker_wait):
+            raise CircuitOpenError("Model calls are temporarily suspended after repeated failures")
+        self._acquire(priority, tokens)
+
+    def _record_error(self, error: Exception) -> bool:
+        """Report a failed attempt to the breaker and rate control; returns whether it may be retried."""
+        if not is_retryable(error):
+            # The service answered; the request itself was bad
+            self.breaker.record_success()
+            return False
+        if is_rate_limited(error):
+            # Busy, not down: back off and send less, but keep the breaker closed
+            self.breaker.record_rate_limited()
+            self._slow_down()
+        else:
+            self.breaker.record_failure()
+        return True
+
+    def _back_off(self, attempt: int, error: Exception) -> None:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        logger.warning(
+            f"Retrying model call in {delay:.2f}s after error "
+            f"(attempt {attempt + 1}/{self.max_retries}): {str(error)}"
+        )
+        time.sleep(delay)
+
+    def _acquire(self, priority: int, tokens: int) -> None:
+        """Block until this request is first in line and both budgets allow it."""
+        if self.request_bucket is None and self.token_bucket is None:
+            return
+
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] != ticket:
+                        self._condition.wait()
+                        continue
+                    now = time.monotonic()
+                    wait = 0.0
+                    if self.request_bucket is not None:
+                        wait = max(wait, self.request_bucket.wait_time(1, now))
+                    if self.token_bucket is not None:
+                        wait = max(wait, self.token_bucket.wait_time(tokens, now))
+                    if wait <= 0:
+                        if self.request_bucket is not None:
+                            self.request_bucket.consume(1)
+                        if self.token_bucket is not None:
+                            self.token_bucket.consume(tokens)
+                        return
+                    self._condition.wait(timeout=wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def _slow_down(self) -> None:
+        with self._condition:
+            if self.request_bucket is not None:
+                self.request_bucket.slow_down()
+                logger.info(f"Rate limited; request rate lowered to {self.request_bucket.rate:.1f}/min")
+
+    def _settle(self, result: Any, estimated_tokens: int) -> None:
+        """Restore the request rate and charge the token budget for the actual input tokens."""
+        usage = getattr(result, "usage_metadata", None)
+        # The budget (RATE_LIMIT_TPM) and the estimate are input tokens; output is not counted
+        actual = getattr(usage, "prompt_token_count", None)
+        with self._condition:
+            if self.request_bucket is not None:
+                self.request_bucket.speed_up()
+            if self.token_bucket is not None and isinstance(actual, int):
+                self.token_bucket.consume(actual - estimated_tokens)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about four characters per token)."""
+    return len(text) // 4 + 1
+
+# Shared by every BatchProcessor in the process
+request_scheduler = RequestScheduler()
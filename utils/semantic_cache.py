@@ -0,0 +1,281 @@
+import re
+import threading
+import zlib
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+from cachetools import LRUCache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Words that carry little of a question's meaning; they weigh less in the hashed embedding
+_FILLER_WORDS = frozenset("""
+    a an the this that these those it its is are was were be been being am
+    do does did s of in on at for by about as and or please tell explain describe
+    video clip talk transcript speaker
+""".split())
+# Words a reworded question must keep, in order, for a cached answer to be reused:
+# embeddings score "he" vs "she" or "from A to B" vs "to A from B" as near-identical
+_GUARDED_WORDS = frozenset("""
+    not no never none nothing nobody neither nor without
+    i me my mine we us our ours you your yours he him his she her hers they them their theirs
+    can could should would will shall may might must
+    what why when where who whom whose which how
+    from to before after above below over under into out up down
+    more less most least first last earlier later
+""".split())
+_NEGATED_CONTRACTIONS = [
+    (re.compile(r"\bcan(?:no|')t\b", re.IGNORECASE), "can not"),
+    (re.compile(r"\bwon't\b", re.IGNORECASE), "will not"),
+    (re.compile(r"\bshan't\b", re.IGNORECASE), "shall not"),
+    (re.compile(r"n't\b", re.IGNORECASE), " not")
+]
+# "... from the video" and the like only restate the context every question is about
+_CONTEXT_REFERENCE = re.compile(r"\b(?:of|from|in|about) (?:the|this) (?:video|clip|talk|transcript)\b", re.IGNORECASE)
+
+def _words(text: str) -> List[str]:
+    """Words of a question with contractions expanded and context references dropped, case preserved."""
+    text = text.replace("\u2019", "'")
+    for pattern, replacement in _NEGATED_CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    return re.findall(r"\w+", _CONTEXT_REFERENCE.sub(" ", text))
+
+def guarded_terms(text: str) -> Tuple[str, ...]:
+    """
+    Words of a question whose change flips what is asked even when the
+    embeddings barely move: negations, pronouns, modal verbs, question
+    words, direction and order words, numbers and names (capitalized words
+    after the first), in order.
+
+    Args:
+        text (str): Question text
+
+    Returns:
+        Tuple[str, ...]: Casefolded guarded words
+    """
+    terms = []
+    for i, word in enumerate(_words(text)):
+        folded = word.casefold()
+        if folded in _GUARDED_WORDS or any(c.isdigit() for c in word) or (i > 0 and word[0].isupper()):
+            terms.append(folded)
+    return tuple(terms)
+
+class QuestionEncoder:
+    """Interface for turning questions into unit-length embedding vectors."""
+
+    dim: int
+
+    def encode(self, text: str) -> np.ndarray:
+        """
+        Embed a piece of text.
+
+        Args:
+            text (str): Text to embed
+
+        Returns:
+            np.ndarray: Unit-length float32 vector of size ``dim``
+        """
+        raise NotImplementedError
+
+class HashingEncoder(QuestionEncoder):
+    """
+    Deterministic local encoder based on hashed word and character n-grams.
+
+    Needs no network access or model weights, so it works offline and in tests.
+    The similarity is lexical: rewordings that share their content words score
+    high, synonyms do not. Filler words are down-weighted so they do not count
+    as much as the words that matter.
+    """
+
+    def __init__(self, dim: int = 1024, ngram_size: int = 3, filler_weight: float = 0.25):
+        """
+        Args:
+            dim (int): Number of hash buckets (vector size)
+            ngram_size (int): Length of the character n-grams
+            filler_weight (float): Weight of filler words relative to other words
+        """
+        self.dim = dim
+        self.ngram_size = ngram_size
+        self.filler_weight = filler_weight
+
+    def encode(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in _words(text):
+            word = word.casefold()
+            weight = self.filler_weight if word in _FILLER_WORDS else 1.0
+            # Whole words carry more weight than their fragments
+            vector[zlib.crc32(word.encode("utf-8")) % self.dim] += 2.0 * weight
+            padded = f"<{word}>"
+            for i in range(max(1, len(padded) - self.ngram_size + 1)):
+                ngram = padded[i:i + self.ngram_size]
+                vector[zlib.crc32(ngram.encode("utf-8")) % self.dim] += weight
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+class GeminiEncoder(QuestionEncoder):
+    """Encoder backed by the Gemini embedding API."""
+
+    def __init__(self, model_name: str = "models/text-embedding-004", dim: int = 768):
+        """
+        Args:
+            model_name (str): Embedding model to use
+            dim (int): Size of the vectors the model returns
+        """
+        import google.generativeai as genai
+        self._genai = genai
+        self.model_name = model_name
+        self.dim = dim
+
+    def encode(self, text: str) -> np.ndarray:
+        result = self._genai.embed_content(
+            model=self.model_name, content=text, task_type="semantic_similarity"
+        )
+        vector = np.asarray(result["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+class _ContextIndex:
+    """Question embeddings, guarded terms and answers for one context; embeddings form a contiguous matrix."""
+
+    def __init__(self, dim: int, capacity: int, max_entries: int):
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.terms: List[Tuple[str, ...]] = []
+        self.answers: List[str] = []
+        self.max_entries = max_entries
+        self.size = 0
+        self._next = 0  # Slot to overwrite once the index is full
+
+    def add(self, vector: np.ndarray, terms: Tuple[str, ...], answer: str) -> None:
+        if self.size < self.max_entries:
+            if self.size == len(self.matrix):
+                grown = np.empty((min(2 * self.size, self.max_entries), self.matrix.shape[1]), dtype=np.float32)
+                grown[:self.size] = self.matrix[:self.size]
+                self.matrix = grown
+            self.matrix[self.size] = vector
+            self.terms.append(terms)
+            self.answers.append(answer)
+            self.size += 1
+            return
+
+        # Full: overwrite the oldest entry
+        self.matrix[self._next] = vector
+        self.terms[self._next] = terms
+        self.answers[self._next] = answer
+        self._next = (self._next + 1) % self.max_entries
+
+    def search(self, vector: np.ndarray) -> Tuple[float, Tuple[str, ...], str]:
+        """Score, guarded terms and answer of the most similar entry."""
+        scores = self.matrix[:self.size] @ vector
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.terms[best], self.answers[best]
+
+class SemanticCache:
+    """
+    Answer cache that matches near-duplicate questions by embedding similarity.
+
+    Embeddings are kept per context digest, so answers are only reused for the
+    same transcript. The most similar cached question must clear the
+    threshold, and must also have the same ``guarded_terms``: embeddings barely
+    move when only a negation, pronoun, name, number or direction word changes
+    ("he" vs "she", "from London to Paris" vs "to London from Paris"), yet
+    those change the answer.
+    """
+
+    def __init__(
+        self,
+        encoder: Optional[QuestionEncoder] = None,
+        threshold: Optional[float] = None,
+        max_contexts: int = 64,
+        max_entries_per_context: int = 1024
+    ):
+        """
+        Args:
+            encoder (Optional[QuestionEncoder]): Question encoder; defaults to the one
+                selected by ``settings.SEMANTIC_CACHE_ENCODER``
+            threshold (Optional[float]): Minimum cosine similarity for a hit
+            max_contexts (int): Number of contexts to keep indexes for
+            max_entries_per_context (int): Questions kept per context before the oldest are replaced
+        """
+        self.encoder = encoder or create_encoder()
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries_per_context = max_entries_per_context
+        self._indexes = LRUCache(maxsize=max_contexts)
+        # The same question is usually looked up and then cached; encode it once
+        self._vectors = LRUCache(maxsize=256)
+        self._lock = threading.Lock()
+
+    def _encode(self, question: str) -> np.ndarray:
+        with self._lock:
+            vector = self._vectors.get(question)
+        if vector is None:
+            vector = self.encoder.encode(question)
+            with self._lock:
+                self._vectors[question] = vector
+        return vector
+
+    def lookup(self, context_digest: str, question: str) -> Optional[str]:
+        """
+        Find the answer to the most similar cached question for a context.
+
+        Args:
+            context_digest (str): Digest of the context the question is about
+            question (str): The question being asked
+
+        Returns:
+            Optional[str]: Cached answer if a question is similar enough, None otherwise
+        """
+        with self._lock:
+            if context_digest not in self._indexes:
+                return None
+        vector = self._encode(question)
+        with self._lock:
+            index = self._indexes.get(context_digest)
+            if index is None or index.size == 0:
+                return None
+            score, terms, answer = index.search(vector)
+        if score < self.threshold:
+            return None
+        if terms != guarded_terms(question):
+            logger.debug(f"Semantic cache near miss (similarity {score:.3f}) on guarded terms for question: {question}")
+            return None
+        logger.info(f"Semantic cache hit (similarity {score:.3f}) for question: {question}")
+        return answer
+
+    def add(self, context_digest: str, question: str, answer: str) -> None:
+        """
+        Store a question's embedding and answer for a context.
+
+        Args:
+            context_digest (str): Digest of the context the question is about
+            question (str): The question that was asked
+            answer (str): The answer to reuse for similar questions
+        """
+        vector = self._encode(question)
+        with self._lock:
+            index = self._indexes.get(context_digest)
+            if index is None:
+                index = _ContextIndex(
+                    self.encoder.dim, min(16, self.max_entries_per_context), self.max_entries_per_context
+                )
+                self._indexes[context_digest] = index
+            index.add(vector, guarded_terms(question), answer)
+
+    def clear(self) -> None:
+        """Drop all stored embeddings."""
+        with self._lock:
+            self._indexes.clear()
+            self._vectors.clear()
+
+def create_encoder() -> QuestionEncoder:
+    """Build the question encoder selected by ``settings.SEMANTIC_CACHE_ENCODER``."""
+    if settings.SEMANTIC_CACHE_ENCODER == "hashing":
+        return HashingEncoder()
+    if settings.SEMANTIC_CACHE_ENCODER == "gemini":
+        return GeminiEncoder()
+    raise ValueError(f"Unknown semantic cache encoder: {settings.SEMANTIC_CACHE_ENCODER}")
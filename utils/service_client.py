@@ -0,0 +1,130 @@
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional
+import requests
+from config import settings
+from .batch_processor import StreamEvent, STRATEGY_AUTO
+
+logger = logging.getLogger(__name__)
+
+class ServiceError(RuntimeError):
+    """The HTTP service rejected or failed a request."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+class ServiceClient:
+    """
+    Client for the HTTP API in ``service.py``.
+
+    One pooled HTTP session is reused for every call, so connections to the
+    service stay open between requests.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Args:
+            base_url (Optional[str]): Service address, defaults to ``settings.SERVICE_URL``
+            timeout (Optional[float]): Seconds to wait for a response (or for the next
+                streamed line), defaults to ``settings.REQUEST_TIMEOUT``
+        """
+        self.base_url = (base_url or settings.SERVICE_URL).rstrip("/")
+        if not self.base_url:
+            raise ValueError("No service URL configured. Set SERVICE_URL or pass base_url.")
+        self.timeout = timeout or settings.REQUEST_TIMEOUT
+        self.session = requests.Session()
+
+    def _post(self, path: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        response = self.session.post(
+            f"{self.base_url}{path}", json=payload, timeout=self.timeout, stream=stream
+        )
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            response.close()
+            raise ServiceError(response.status_code, str(detail))
+        return response
+
+    def get_transcript(self, video: str) -> Dict[str, Any]:
+        """
+        Get a video's transcript.
+
+        Args:
+            video (str): YouTube URL or video ID
+
+        Returns:
+            Dict[str, Any]: ``video_id``, ``transcript`` and ``compaction`` (reduction
+            statistics, or None)
+        """
+        return self._post("/transcript", {"video": video}).json()
+
+    def suggest_questions(self, video: str, limit: int = 5) -> List[str]:
+        """
+        Get suggested questions for a video.
+
+        Args:
+            video (str): YouTube URL or video ID
+            limit (int): Maximum number of questions
+
+        Returns:
+            List[str]: Suggested questions
+        """
+        return self._post("/questions/suggest", {"video": video, "limit": limit}).json()["questions"]
+
+    def process_questions(self, questions: List[str], video: str, strategy: str = STRATEGY_AUTO) -> Dict[str, str]:
+        """
+        Answer questions about a video.
+
+        Args:
+            questions (List[str]): Questions to answer
+            video (str): YouTube URL or video ID
+            strategy (str): ``BatchProcessor.process_questions`` strategy
+
+        Returns:
+            Dict[str, str]: Answers by question
+        """
+        payload = {"video": video, "questions": questions, "strategy": strategy}
+        return self._post("/answers", payload).json()["answers"]
+
+    def stream_questions(self, questions: List[str], video: str, strategy: str = STRATEGY_AUTO) -> Iterator[StreamEvent]:
+        """
+        Answer questions about a video, streaming partial answers.
+
+        Yields the same events as ``BatchProcessor.stream_questions``; the service
+        sends each answer's new text, or its full text when it replaces what was
+        sent, and the full text is rebuilt here.
+
+        Args:
+            questions (List[str]): Questions to answer
+            video (str): YouTube URL or video ID
+            strategy (str): ``BatchProcessor.stream_questions`` strategy
+
+        Returns:
+            Iterator[StreamEvent]: Events carrying each question's answer so far
+        """
+        payload = {"video": video, "questions": questions, "strategy": strategy}
+        texts: Dict[str, str] = {}
+        with self._post("/answers/stream", payload, stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                question = event["question"]
+                if "text" in event:
+                    texts[question] = event["text"]
+                else:
+                    texts[question] = texts.get(question, "") + event["delta"]
+                yield StreamEvent(question, texts[question], event["done"])
+
+    def metrics(self) -> str:
+        """Prometheus metrics of the worker that served the request."""
+        response = self.session.get(f"{self.base_url}/metrics", timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def close(self) -> None:
+        self.session.close()
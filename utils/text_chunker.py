@@ -1,87 +1,120 @@
-from typing import List
-import re
-from config import settings
-
-class TextChunker:
-    def __init__(self):
-        self.max_length = settings.MAX_CONTEXT_LENGTH
-        self.chunk_overlap = settings.CHUNK_OVERLAP
-    
-    def chunk_text(self, text: str) -> List[str]:
-        """
-        Split text into overlapping chunks while trying to maintain sentence boundaries.
-        """
-        if len(text) <= self.max_length:
-            return [text]
-        
-        chunks = []
-        current_pos = 0
-        
-        while current_pos < len(text):
-            # Find the end position for this chunk
-            end_pos = current_pos + self.max_length
-            
-            if end_pos >= len(text):
-                # Last chunk
-                chunks.append(text[current_pos:])
-                break
-            
-            # Try to find a sentence boundary
-            next_period = text.find('.', end_pos - 100, end_pos + 100)
-            next_newline = text.find('\n', end_pos - 100, end_pos + 100)
-            
-            if next_period != -1 and next_period < end_pos + 100:
-                end_pos = next_period + 1
-            elif next_newline != -1 and next_newline < end_pos + 100:
-                end_pos = next_newline + 1
-            
-            # Add the chunk
-            chunk = text[current_pos:end_pos]
-            chunks.append(chunk)
-            
-            # Move to the next position, accounting for overlap
-            current_pos = end_pos - self.chunk_overlap
-        
-        return chunks
-    
-    def clean_text(self, text: str) -> str:
-        """
-        Clean the input text by removing extra whitespace and normalizing line endings.
-        """
-        # Replace multiple spaces with a single space
-        text = re.sub(r'\s+', ' ', text)
-        # Normalize line endings
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
-        # Remove multiple consecutive newlines
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        return text.strip()
-    
-    def extract_timestamps(self, text: str) -> List[dict]:
-        """
-        Extract timestamps from the text if they exist in a common format.
-        Returns a list of dictionaries with timestamp and text.
-        """
-        # Common timestamp patterns
-        patterns = [
-            r'(\d{1,2}:\d{2}(?::\d{2})?(?:\.\d{3})?)',  # HH:MM:SS or HH:MM
-            r'(\d{1,2}:\d{2}:\d{2})',  # HH:MM:SS
-            r'(\d{1,2}:\d{2})',  # HH:MM
-        ]
-        
-        timestamps = []
-        for pattern in patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                timestamp = match.group(1)
-                # Get the text after the timestamp until the next timestamp or end
-                start_pos = match.end()
-                next_match = re.search(pattern, text[start_pos:])
-                end_pos = start_pos + next_match.start() if next_match else len(text)
-                text_content = text[start_pos:end_pos].strip()
-                
-                timestamps.append({
-                    'timestamp': timestamp,
-                    'text': text_content
-                })
-        
-        return timestamps 
\ No newline at end of file
+from typing import Callable, Iterator, List, Optional, Tuple
+import re
+from config import settings
+
+# How far back from the size limit to look for a sentence or line boundary
+BOUNDARY_WINDOW = 100
+
+# HH:MM:SS or MM:SS, with optional milliseconds
+TIMESTAMP_PATTERN = re.compile(r'(?<![\d:])(\d{1,2}:\d{2}(?::\d{2})?(?:\.\d{3})?)(?![\d:])')
+
+class TextChunker:
+    def __init__(
+        self,
+        max_length: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        token_counter: Optional[Callable[[str], int]] = None
+    ):
+        """
+        Args:
+            max_length (Optional[int]): Maximum chunk size; characters by default, tokens
+                when a token counter is given
+            chunk_overlap (Optional[int]): Overlap between consecutive chunks in characters
+            token_counter (Optional[Callable[[str], int]]): Counts the tokens in a string
+        """
+        self.max_length = max_length or settings.MAX_CONTEXT_LENGTH
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else settings.CHUNK_OVERLAP
+        self.token_counter = token_counter
+        # Running estimate of characters per token, refined as chunks are measured
+        self._chars_per_token = 4.0
+    
+    def iter_chunk_spans(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        Yield ``(start, end)`` offsets of overlapping chunks, preferring sentence boundaries.
+        
+        Makes a single forward pass without copying the text, and always advances,
+        even when the overlap is as large as a chunk.
+        """
+        n = len(text)
+        if n <= self.max_length and self.token_counter is None:
+            yield 0, n
+            return
+        
+        start = 0
+        while start < n:
+            end = self._chunk_end(text, start)
+            if end >= n:
+                yield start, n
+                return
+            
+            # Prefer ending on a sentence, then a line, within the last few characters
+            window_start = max(start + 1, end - BOUNDARY_WINDOW)
+            boundary = text.rfind('.', window_start, end)
+            if boundary == -1:
+                boundary = text.rfind('\n', window_start, end)
+            if boundary != -1:
+                end = boundary + 1
+            
+            yield start, end
+            
+            # Move to the next position, accounting for overlap
+            next_start = end - self.chunk_overlap
+            start = next_start if next_start > start else end
+    
+    def _chunk_end(self, text: str, start: int) -> int:
+        """Find the furthest end offset for a chunk starting at ``start`` within the size limit."""
+        if self.token_counter is None:
+            return start + self.max_length
+        
+        # Guess from the running characters-per-token estimate, then shrink until it fits
+        n = len(text)
+        end = min(n, start + max(1, int(self.max_length * self._chars_per_token)))
+        while True:
+            tokens = self.token_counter(text[start:end])
+            if tokens > 0:
+                self._chars_per_token = (end - start) / tokens
+            if tokens <= self.max_length or end - start <= 1:
+                return end
+            end = start + max(1, int((end - start) * self.max_length / tokens * 0.95))
+    
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """
+        Lazily yield overlapping chunks of the text, see ``iter_chunk_spans``.
+        """
+        for start, end in self.iter_chunk_spans(text):
+            yield text[start:end]
+    
+    def chunk_text(self, text: str) -> List[str]:
+        """
+        Split text into overlapping chunks while trying to maintain sentence boundaries.
+        """
+        return list(self.iter_chunks(text))
+    
+    def clean_text(self, text: str) -> str:
+        """
+        Clean the input text by removing extra whitespace and normalizing line endings.
+        """
+        # Replace multiple spaces with a single space
+        text = re.sub(r'\s+', ' ', text)
+        # Normalize line endings
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        # Remove multiple consecutive newlines
+        text = re.sub(r'\n\s*\n', '\n\n', text)
+        return text.strip()
+    
+    def extract_timestamps(self, text: str) -> List[dict]:
+        """
+        Extract timestamps from the text if they exist in a common format.
+        Returns a list of dictionaries with timestamp and text.
+        """
+        # A single pass over the text; each timestamp's text runs to the next match
+        matches = list(TIMESTAMP_PATTERN.finditer(text))
+        timestamps = []
+        for i, match in enumerate(matches):
+            end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            timestamps.append({
+                'timestamp': match.group(1),
+                'text': text[match.end():end_pos].strip()
+            })
+        
+        return timestamps
\ No newline at end of file
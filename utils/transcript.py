@@ -0,0 +1,207 @@
+from array import array
+from bisect import bisect_right
+import re
+import struct
+import sys
+from typing import Any, Iterable, Optional, Tuple
+
+# "[1:05]" or "[1:05-2:10]" citations in answers, with M:SS or H:MM:SS times
+CITATION_PATTERN = re.compile(r"\[((?:\d+:)?\d{1,2}:\d{2})(?:\s*-\s*(?:\d+:)?\d{1,2}:\d{2})?\]")
+
+def _segment_field(segment: Any, name: str) -> Any:
+    """Read a field from a transcript segment given as a dict or an object."""
+    if isinstance(segment, dict):
+        return segment.get(name)
+    return getattr(segment, name, None)
+
+class Transcript:
+    """
+    Transcript text with per-segment timing kept in compact parallel arrays.
+
+    Segment ``i`` starts at ``starts[i]`` seconds, lasts ``durations[i]`` seconds
+    and begins at character ``offsets[i]`` of ``text``. Lookups by time or by
+    character offset are binary searches.
+    """
+
+    __slots__ = ("text", "starts", "durations", "offsets")
+
+    def __init__(self, text: str, starts: array, durations: array, offsets: array):
+        self.text = text
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Any], separator: str = " ") -> "Transcript":
+        """
+        Build a transcript from the segments returned by the transcript API.
+
+        Args:
+            segments (Iterable[Any]): Segments with ``text``, ``start`` and ``duration``
+                fields, as dicts or objects
+            separator (str): String placed between segment texts
+
+        Returns:
+            Transcript: The joined text with segment timing
+        """
+        starts = array("d")
+        durations = array("d")
+        offsets = array("q")
+        parts = []
+        position = 0
+        for segment in segments:
+            if parts:
+                position += len(separator)
+            text = _segment_field(segment, "text") or ""
+            starts.append(float(_segment_field(segment, "start") or 0.0))
+            durations.append(float(_segment_field(segment, "duration") or 0.0))
+            offsets.append(position)
+            parts.append(text)
+            position += len(text)
+        return cls(separator.join(parts), starts, durations, offsets)
+
+    def __len__(self) -> int:
+        """Number of segments."""
+        return len(self.starts)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the transcript."""
+        return (
+            sys.getsizeof(self.text)
+            + len(self.starts) * self.starts.itemsize
+            + len(self.durations) * self.durations.itemsize
+            + len(self.offsets) * self.offsets.itemsize
+        )
+
+    def to_bytes(self) -> bytes:
+        """Serialize the transcript (little-endian arrays followed by UTF-8 text)."""
+        columns = [array("d", self.starts), array("d", self.durations), array("q", self.offsets)]
+        if sys.byteorder == "big":
+            for column in columns:
+                column.byteswap()
+        return (
+            struct.pack("<Q", len(self.starts))
+            + b"".join(column.tobytes() for column in columns)
+            + self.text.encode("utf-8")
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Transcript":
+        """Deserialize a transcript produced by ``to_bytes``."""
+        (count,) = struct.unpack_from("<Q", data)
+        position = struct.calcsize("<Q")
+        columns = []
+        for typecode in ("d", "d", "q"):
+            column = array(typecode)
+            size = count * column.itemsize
+            column.frombytes(data[position:position + size])
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns.append(column)
+            position += size
+        starts, durations, offsets = columns
+        return cls(data[position:].decode("utf-8"), starts, durations, offsets)
+
+    def segment_at_time(self, seconds: float) -> Optional[int]:
+        """
+        Find the segment playing at a point in time.
+
+        Args:
+            seconds (float): Time in seconds from the start of the video
+
+        Returns:
+            Optional[int]: Segment index, or None before the first segment
+        """
+        index = bisect_right(self.starts, seconds) - 1
+        return index if index >= 0 else None
+
+    def segment_at_offset(self, offset: int) -> Optional[int]:
+        """
+        Find the segment containing a character offset of the text.
+
+        Args:
+            offset (int): Character offset into ``text``
+
+        Returns:
+            Optional[int]: Segment index, or None if there are no segments
+        """
+        if not self.offsets:
+            return None
+        return max(0, bisect_right(self.offsets, offset) - 1)
+
+    def segment_text(self, index: int) -> str:
+        """Text of a single segment."""
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else len(self.text)
+        return self.text[self.offsets[index]:end].strip()
+
+    def time_range(self, start: int, end: int) -> Optional[Tuple[float, float]]:
+        """
+        Map a character span of the text (e.g. a chunk) to the time range it covers.
+
+        Args:
+            start (int): Start offset of the span
+            end (int): End offset of the span (exclusive)
+
+        Returns:
+            Optional[Tuple[float, float]]: (start, end) in seconds, or None if there are no segments
+        """
+        first = self.segment_at_offset(start)
+        if first is None:
+            return None
+        last = self.segment_at_offset(max(start, end - 1))
+        return self.starts[first], self.starts[last] + self.durations[last]
+
+    def span_label(self, start: int, end: int) -> Optional[str]:
+        """
+        Label a character span with the time range it covers, for citing it.
+
+        Args:
+            start (int): Start offset of the span
+            end (int): End offset of the span (exclusive)
+
+        Returns:
+            Optional[str]: e.g. ``"1:05-2:10"``, or None if there are no segments
+        """
+        covered = self.time_range(start, end)
+        if covered is None:
+            return None
+        return f"{format_timestamp(covered[0])}-{format_timestamp(covered[1])}"
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as H:MM:SS, or M:SS under an hour."""
+    total = int(seconds)
+    hours, remainder = divmod(total, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+def parse_timestamp(value: str) -> float:
+    """Parse M:SS or H:MM:SS into seconds."""
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def link_citations(text: str, transcript: Transcript, video_id: str) -> str:
+    """
+    Turn ``[M:SS]`` citations in an answer into Markdown links that play the video
+    from the start of the cited segment.
+
+    Args:
+        text (str): Answer text
+        transcript (Transcript): Transcript the answer was given from
+        video_id (str): YouTube video ID
+
+    Returns:
+        str: The text with citations linked; citations before the first segment are left as is
+    """
+    def link(match: "re.Match[str]") -> str:
+        index = transcript.segment_at_time(parse_timestamp(match.group(1)))
+        if index is None:
+            return match.group(0)
+        seconds = int(transcript.starts[index])
+        return f"[{match.group(0)}](https://youtu.be/{video_id}?t={seconds})"
+
+    return CITATION_PATTERN.sub(link, text)
@@ -0,0 +1,203 @@
+import hashlib
+import re
+import threading
+import time
+import logging
+from array import array
+from typing import List, NamedTuple, Optional
+from cachetools import LRUCache
+from config import settings
+from .metrics import TRANSCRIPT_COMPACTION_BYTES
+from .scheduler import estimate_tokens
+from .transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+# Non-speech annotations in auto-generated captions: [Music], [Applause], (laughter), ♪ ...
+_MARKER_PATTERN = re.compile(
+    r"\[[^\]\n]{0,40}\]|\((?:music|applause|laughter|laughs|inaudible|silence)\)|♪+",
+    re.IGNORECASE
+)
+# Hesitation sounds only; words such as "like" or "you know" can carry meaning
+_FILLER_PATTERN = re.compile(r"(?:u+h+|u+m+|e+r+m+|hmm+|mm-?hmm|uh-huh),?")
+_FILLER_INITIALS = frozenset("uehm")
+
+class CompactionStats(NamedTuple):
+    """How much compaction shrank a transcript."""
+    original_bytes: int
+    compacted_bytes: int
+    original_tokens: int
+    compacted_tokens: int
+    segments_dropped: int
+    seconds: float
+
+    @property
+    def byte_reduction(self) -> float:
+        """Fraction of the bytes removed."""
+        return 1 - self.compacted_bytes / self.original_bytes if self.original_bytes else 0.0
+
+    @property
+    def token_reduction(self) -> float:
+        """Fraction of the (estimated) tokens removed."""
+        return 1 - self.compacted_tokens / self.original_tokens if self.original_tokens else 0.0
+
+class TranscriptCompactor:
+    """
+    Shrinks caption transcripts before they are sent to the model.
+
+    Each segment gets one pass of a compiled regex that removes non-speech
+    markers, then is split into words, which normalizes whitespace. Filler
+    sounds, and words a segment repeats from the end of the previous one
+    (rolling auto-captions), are dropped at the word level, as are segments
+    left empty. Segment timing is kept, and results are cached per video ID
+    and transcript content, so a changed transcript is compacted again.
+    """
+
+    def __init__(
+        self,
+        strip_markers: Optional[bool] = None,
+        strip_fillers: Optional[bool] = None,
+        dedupe_overlap: Optional[bool] = None,
+        max_overlap_words: int = 32,
+        cache_size: Optional[int] = None
+    ):
+        """
+        Args:
+            strip_markers (Optional[bool]): Remove ``[Music]``-style annotations
+            strip_fillers (Optional[bool]): Remove hesitation sounds such as "um" and "uh"
+            dedupe_overlap (Optional[bool]): Remove words repeated from the previous segment
+            max_overlap_words (int): Longest repeated run looked for between segments
+            cache_size (Optional[int]): Number of compacted transcripts kept
+        """
+        self.strip_markers = strip_markers if strip_markers is not None else settings.COMPACTION_STRIP_MARKERS
+        self.strip_fillers = strip_fillers if strip_fillers is not None else settings.COMPACTION_STRIP_FILLERS
+        self.dedupe_overlap = dedupe_overlap if dedupe_overlap is not None else settings.COMPACTION_DEDUPE_OVERLAP
+        self.max_overlap_words = max_overlap_words
+        self._cache = LRUCache(maxsize=cache_size or settings.COMPACTION_CACHE_SIZE)
+        self._lock = threading.Lock()
+
+    def _words(self, text: str) -> "tuple[List[str], List[str]]":
+        """Split a segment into its words and their case-folded forms, without markers or fillers."""
+        if self.strip_markers:
+            text = _MARKER_PATTERN.sub(" ", text)
+        words = text.split()
+        folded = [word.casefold() for word in words]
+        if self.strip_fillers:
+            # Checking the initial first keeps the regex off most words
+            keep = [
+                i for i, word in enumerate(folded)
+                if word[0] not in _FILLER_INITIALS or not _FILLER_PATTERN.fullmatch(word)
+            ]
+            if len(keep) < len(words):
+                words = [words[i] for i in keep]
+                folded = [folded[i] for i in keep]
+        return words, folded
+
+    def clean(self, text: str) -> str:
+        """Remove markers and fillers from a piece of text and normalize its whitespace."""
+        return " ".join(self._words(text)[0])
+
+    def _overlap(self, previous: List[str], current: List[str]) -> int:
+        """Number of leading words of ``current`` that repeat the end of ``previous``."""
+        if previous == current:
+            return len(current)
+        longest = min(len(previous), len(current), self.max_overlap_words)
+        # Single-word overlaps are usually coincidence ("to ... to"), not a rolling caption
+        for size in range(longest, 1, -1):
+            if previous[-size:] == current[:size]:
+                return size
+        return 0
+
+    def compact(self, transcript: Transcript, video_id: Optional[str] = None) -> Transcript:
+        """
+        Compact a transcript, reusing the cached result for the video.
+
+        Args:
+            transcript (Transcript): Transcript as fetched
+            video_id (Optional[str]): Video ID to cache the result under
+
+        Returns:
+            Transcript: The compacted transcript
+        """
+        return self.compact_with_stats(transcript, video_id)[0]
+
+    def compact_with_stats(
+        self, transcript: Transcript, video_id: Optional[str] = None
+    ) -> "tuple[Transcript, CompactionStats]":
+        """
+        Compact a transcript and report how much it shrank.
+
+        Args:
+            transcript (Transcript): Transcript as fetched
+            video_id (Optional[str]): Video ID to cache the result under
+
+        Returns:
+            tuple[Transcript, CompactionStats]: The compacted transcript and its statistics
+        """
+        key = None
+        if video_id:
+            # Hashing is far cheaper than compacting, and a refetched transcript may differ
+            digest = hashlib.blake2b(transcript.text.encode("utf-8"), digest_size=16).hexdigest()
+            key = (video_id, digest)
+        if key is not None:
+            with self._lock:
+                cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+
+        started_at = time.perf_counter()
+        starts = array("d")
+        durations = array("d")
+        offsets = array("q")
+        parts = []
+        position = 0
+        previous_words: List[str] = []
+        for i in range(len(transcript)):
+            words, folded = self._words(transcript.segment_text(i))
+            if self.dedupe_overlap and words:
+                overlap = self._overlap(previous_words, folded)
+                if overlap:
+                    words = words[overlap:]
+                previous_words = folded[-self.max_overlap_words:]
+            if not words:
+                continue
+            text = " ".join(words)
+            if parts:
+                position += 1
+            starts.append(transcript.starts[i])
+            durations.append(transcript.durations[i])
+            offsets.append(position)
+            parts.append(text)
+            position += len(text)
+
+        compacted = Transcript(" ".join(parts), starts, durations, offsets)
+        original_bytes = len(transcript.text.encode("utf-8"))
+        compacted_bytes = len(compacted.text.encode("utf-8"))
+        stats = CompactionStats(
+            original_bytes=original_bytes,
+            compacted_bytes=compacted_bytes,
+            original_tokens=estimate_tokens(transcript.text),
+            compacted_tokens=estimate_tokens(compacted.text),
+            segments_dropped=len(transcript) - len(compacted),
+            seconds=time.perf_counter() - started_at
+        )
+        TRANSCRIPT_COMPACTION_BYTES.inc(original_bytes, stage="original")
+        TRANSCRIPT_COMPACTION_BYTES.inc(compacted_bytes, stage="compacted")
+        logger.info(
+            f"Compacted transcript{f' for video {video_id}' if video_id else ''}: "
+            f"{stats.byte_reduction:.1%} fewer bytes, ~{stats.original_tokens - stats.compacted_tokens} "
+            f"fewer tokens, {stats.segments_dropped} segments dropped"
+        )
+
+        if key is not None:
+            with self._lock:
+                self._cache[key] = (compacted, stats)
+        return compacted, stats
+
+    def stats(self, video_id: str) -> Optional[CompactionStats]:
+        """Statistics for the most recently compacted transcript of a video, if cached."""
+        with self._lock:
+            for (cached_video_id, _), (_, stats) in reversed(list(self._cache.items())):
+                if cached_video_id == video_id:
+                    return stats
+        return None
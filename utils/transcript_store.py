@@ -0,0 +1,162 @@
+import threading
+import zlib
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from config import settings
+from .cache_backends import CacheBackend, create_backend
+from .metrics import CACHE_EVICTIONS, CACHE_REQUESTS
+from .transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+class TranscriptStore:
+    """
+    Bounded transcript cache with an optional compressed persistent tier.
+
+    The in-memory tier is an LRU limited by bytes rather than entry count. Misses
+    fall through to the persistent backend (zlib-compressed), and concurrent
+    requests for the same uncached video share a single fetch.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        backend: Optional[CacheBackend] = None
+    ):
+        """
+        Args:
+            max_bytes (Optional[int]): Byte budget for the in-memory tier
+            backend (Optional[CacheBackend]): Persistent tier; defaults to a ``transcripts``
+                table in the cache database when ``settings.TRANSCRIPT_STORE_PERSISTENT`` is set
+        """
+        self.max_bytes = max_bytes if max_bytes is not None else settings.TRANSCRIPT_CACHE_MAX_BYTES
+        if backend is None and settings.TRANSCRIPT_STORE_PERSISTENT:
+            backend = create_backend(
+                table="transcripts",
+                max_bytes=settings.TRANSCRIPT_STORE_MAX_BYTES,
+                ttl=settings.TRANSCRIPT_TTL
+            )
+        self.backend = backend
+
+        self._entries: "OrderedDict[str, Transcript]" = OrderedDict()
+        self._size = 0
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, video_id: str) -> bool:
+        with self._lock:
+            return video_id in self._entries
+
+    def get(self, video_id: str) -> Optional[Transcript]:
+        """
+        Get a stored transcript from memory or the persistent tier.
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            Optional[Transcript]: The transcript if stored, None otherwise
+        """
+        with self._lock:
+            transcript = self._entries.get(video_id)
+            if transcript is not None:
+                self._entries.move_to_end(video_id)
+                CACHE_REQUESTS.inc(tier="transcript", result="hit")
+                return transcript
+        CACHE_REQUESTS.inc(tier="transcript", result="miss")
+
+        if self.backend is None:
+            return None
+        try:
+            data = self.backend.get(video_id)
+        except Exception as e:
+            logger.warning(f"Error reading transcript store: {str(e)}")
+            return None
+        CACHE_REQUESTS.inc(tier="transcript_persistent", result="miss" if data is None else "hit")
+        if data is None:
+            return None
+
+        transcript = Transcript.from_bytes(zlib.decompress(data))
+        self._remember(video_id, transcript)
+        return transcript
+
+    def put(self, video_id: str, transcript: Transcript) -> None:
+        """
+        Store a transcript in memory and in the persistent tier.
+
+        Args:
+            video_id (str): YouTube video ID
+            transcript (Transcript): Transcript to store
+        """
+        self._remember(video_id, transcript)
+        if self.backend is not None:
+            try:
+                self.backend.set(video_id, zlib.compress(transcript.to_bytes(), 6))
+            except Exception as e:
+                logger.warning(f"Error writing transcript store: {str(e)}")
+
+    def _remember(self, video_id: str, transcript: Transcript) -> None:
+        """Add a transcript to the in-memory LRU, evicting until it fits the byte budget."""
+        size = transcript.nbytes
+        with self._lock:
+            previous = self._entries.pop(video_id, None)
+            if previous is not None:
+                self._size -= previous.nbytes
+            self._entries[video_id] = transcript
+            self._size += size
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+                CACHE_EVICTIONS.inc(tier="transcript")
+
+    def get_or_fetch(self, video_id: str, fetch: Callable[[], Transcript]) -> Transcript:
+        """
+        Get a transcript, fetching it if missing. Concurrent callers for the same
+        video wait for one shared fetch instead of each calling the API.
+
+        Args:
+            video_id (str): YouTube video ID
+            fetch (Callable[[], Transcript]): Fetches the transcript on a miss
+
+        Returns:
+            Transcript: The stored or freshly fetched transcript
+        """
+        transcript = self.get(video_id)
+        if transcript is not None:
+            return transcript
+
+        with self._lock:
+            # Another caller may have finished fetching since the lookup above
+            transcript = self._entries.get(video_id)
+            if transcript is not None:
+                return transcript
+            future = self._inflight.get(video_id)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[video_id] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            transcript = fetch()
+            self.put(video_id, transcript)
+            future.set_result(transcript)
+            return transcript
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(video_id, None)
+
+    def clear(self) -> None:
+        """Drop all stored transcripts."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.backend is not None:
+            self.backend.clear()
@@ -1,100 +1,196 @@
-import re
-from youtube_transcript_api import YouTubeTranscriptApi
-import logging
-
-logger = logging.getLogger(__name__)
-
-class YouTubeHandler:
-    def __init__(self):
-        self.transcript_cache = {}
-
-    def extract_video_id(self, url: str) -> str:
-        """
-        Extract video ID from various YouTube URL formats.
-        
-        Args:
-            url (str): YouTube video URL
-            
-        Returns:
-            str: Video ID
-        """
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?]+)',
-            r'youtube\.com\/shorts\/([^&\n?]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-                
-        raise ValueError("Invalid YouTube URL format")
-
-    def get_transcript(self, url: str) -> str:
-        """
-        Get transcript for a YouTube video.
-        
-        Args:
-            url (str): YouTube video URL
-            
-        Returns:
-            str: Video transcript
-        """
-        try:
-            video_id = self.extract_video_id(url)
-            
-            # Check cache first
-            if video_id in self.transcript_cache:
-                logger.info(f"Retrieved transcript from cache for video: {video_id}")
-                return self.transcript_cache[video_id]
-            
-            # Get transcript from API
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-            
-            # Combine transcript pieces
-            full_transcript = ' '.join([piece['text'] for piece in transcript_list])
-            
-            # Cache the transcript
-            self.transcript_cache[video_id] = full_transcript
-            logger.info(f"Cached transcript for video: {video_id}")
-            
-            return full_transcript
-            
-        except Exception as e:
-            logger.error(f"Error getting transcript: {str(e)}")
-            raise
-
-    def suggest_questions(self, transcript: str, limit: int = 5) -> list:
-        """
-        Generate relevant questions based on the transcript.
-        
-        Args:
-            transcript (str): Video transcript
-            limit (int): Maximum number of questions to generate
-            
-        Returns:
-            list: List of suggested questions
-        """
-        try:
-            # Split transcript into chunks for better processing
-            chunks = [transcript[i:i+1000] for i in range(0, len(transcript), 1000)]
-            
-            # Generate questions for each chunk
-            questions = []
-            for chunk in chunks:
-                # Use Gemini API to generate questions
-                # This is a placeholder - implement actual question generation
-                questions.extend([
-                    "What are the main topics discussed in this video?",
-                    "Can you summarize the key points?",
-                    "What are the important conclusions?",
-                    "Are there any specific examples or case studies mentioned?",
-                    "What are the practical implications discussed?"
-                ])
-            
-            # Remove duplicates and limit the number of questions
-            return list(set(questions))[:limit]
-            
-        except Exception as e:
-            logger.error(f"Error generating questions: {str(e)}")
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from youtube_transcript_api import YouTubeTranscriptApi
+import logging
+from config import settings
+from .metrics import TRANSCRIPT_FETCH_SECONDS
+from .transcript import Transcript
+from .transcript_compactor import TranscriptCompactor
+from .transcript_store import TranscriptStore
+
+logger = logging.getLogger(__name__)
+
+def fetch_youtube_transcript(video_id: str) -> Iterable[Any]:
+    """
+    Fetch a video's transcript segments from YouTube.
+
+    Supports both youtube-transcript-api interfaces: the 0.x class method
+    ``get_transcript`` (dicts) and the 1.x ``YouTubeTranscriptApi().fetch``
+    (snippet objects); both have ``text``, ``start`` and ``duration``.
+
+    Args:
+        video_id (str): YouTube video ID
+
+    Returns:
+        Iterable[Any]: Transcript segments
+    """
+    if hasattr(YouTubeTranscriptApi, "get_transcript"):
+        return YouTubeTranscriptApi.get_transcript(video_id)
+    return YouTubeTranscriptApi().fetch(video_id)
+
+class YouTubeHandler:
+    def __init__(
+        self,
+        fetcher: Optional[Callable[[str], Iterable[Any]]] = None,
+        transcript_store: Optional[TranscriptStore] = None,
+        compactor: Optional[TranscriptCompactor] = None
+    ):
+        """
+        Args:
+            fetcher (Optional[Callable]): Returns the transcript segments for a video ID;
+                defaults to ``fetch_youtube_transcript``
+            transcript_store (Optional[TranscriptStore]): Transcript cache; defaults to a new store
+            compactor (Optional[TranscriptCompactor]): Compacts transcripts before they are
+                returned; defaults to a new compactor when ``settings.COMPACTION_ENABLED``
+        """
+        self.fetcher = fetcher or fetch_youtube_transcript
+        self.transcript_store = transcript_store if transcript_store is not None else TranscriptStore()
+        if compactor is None and settings.COMPACTION_ENABLED:
+            compactor = TranscriptCompactor()
+        self.compactor = compactor
+
+    def extract_video_id(self, url: str) -> str:
+        """
+        Extract video ID from various YouTube URL formats.
+        
+        Args:
+            url (str): YouTube video URL
+            
+        Returns:
+            str: Video ID
+        """
+        patterns = [
+            r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?]+)',
+            r'youtube\.com\/shorts\/([^&\n?]+)'
+        ]
+        
+        for pattern in patterns:
+            match = re.search(pattern, url)
+            if match:
+                return match.group(1)
+                
+        raise ValueError("Invalid YouTube URL format")
+
+    def get_transcript(self, url: str) -> str:
+        """
+        Get transcript for a YouTube video.
+        
+        Args:
+            url (str): YouTube video URL
+            
+        Returns:
+            str: Video transcript
+        """
+        return self.get_transcript_segments(url).text
+
+    def get_transcript_segments(self, url: str) -> Transcript:
+        """
+        Get the transcript for a YouTube video along with its segment timing.
+        
+        Args:
+            url (str): YouTube video URL
+            
+        Returns:
+            Transcript: Video transcript with per-segment start times and durations
+        """
+        try:
+            video_id = self.extract_video_id(url)
+            
+            # Check cache first; concurrent misses for the same video share one fetch
+            transcript = self.transcript_store.get_or_fetch(video_id, lambda: self._fetch_transcript(video_id))
+            
+            # The store keeps the raw captions, so compaction settings can change without refetching
+            if self.compactor is not None:
+                transcript = self.compactor.compact(transcript, video_id)
+            return transcript
+            
+        except Exception as e:
+            logger.error(f"Error getting transcript: {str(e)}")
+            raise
+
+    def find_transcript(self, video_id: str, text: str) -> Optional[Transcript]:
+        """
+        Get the stored transcript whose text is ``text``, without fetching.
+        
+        Args:
+            video_id (str): YouTube video ID
+            text (str): Transcript text, as returned by ``get_transcript``
+            
+        Returns:
+            Optional[Transcript]: The transcript with segment timing, or None if it is not
+            stored or the text is not this video's transcript
+        """
+        transcript = self.transcript_store.get(video_id)
+        if transcript is not None and self.compactor is not None:
+            transcript = self.compactor.compact(transcript, video_id)
+        if transcript is None or transcript.text != text:
+            return None
+        return transcript
+
+    def _fetch_transcript(self, video_id: str) -> Transcript:
+        """Fetch a transcript from the API, keeping segment timing."""
+        with TRANSCRIPT_FETCH_SECONDS.time():
+            transcript_list = self.fetcher(video_id)
+        
+        # Combine transcript pieces, keeping their timing
+        transcript = Transcript.from_segments(transcript_list)
+        logger.info(f"Fetched transcript for video: {video_id}")
+        return transcript
+
+    def prefetch(self, urls: List[str], max_workers: Optional[int] = None) -> Dict[str, Transcript]:
+        """
+        Fetch transcripts for many videos concurrently and store them.
+        
+        Args:
+            urls (List[str]): YouTube video URLs
+            max_workers (Optional[int]): Number of concurrent fetches
+            
+        Returns:
+            Dict[str, Transcript]: Transcripts by video ID, for the videos that succeeded
+        """
+        workers = max(1, max_workers or settings.TRANSCRIPT_PREFETCH_WORKERS)
+        transcripts = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {url: executor.submit(self.get_transcript_segments, url) for url in urls}
+            for url, future in futures.items():
+                try:
+                    transcripts[self.extract_video_id(url)] = future.result()
+                except Exception as e:
+                    logger.error(f"Error prefetching transcript for {url}: {str(e)}")
+        return transcripts
+
+    def suggest_questions(self, transcript: str, limit: int = 5) -> list:
+        """
+        Generate relevant questions based on the transcript.
+        
+        Args:
+            transcript (str): Video transcript
+            limit (int): Maximum number of questions to generate
+            
+        Returns:
+            list: List of suggested questions
+        """
+        try:
+            # Split transcript into chunks for better processing
+            chunks = [transcript[i:i+1000] for i in range(0, len(transcript), 1000)]
+            
+            # Generate questions for each chunk
+            questions = []
+            for chunk in chunks:
+                # Use Gemini API to generate questions
+                # This is a placeholder - implement actual question generation
+                questions.extend([
+                    "What are the main topics discussed in this video?",
+                    "Can you summarize the key points?",
+                    "What are the important conclusions?",
+                    "Are there any specific examples or case studies mentioned?",
+                    "What are the practical implications discussed?"
+                ])
+            
+            # Remove duplicates and limit the number of questions
+            return list(set(questions))[:limit]
+            
+        except Exception as e:
+            logger.error(f"Error generating questions: {str(e)}")
             return [] 
\ No newline at end of file